@@ -1,22 +1,21 @@
-from datetime import timedelta, datetime
-from typing import Union
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import timedelta
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
 
 from core.config import (
     SECRET_KEY,
     ALGORITHM,
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    MAX_LOGIN_ATTEMPTS,
-    LOGIN_ATTEMPT_WINDOW
+    ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from schemas.users import Token
 from db.dals.user_dal import UserDAL
-from db.models.users import User, LoginAttempt
+from api.services.login_limiter import acquire_login_attempt, record_login_success
+from api.services.principal_service import get_principal, invalidate_principal
+from tasks.login_audit import record_login_attempt
+from db.models.users import User
 from db.session import get_db
 from core.hashing import Hasher
 from core.security import create_access_token
@@ -32,70 +31,50 @@ async def get_user_by_email_for_auth(email: str, session):
     user_dal = UserDAL(session)
     return await user_dal.get_user_by_email(email=email)
 
-async def check_login_attempts(email: str, session: AsyncSession) -> bool:
-    """Проверяет количество попыток входа"""
-    # Удаляем старые попытки
-    await session.execute(
-        delete(LoginAttempt).where(
-            LoginAttempt.email == email,
-            LoginAttempt.created_at < datetime.utcnow() - timedelta(minutes=LOGIN_ATTEMPT_WINDOW)
-        )
-    )
+async def authenticate_user(email: str, password: str, session, client_ip: Optional[str] = None) -> Union[User, None]:
+    # Попытка учитывается до обращения к базе: перебор паролей не нагружает ее,
+    # а параллельные попытки не проходят проверку лимита раньше, чем учтены
+    await acquire_login_attempt(email, client_ip)
     
-    # Считаем попытки
-    result = await session.execute(
-        select(LoginAttempt).where(
-            LoginAttempt.email == email,
-            LoginAttempt.created_at > datetime.utcnow() - timedelta(minutes=LOGIN_ATTEMPT_WINDOW)
-        )
-    )
-    attempts = result.scalars().all()
-    
-    return len(attempts) < MAX_LOGIN_ATTEMPTS
-
-async def record_login_attempt(email: str, success: bool, session: AsyncSession):
-    """Записывает попытку входа"""
-    attempt = LoginAttempt(
-        email=email,
-        success=success,
-        created_at=datetime.utcnow()
-    )
-    session.add(attempt)
-
-async def authenticate_user(email: str, password: str, session) -> Union[User, None]:
     async with session.begin():
-        # Проверяем количество попыток
-        if not await check_login_attempts(email, session):
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many login attempts. Please try again later."
-            )
-        
         user = await get_user_by_email_for_auth(email=email, session=session)
         if not user:
-            await record_login_attempt(email, False, session)
+            record_login_attempt(email, False, client_ip)
             return None
             
         if not user.is_active:
-            await record_login_attempt(email, False, session)
+            record_login_attempt(email, False, client_ip)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="User account is disabled"
             )
             
-        if not Hasher.verify_password(password, user.hashed_password):
-            await record_login_attempt(email, False, session)
+        valid, new_hash = await Hasher.verify_and_update(password, user.hashed_password)
+        if not valid:
+            record_login_attempt(email, False, client_ip)
             return None
+        
+        # Хеш с прежней стоимостью bcrypt заменяется при успешном входе
+        if new_hash is not None:
+            user.hashed_password = new_hash
+            invalidate_principal(user.user_id)
             
-        await record_login_attempt(email, True, session)
+        await record_login_success(email, client_ip)
+        record_login_attempt(email, True, client_ip)
         return user
 
 @login_router.post("/token", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(), 
     session: AsyncSession = Depends(get_db)
 ):
-    user = await authenticate_user(form_data.username, form_data.password, session)
+    user = await authenticate_user(
+        form_data.username,
+        form_data.password,
+        session,
+        client_ip=request.client.host if request.client else None
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -133,7 +112,8 @@ async def get_current_user_from_token(
     except JWTError:
         raise credentials_exception
         
-    user = await get_user_by_email_for_auth(email=email, session=session)
+    # Пользователь для повторных запросов с тем же токеном берется из кэша
+    user = await get_principal(email, payload.get("iat"), session)
     if not user:
         raise credentials_exception
         
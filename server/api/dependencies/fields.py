@@ -0,0 +1,41 @@
+from typing import List, Optional, Type
+
+from fastapi import HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+class FieldsParam:
+    """
+    Разбирает параметр ?fields=a,b,c и проверяет имена по модели ответа.
+    Выбранные поля передаются в DAL, чтобы остальные колонки не читались из базы
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.allowed = list(model.model_fields)
+
+    def __call__(
+        self,
+        fields: Optional[str] = Query(None, description="Список полей ответа через запятую")
+    ) -> Optional[List[str]]:
+        if fields is None:
+            return None
+        names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.allowed]
+        if not names or unknown:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Unknown fields: {', '.join(unknown) or fields}. Allowed: {', '.join(self.allowed)}"
+            )
+        return names
+
+def card_fields(model: Type[BaseModel]) -> List[str]:
+    return list(model.model_fields)
+
+def sparse_response(content, response: Response) -> JSONResponse:
+    """Ответ с частичным набором полей в обход response_model, с сохранением заголовков"""
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key.lower() not in ("content-length", "content-type")
+    }
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
@@ -0,0 +1,20 @@
+from typing import Optional
+from fastapi import Query, Response
+
+from db.dals.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Курсор следующей страницы передается заголовком, тело ответа остается списком
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,16 @@
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from db.routing import sticky_key
+from db.session import write_stickiness
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """Отмечает клиентов после успешной записи, чтобы их чтения шли на основную базу"""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        if request.method in WRITE_METHODS and response.status_code < 400:
+            write_stickiness.mark_write(sticky_key(request))
+        return response
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from api.routers import users, movies, comments, episodes, premium, auth
+from api.routers import users, movies, comments, episodes, premium, auth, metrics, media
 main_router = APIRouter()
 
 main_router.include_router(main_router, prefix="/api")
@@ -8,4 +8,7 @@ main_router.include_router(users.user_router, prefix="/api/users", tags=["users"
 main_router.include_router(movies.movie_router, prefix="/api/movies", tags=["movies"])
 main_router.include_router(comments.comment_router, prefix="/api/comments", tags=["comments"])
 main_router.include_router(episodes.episode_router, prefix="/api/episodes", tags=["episodes"])
-main_router.include_router(premium.premium_router, prefix="/api/premium", tags=["premium"])
\ No newline at end of file
+main_router.include_router(premium.premium_router, prefix="/api/premium", tags=["premium"])
+main_router.include_router(metrics.metrics_router, prefix="/api/metrics", tags=["metrics"])
+main_router.include_router(media.blob_router, prefix="/api/media", tags=["media"])
+main_router.include_router(media.media_router, prefix="/media", tags=["media"])
\ No newline at end of file
@@ -23,10 +23,16 @@ auth_router = APIRouter()
 
 @auth_router.post("/token", response_model=Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     session: AsyncSession = Depends(get_db)
 ) -> Token:
-    user = await authenticate_user(form_data.username, form_data.password, session)
+    user = await authenticate_user(
+        form_data.username,
+        form_data.password,
+        session,
+        client_ip=request.client.host if request.client else None
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
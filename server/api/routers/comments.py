@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.dependencies.auth import get_current_user_from_token as get_current_user
+from api.dependencies.pagination import PageParams, set_next_cursor
 from schemas.comments import (
     CommentCreate,
     CommentRead,
@@ -9,7 +10,7 @@ from schemas.comments import (
     CommentUpdate,
     CommentUpdateResponse
 )
-from db.session import get_db
+from db.session import get_db, get_read_db
 from api.services.comment_service import (
     create_new_comment,
     delete_comment,
@@ -25,21 +26,25 @@ comment_router = APIRouter()
 @comment_router.get("/movie/{movie_id}", response_model=list[CommentRead])
 async def get_movie_comments_router(
     movie_id: int,
-    session: AsyncSession = Depends(get_db)
+    response: Response,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_read_db)
 ) -> list[CommentRead]:
-    return await get_movie_comments(movie_id, session)
+    comments, next_cursor = await get_movie_comments(movie_id, session, page.limit, page.cursor)
+    set_next_cursor(response, next_cursor)
+    return comments
 
 @comment_router.get("/{comment_id}", response_model=CommentRead)
 async def get_comment_router(
     comment_id: int,
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ) -> CommentRead:
     return await get_comment(comment_id, session)
 
 @comment_router.get("/{comment_id}/replies", response_model=list[CommentRead])
 async def get_comment_replies_router(
     comment_id: int,
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ) -> list[CommentRead]:
     return await get_comment_replies(comment_id, session)
 
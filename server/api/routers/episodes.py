@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from sqlalchemy import select
 from typing import List
 
 from api.dependencies.auth import get_current_user_from_token as get_current_user
+from api.dependencies.pagination import PageParams, set_next_cursor
 from schemas.episodes import (
     EpisodeCreate,
     EpisodeList,
     EpisodeDetail,
     EpisodeDeleteResponse,
     EpisodeUpdate,
-    EpisodeUpdateResponse
+    EpisodeUpdateResponse,
+    EpisodeUploadCreate,
+    EpisodeUploadStatus
 )
 from schemas.users import UserRead
 from db.session import get_db
@@ -19,10 +22,19 @@ from api.services.episode_service import (
     create_new_episode,
     delete_episode,
     get_episode,
+    get_episode_video,
     get_episodes_by_movie,
     update_episode,
     purchase_episode
 )
+from api.services.upload_service import (
+    create_upload,
+    get_upload_status,
+    upload_chunk,
+    finalize_upload,
+    abort_upload
+)
+from core.media import video_response
 from db.models.users import User
 from db.models.movies import Movie
 from db.models.episodes import Episode, PurchasedEpisode
@@ -32,11 +44,15 @@ episode_router = APIRouter()
 @episode_router.get("/movie/{movie_id}", response_model=list[EpisodeList])
 async def get_episodes_by_movie_router(
     movie_id: int,
+    response: Response,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_db)
 ) -> list[EpisodeList]:
     """Получить список эпизодов фильма (без видео)"""
-    return await get_episodes_by_movie(movie_id, session, current_user)
+    episodes, next_cursor = await get_episodes_by_movie(movie_id, session, current_user, page.limit, page.cursor)
+    set_next_cursor(response, next_cursor)
+    return episodes
 
 @episode_router.get("/{episode_id}", response_model=EpisodeDetail)
 async def get_episode_router(
@@ -53,6 +69,17 @@ async def get_episode_router(
         )
     return episode
 
+@episode_router.get("/{episode_id}/stream")
+async def stream_episode_router(
+    episode_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> Response:
+    """Видео эпизода с поддержкой перемотки (HTTP Range)"""
+    video_file = await get_episode_video(episode_id, session, current_user)
+    return await video_response(video_file, request)
+
 @episode_router.post("/", response_model=EpisodeList)
 async def create_episode_router(
     movie_id: int = Form(...),
@@ -81,6 +108,56 @@ async def create_episode_router(
             detail=f"Внутренняя ошибка сервера: {str(e)}"
         )
 
+@episode_router.post("/uploads", response_model=EpisodeUploadStatus)
+async def create_upload_router(
+    body: EpisodeUploadCreate,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> EpisodeUploadStatus:
+    """Начать возобновляемую загрузку видео эпизода"""
+    return await create_upload(body, session, current_user)
+
+@episode_router.get("/uploads/{upload_id}", response_model=EpisodeUploadStatus)
+async def get_upload_status_router(
+    upload_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+) -> EpisodeUploadStatus:
+    """Сколько байт уже получено - с этого смещения продолжается загрузка после обрыва"""
+    status = await get_upload_status(upload_id, current_user)
+    response.headers["Upload-Offset"] = str(status.offset)
+    return status
+
+@episode_router.put("/uploads/{upload_id}", response_model=EpisodeUploadStatus)
+async def upload_chunk_router(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., ge=0),
+    current_user: User = Depends(get_current_user)
+) -> EpisodeUploadStatus:
+    """Загрузить часть видео: тело запроса - байты файла, начиная с Upload-Offset"""
+    status = await upload_chunk(upload_id, upload_offset, request.stream(), current_user)
+    response.headers["Upload-Offset"] = str(status.offset)
+    return status
+
+@episode_router.post("/uploads/{upload_id}/finalize", response_model=EpisodeList)
+async def finalize_upload_router(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> EpisodeList:
+    """Завершить загрузку и создать эпизод"""
+    return await finalize_upload(upload_id, session, current_user)
+
+@episode_router.delete("/uploads/{upload_id}", status_code=204)
+async def abort_upload_router(
+    upload_id: str,
+    current_user: User = Depends(get_current_user)
+) -> None:
+    """Отменить загрузку и удалить полученные части"""
+    await abort_upload(upload_id, current_user)
+
 @episode_router.patch("/{episode_id}", response_model=EpisodeUpdateResponse)
 async def update_episode_router(
     episode_id: int,
@@ -0,0 +1,59 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.dependencies.auth import get_current_user_from_token as get_current_user
+from api.services.media_service import get_blob_info
+from core.media import cache_control_for, is_legacy_key, media_response, media_signer, video_response
+from db.models.users import User
+from db.session import get_read_db
+from schemas.media import MediaBlobInfo
+
+media_router = APIRouter()
+blob_router = APIRouter()
+
+@blob_router.get("/blobs/{kind}/{sha256}", response_model=MediaBlobInfo)
+async def get_blob_router(
+    kind: Literal["videos", "images"],
+    sha256: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_db)
+) -> MediaBlobInfo:
+    """
+    Есть ли в хранилище файл с таким SHA-256. Если есть, клиент может не загружать его:
+    передать хеш при создании загрузки эпизода или в PUT /api/users/upload/{type}/{sha256}
+    """
+    return await get_blob_info(sha256, kind, session)
+
+@media_router.api_route("/videos/{path:path}", methods=["GET", "HEAD"])
+async def signed_video_router(
+    path: str,
+    request: Request,
+    u: int = Query(...),
+    exp: int = Query(...),
+    kid: str = Query(...),
+    sig: str = Query(...)
+) -> Response:
+    """Видео по подписанной ссылке из EpisodeDetail; проверка подписи не обращается к базе"""
+    if ".." in path.split("/"):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    media_url = f"/media/videos/{path}"
+    if not media_signer.verify(media_url, u, exp, kid, sig):
+        raise HTTPException(status_code=403, detail="Ссылка недействительна или истекла")
+    return await video_response(media_url, request)
+
+@media_router.api_route("/images/{path:path}", methods=["GET", "HEAD"])
+async def image_router(path: str, request: Request) -> Response:
+    """Изображения пользователей из хранилища; доступны без авторизации"""
+    if ".." in path.split("/"):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    media_url = f"/media/images/{path}"
+    return await media_response(media_url, request, cache_control_for(media_url))
+
+@media_router.api_route("/{path:path}", methods=["GET", "HEAD"])
+async def legacy_media_router(path: str, request: Request) -> Response:
+    """Файлы, сохраненные до хранилища по содержимому, с диска MEDIA_ROOT"""
+    if not is_legacy_key(path):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    media_url = f"/media/{path}"
+    return await media_response(media_url, request, cache_control_for(media_url), legacy=True)
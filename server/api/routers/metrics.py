@@ -0,0 +1,48 @@
+from fastapi import APIRouter
+
+from api.services.entitlement_service import entitlement_cache
+from api.services.principal_service import principal_cache
+from core.hashing import password_hash_pool
+from tasks import login_audit, media_gc
+from tasks.premium_expiry import premium_expiry_scheduler
+from db.session import get_pool_stats, engine, replica_engine, replica_monitor
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/db-pool")
+async def get_db_pool_metrics() -> dict:
+    """Статистика пулов соединений с базой данных"""
+    stats = {"primary": get_pool_stats(engine)}
+    if replica_engine is not engine:
+        stats["replica"] = get_pool_stats(replica_engine)
+        stats["replica"]["lag"] = replica_monitor.lag
+    return stats
+
+@metrics_router.get("/caches")
+async def get_cache_metrics() -> dict:
+    """Статистика кэшей в памяти процесса"""
+    return {
+        "entitlements": entitlement_cache.stats(),
+        "principals": principal_cache.stats(),
+    }
+
+@metrics_router.get("/media-gc")
+async def get_media_gc_metrics() -> dict:
+    """Отчет последней сборки мусора в хранилище медиафайлов"""
+    return {"last_run": media_gc.last_report}
+
+@metrics_router.get("/password-hashing")
+async def get_password_hashing_metrics() -> dict:
+    """Очередь и время хеширования паролей"""
+    return password_hash_pool.stats()
+
+@metrics_router.get("/login-audit")
+async def get_login_audit_metrics() -> dict:
+    """Очередь записей о попытках входа"""
+    return login_audit.stats()
+
+
+@metrics_router.get("/premium-expiry")
+async def get_premium_expiry_metrics() -> dict:
+    """Окно и срабатывания планировщика истечения премиум-подписок"""
+    return premium_expiry_scheduler.stats()
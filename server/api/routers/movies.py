@@ -1,18 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.dependencies.auth import get_current_user_from_token as get_current_user
+from api.dependencies.pagination import PageParams, set_next_cursor
+from api.dependencies.fields import FieldsParam, card_fields, sparse_response
 from schemas.movies import (
     MovieCreate,
     MovieRead,
+    MovieCard,
     MovieDeleteResponse,
     MovieUpdateRequest,
     MovieUpdateResponse,
     MovieAccessLevelUpdate,
-    MovieAccessLevelResponse
+    MovieAccessLevelResponse,
+    MovieReactionResponse
 )
 from schemas.users import UserRead
-from db.session import get_db
+from db.session import get_db, get_read_db
 from api.services.movie_service import (
     create_new_movie,
     delete_movie,
@@ -22,26 +27,43 @@ from api.services.movie_service import (
     check_movie_access,
     check_movie_modify,
     check_movie_delete,
-    update_movie_access_level
+    update_movie_access_level,
+    get_movie_reaction,
+    set_movie_reaction
 )
 from db.models.users import User
+from db.models.movies import ReactionType
 
 movie_router = APIRouter()
 
 @movie_router.get("/", response_model=list[MovieRead])
 async def get_movies_router(
-    session: AsyncSession = Depends(get_db)
+    response: Response,
+    page: PageParams = Depends(),
+    fields: Optional[List[str]] = Depends(FieldsParam(MovieRead)),
+    view: Optional[Literal["card"]] = Query(None, description="card - облегченные карточки MovieCard"),
+    session: AsyncSession = Depends(get_read_db)
 ) -> list[MovieRead]:
-    return await get_movies(session)
+    if fields is None and view == "card":
+        fields = card_fields(MovieCard)
+    movies, next_cursor = await get_movies(session, page.limit, page.cursor, fields)
+    set_next_cursor(response, next_cursor)
+    if fields is not None:
+        return sparse_response(movies, response)
+    return movies
 
 @movie_router.get("/{movie_id}", response_model=MovieRead)
 async def get_movie_router(
     movie_id: int,
+    response: Response,
+    fields: Optional[List[str]] = Depends(FieldsParam(MovieRead)),
     current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ):
     try:
-        movie = await get_movie(movie_id, session)
+        movie = await get_movie(movie_id, session, fields)
+        if fields is not None:
+            return sparse_response(movie, response)
         # if not movie.can_access(current_user):
         #     raise HTTPException(
         #         status_code=403,
@@ -108,4 +130,38 @@ async def update_movie_access_router(
     return MovieAccessLevelResponse(
         movie_id=updated_movie.movie_id,
         access_level=updated_movie.access_level
-    ) 
\ No newline at end of file
+    )
+
+@movie_router.get("/{movie_id}/reaction", response_model=MovieReactionResponse)
+async def get_movie_reaction_router(
+    movie_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> MovieReactionResponse:
+    """Реакция текущего пользователя на фильм"""
+    return await get_movie_reaction(movie_id, current_user, session)
+
+@movie_router.put("/{movie_id}/like", response_model=MovieReactionResponse)
+async def like_movie_router(
+    movie_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> MovieReactionResponse:
+    return await set_movie_reaction(movie_id, ReactionType.LIKE, current_user, session)
+
+@movie_router.put("/{movie_id}/dislike", response_model=MovieReactionResponse)
+async def dislike_movie_router(
+    movie_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> MovieReactionResponse:
+    return await set_movie_reaction(movie_id, ReactionType.DISLIKE, current_user, session)
+
+@movie_router.delete("/{movie_id}/reaction", response_model=MovieReactionResponse)
+async def remove_movie_reaction_router(
+    movie_id: int,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> MovieReactionResponse:
+    """Снять лайк или дизлайк"""
+    return await set_movie_reaction(movie_id, None, current_user, session)
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Literal, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-import os
-import shutil
-from datetime import datetime
 
+import config.upload_config as upload_config
+from core.storage import IMAGES, store_upload
+from tasks.image_pipeline import strip_upload_metadata
+from api.services.media_service import get_blob
 from api.dependencies.auth import get_current_user_from_token as get_current_user
+from api.dependencies.pagination import PageParams, set_next_cursor
+from api.dependencies.fields import FieldsParam, card_fields, sparse_response
 from schemas.users import (
     UserCreate,
     UserRead,
     UserReadLimited,
+    UserCard,
     UserDeleteResponse,
     UserUpdateRequest,
     UserUpdateResponse,
@@ -23,7 +28,7 @@ from schemas.users import (
 )
 from schemas.comments import CommentRead
 from api.services.user_service import check_user_permissions
-from db.session import get_db
+from db.session import get_db, get_read_db
 from api.services.user_service import (
     create_new_user,
     delete_user,
@@ -34,7 +39,8 @@ from api.services.user_service import (
     get_user_by_username,
     update_user_role,
     update_user_level,
-    add_money
+    add_money,
+    set_user_image
 )
 from api.services.comment_service import get_user_comments
 from db.models.users import User
@@ -67,11 +73,15 @@ async def read_users_me(
 @user_router.get("/{user_id}/comments", response_model=list[CommentRead])
 async def get_user_comments_router(
     user_id: int,
-    session: AsyncSession = Depends(get_db),
+    response: Response,
+    page: PageParams = Depends(),
+    session: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> list[CommentRead]:
     try:
-        return await get_user_comments(user_id, session)
+        comments, next_cursor = await get_user_comments(user_id, session, page.limit, page.cursor)
+        set_next_cursor(response, next_cursor)
+        return comments
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -82,23 +92,37 @@ async def get_user_comments_router(
 
 @user_router.get("/", response_model=list[UserRead])
 async def get_users_router(
-    session: AsyncSession = Depends(get_db)
+    response: Response,
+    page: PageParams = Depends(),
+    fields: Optional[List[str]] = Depends(FieldsParam(UserRead)),
+    view: Optional[Literal["card"]] = Query(None, description="card - облегченные карточки UserCard"),
+    session: AsyncSession = Depends(get_read_db)
 ) -> list[UserRead]:
-    return await get_users(session)
+    if fields is None and view == "card":
+        fields = card_fields(UserCard)
+    users, next_cursor = await get_users(session, page.limit, page.cursor, fields)
+    set_next_cursor(response, next_cursor)
+    if fields is not None:
+        return sparse_response(users, response)
+    return users
 
 @user_router.get("/{user_id}", response_model=UserReadLimited)
 async def get_user_router(
     user_id: int,
-    session: AsyncSession = Depends(get_db),
+    response: Response,
+    fields: Optional[List[str]] = Depends(FieldsParam(UserReadLimited)),
+    session: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> UserReadLimited:
     try:
-        user = await get_user_limited(user_id, session)
+        user = await get_user_limited(user_id, session, fields)
         if user is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"User with id {user_id} not found"
             )
+        if fields is not None:
+            return sparse_response(user, response)
         return user
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -152,7 +176,7 @@ async def delete_user_router(
 @user_router.get("/username/{username}", response_model=UserRead)
 async def get_user_by_username_router(
     username: str,
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_read_db)
 ) -> UserRead:
     user = await get_user_by_username(username, session)
     if user is None:
@@ -205,6 +229,8 @@ async def update_user_level_router(
         current_user=current_user
     )
 
+IMAGE_TYPES = ['photo', 'header_photo']
+
 @user_router.post("/upload/{type}", response_model=UserRead)
 async def upload_user_image(
     type: str,
@@ -213,36 +239,30 @@ async def upload_user_image(
     session: AsyncSession = Depends(get_db)
 ) -> UserRead:
     """Загрузка изображения пользователя (аватар или заголовок)"""
-    if type not in ['photo', 'header_photo']:
+    if type not in IMAGE_TYPES:
         raise HTTPException(status_code=400, detail="Неверный тип изображения")
-        
-    # Создаем директорию для изображений пользователя, если она не существует
-    user_dir = f"server/media/users/{current_user.user_id}"
-    os.makedirs(user_dir, exist_ok=True)
-    
-    # Генерируем уникальное имя файла
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    new_filename = f"{type}_{timestamp}{file_extension}"
-    file_path = os.path.join(user_dir, new_filename)
-    
-    # Сохраняем файл
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}")
-    finally:
-        file.file.close()
-    
-    # Обновляем путь к файлу в базе данных
-    relative_path = f"http://127.0.0.1:8000/media/users/{current_user.user_id}/{new_filename}"
-    update_data = {type: relative_path}
     
-    return await update_user(
-        updated_user_params=update_data,
-        user_id=current_user.user_id,
-        current_user=current_user,
-        session=session
+    # Сохраняем файл по частям вне event loop; одинаковые файлы хранятся один раз
+    stored = await store_upload(
+        file,
+        IMAGES,
+        max_size=upload_config.IMAGE_MAX_SIZE,
+        content_types=upload_config.IMAGE_CONTENT_TYPES,
+        transform=strip_upload_metadata
     )
+    return await set_user_image(type, stored, current_user, session)
+
+@user_router.put("/upload/{type}/{sha256}", response_model=UserRead)
+async def set_user_image_by_hash(
+    type: str,
+    sha256: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db)
+) -> UserRead:
+    """Установить уже загруженное изображение по SHA-256, не загружая файл повторно"""
+    if type not in IMAGE_TYPES:
+        raise HTTPException(status_code=400, detail="Неверный тип изображения")
+    
+    stored = await get_blob(sha256, IMAGES, session)
+    return await set_user_image(type, stored, current_user, session)
 
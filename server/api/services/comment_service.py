@@ -1,7 +1,8 @@
 from fastapi import HTTPException
-from typing import Union, List
+from typing import Union, List, Optional, Tuple
 from schemas.comments import CommentCreate, CommentRead
 from db.dals.comment_dal import CommentDAL
+from db.dals.pagination import InvalidCursorError
 from db.models.users import User
 from db.models.movies import Movie
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -77,9 +78,17 @@ async def get_comment(comment_id: int, session: AsyncSession) -> CommentRead:
         user=comment.user
     )
 
-async def get_movie_comments(movie_id: int, session: AsyncSession) -> List[CommentRead]:
+async def get_movie_comments(
+    movie_id: int,
+    session: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[CommentRead], Optional[str]]:
     comment_dal = CommentDAL(session)
-    comments = await comment_dal.get_movie_comments(movie_id)
+    try:
+        comments, next_cursor = await comment_dal.get_movie_comments(movie_id, limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
         
     return [CommentRead(
         comment_id=comment.comment_id,
@@ -92,7 +101,7 @@ async def get_movie_comments(movie_id: int, session: AsyncSession) -> List[Comme
         updated_at=comment.updated_at,
         is_active=comment.is_active,
         user=comment.user
-    ) for comment in comments]
+    ) for comment in comments], next_cursor
 
 async def get_comment_replies(comment_id: int, session: AsyncSession) -> List[CommentRead]:
     comment_dal = CommentDAL(session)
@@ -142,9 +151,17 @@ async def update_comment(comment_id: int, updated_comment_params: dict, current_
         user=updated_comment.user
     )
 
-async def get_user_comments(user_id: int, session: AsyncSession) -> List[CommentRead]:
+async def get_user_comments(
+    user_id: int,
+    session: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[CommentRead], Optional[str]]:
     comment_dal = CommentDAL(session)
-    comments = await comment_dal.get_user_comments(user_id)
+    try:
+        comments, next_cursor = await comment_dal.get_user_comments(user_id, limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
         
     return [CommentRead(
         comment_id=comment.comment_id,
@@ -157,4 +174,4 @@ async def get_user_comments(user_id: int, session: AsyncSession) -> List[Comment
         updated_at=comment.updated_at,
         is_active=comment.is_active,
         user=comment.user
-    ) for comment in comments] 
\ No newline at end of file
+    ) for comment in comments], next_cursor 
\ No newline at end of file
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime
+from typing import FrozenSet, Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config.cache_config as cache_config
+from core.cache import TTLCache
+from db.dals.episode_dal import EpisodeDAL
+from db.models.users import User
+
+
+class Entitlements:
+    """Права пользователя на просмотр: срок премиум-подписки и купленные эпизоды"""
+
+    __slots__ = ("premium_until", "purchased_episode_ids", "loaded_at")
+
+    def __init__(
+        self,
+        premium_until: Optional[datetime],
+        purchased_episode_ids: FrozenSet[int],
+        loaded_at: Optional[float] = None
+    ):
+        self.premium_until = premium_until
+        self.purchased_episode_ids = purchased_episode_ids
+        # Когда список покупок прочитан из базы, по time.monotonic()
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+
+    def is_premium_active(self) -> bool:
+        # Истечение подписки учитывается при каждом чтении, а не только при перезагрузке записи
+        return self.premium_until is not None and datetime.now() < self.premium_until
+
+    def has_access(self, episode_id: int) -> bool:
+        return self.is_premium_active() or episode_id in self.purchased_episode_ids
+
+
+# Кэш локален для процесса: выданный доступ виден другим воркерам не позже чем через
+# ENTITLEMENT_CACHE_TTL, а отказ перепроверяется по записи старше ENTITLEMENT_NEGATIVE_TTL
+entitlement_cache = TTLCache(
+    maxsize=cache_config.ENTITLEMENT_CACHE_SIZE,
+    ttl=cache_config.ENTITLEMENT_CACHE_TTL
+)
+
+
+def _premium_until(user: User) -> Optional[datetime]:
+    return user.premium_until if user.is_premium else None
+
+
+async def get_entitlements(user: User, session: AsyncSession, episode_ids: Iterable[int] = ()) -> Entitlements:
+    """
+    Права пользователя из кэша, при промахе - одним запросом к купленным эпизодам.
+    Если запись старше ENTITLEMENT_NEGATIVE_TTL и отказывает в каком-то из episode_ids,
+    покупки перечитываются: эпизод мог быть куплен через другой воркер
+    """
+    entitlements = entitlement_cache.get(user.user_id)
+    if entitlements is not None and time.monotonic() - entitlements.loaded_at > cache_config.ENTITLEMENT_NEGATIVE_TTL:
+        if not all(entitlements.has_access(episode_id) for episode_id in episode_ids):
+            entitlements = None
+    if entitlements is None:
+        purchased_ids = await EpisodeDAL(session).get_purchased_episode_ids(user.user_id)
+        entitlements = Entitlements(_premium_until(user), frozenset(purchased_ids))
+        entitlement_cache.set(user.user_id, entitlements)
+    return entitlements
+
+
+def record_episode_purchase(user_id: int, episode_id: int) -> None:
+    """Добавляет купленный эпизод в запись кэша, если она есть"""
+    entitlements = entitlement_cache.peek(user_id)
+    if entitlements is not None:
+        entitlement_cache.set(user_id, Entitlements(
+            entitlements.premium_until,
+            entitlements.purchased_episode_ids | {episode_id},
+            entitlements.loaded_at
+        ))
+
+
+def record_premium_change(user: User) -> None:
+    """Обновляет срок премиум-подписки в записи кэша, если она есть"""
+    entitlements = entitlement_cache.peek(user.user_id)
+    if entitlements is not None:
+        entitlement_cache.set(user.user_id, Entitlements(
+            _premium_until(user),
+            entitlements.purchased_episode_ids,
+            entitlements.loaded_at
+        ))
+
+
+def invalidate_entitlements(user_id: int) -> None:
+    entitlement_cache.pop(user_id)
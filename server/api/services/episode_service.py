@@ -1,57 +1,44 @@
 from fastapi import HTTPException, UploadFile
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
-import os
-import shutil
+import config.upload_config as upload_config
+from core.storage import VIDEOS, store_upload
+from core.uploads import StoredFile
+from core.media import media_signer
 from schemas.episodes import EpisodeCreate, EpisodeList, EpisodeDetail
 from db.dals.episode_dal import EpisodeDAL
-from db.models.episodes import Episode, PurchasedEpisode
+from db.dals.pagination import InvalidCursorError
+from db.models.episodes import Episode
 from db.models.movies import Movie
 from db.models.users import User
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 from db.dals.user_dal import UserDAL
-from sqlalchemy import select, and_
+from api.services.media_service import reference_media, release_media
+from api.services.entitlement_service import get_entitlements, record_episode_purchase
+from api.services.principal_service import invalidate_principal
 
-async def save_video_file(file: UploadFile, movie_id: int) -> str:
-    """Сохраняет видеофайл и возвращает путь к нему"""
-    # Создаем директорию для фильма, если она не существует
-    movie_dir = f"server/media/videos/movie_{movie_id}"
-    os.makedirs(movie_dir, exist_ok=True)
-    
-    # Генерируем уникальное имя файла
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    new_filename = f"episode_{timestamp}{file_extension}"
-    file_path = os.path.join(movie_dir, new_filename)
-    
-    # Сохраняем файл
+async def save_video_file(file: UploadFile) -> StoredFile:
+    """Сохраняет видеофайл в хранилище по содержимому"""
+    return await store_upload(
+        file,
+        VIDEOS,
+        max_size=upload_config.VIDEO_MAX_SIZE,
+        content_types=upload_config.VIDEO_CONTENT_TYPES
+    )
+
+async def get_episodes_access(user: User, episode_ids: List[int], session: AsyncSession) -> Dict[int, bool]:
+    """Проверяет доступ пользователя сразу к списку эпизодов по кэшу прав"""
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}")
-    finally:
-        file.file.close()
-    
-    return f"/media/videos/movie_{movie_id}/{new_filename}"
+        entitlements = await get_entitlements(user, session, episode_ids)
+    except Exception:
+        return {episode_id: user.is_premium_active() for episode_id in episode_ids}
+    return {episode_id: entitlements.has_access(episode_id) for episode_id in episode_ids}
 
 async def check_episode_access(user: User, episode_id: int, session: AsyncSession) -> bool:
     """Проверяет доступ пользователя к эпизоду"""
-    if user.is_premium_active():
-        return True
-        
-    try:
-        purchased = await session.execute(
-            select(PurchasedEpisode).where(
-                and_(
-                    PurchasedEpisode.user_id == user.user_id,
-                    PurchasedEpisode.episode_id == episode_id
-                )
-            )
-        )
-        return purchased.scalar_one_or_none() is not None
-    except Exception:
-        return False
+    access = await get_episodes_access(user, [episode_id], session)
+    return access[episode_id]
 
 async def create_new_episode(body: EpisodeCreate, session: AsyncSession, current_user: User) -> EpisodeList:
     episode_dal = EpisodeDAL(session)
@@ -65,18 +52,20 @@ async def create_new_episode(body: EpisodeCreate, session: AsyncSession, current
     if not movie.can_modify(current_user):
         raise HTTPException(status_code=403, detail="У вас нет прав на добавление эпизодов к этому фильму")
     
-    # Сохраняем видеофайл
-    video_path = await save_video_file(body.video, body.movie_id)
+    # Сохраняем видеофайл; ссылка на него учитывается тем же коммитом, что и эпизод
+    stored = await save_video_file(body.video)
+    await reference_media(stored, session)
         
     new_episode = await episode_dal.create_episode(
         movie_id=body.movie_id,
         title=body.title,
-        video_file=video_path,
+        video_file=stored.url,
         episode_number=body.episode_number,
         cost=body.cost
     )
     
-    has_access = await check_episode_access(current_user, new_episode.episode_id, session)
+    # Новый эпизод еще никто не покупал, доступ есть только по премиум-подписке
+    has_access = current_user.is_premium_active()
     
     return EpisodeList(
         episode_id=new_episode.episode_id,
@@ -114,7 +103,8 @@ async def get_episode(episode_id: int, session: AsyncSession, current_user: User
             episode_id=episode.episode_id,
             movie_id=episode.movie_id,
             title=episode.title,
-            video_file=episode.video_file,
+            # Подписанная ссылка: без доступа к эпизоду видео не получить даже по пути
+            video_file=media_signer.sign(episode.video_file, current_user.user_id) if has_access else "",
             episode_number=episode.episode_number,
             cost=episode.cost,
             created_at=episode.created_at,
@@ -129,7 +119,28 @@ async def get_episode(episode_id: int, session: AsyncSession, current_user: User
             detail=f"Внутренняя ошибка сервера: {str(e)}"
         )
 
-async def get_episodes_by_movie(movie_id: int, session: AsyncSession, current_user: User) -> List[EpisodeList]:
+async def get_episode_video(episode_id: int, session: AsyncSession, current_user: User) -> str:
+    """Проверяет доступ к видео эпизода и возвращает путь к файлу"""
+    episode = await EpisodeDAL(session).get_episode(episode_id=episode_id)
+    if episode is None:
+        raise HTTPException(status_code=404, detail=f"Эпизод с id {episode_id} не найден")
+    
+    movie = await session.get(Movie, episode.movie_id)
+    if not movie.can_access(current_user):
+        raise HTTPException(status_code=403, detail="У вас нет доступа к этому эпизоду")
+    
+    if not await check_episode_access(current_user, episode_id, session):
+        raise HTTPException(status_code=403, detail="У вас нет доступа к этому эпизоду")
+    
+    return episode.video_file
+
+async def get_episodes_by_movie(
+    movie_id: int,
+    session: AsyncSession,
+    current_user: User,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[EpisodeList], Optional[str]]:
     try:
         # Проверяем существование фильма и доступ
         movie = await session.get(Movie, movie_id)
@@ -140,23 +151,35 @@ async def get_episodes_by_movie(movie_id: int, session: AsyncSession, current_us
             raise HTTPException(status_code=403, detail="У вас нет доступа к этому фильму")
             
         episode_dal = EpisodeDAL(session)
-        episodes = await episode_dal.get_episodes_by_movie(movie_id=movie_id)
+        try:
+            episodes, next_cursor = await episode_dal.get_episodes_by_movie(
+                movie_id=movie_id,
+                limit=limit,
+                cursor=cursor
+            )
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        access = await get_episodes_access(
+            current_user,
+            [episode.episode_id for episode in episodes],
+            session
+        )
         
         result = []
         for episode in episodes:
-            has_access = await check_episode_access(current_user, episode.episode_id, session)
             result.append(EpisodeList(
-            episode_id=episode.episode_id,
-            movie_id=episode.movie_id,
-            title=episode.title,
-            episode_number=episode.episode_number,
-            cost=episode.cost,
-            created_at=episode.created_at,
+                episode_id=episode.episode_id,
+                movie_id=episode.movie_id,
+                title=episode.title,
+                episode_number=episode.episode_number,
+                cost=episode.cost,
+                created_at=episode.created_at,
                 updated_at=episode.updated_at,
-                has_access=has_access
+                has_access=access[episode.episode_id]
             ))
         
-        return result
+        return result, next_cursor
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -196,6 +219,7 @@ async def delete_episode(episode_id: int, session: AsyncSession, current_user: U
         if not movie.can_modify(current_user):
             raise HTTPException(status_code=403, detail="У вас нет прав на удаление этого эпизода")
             
+        await release_media(episode.video_file, session)
         return await episode_dal.delete_episode(episode_id=episode_id)
 
 async def purchase_episode(episode_id: int, session: AsyncSession, current_user: User) -> EpisodeList:
@@ -208,27 +232,25 @@ async def purchase_episode(episode_id: int, session: AsyncSession, current_user:
     if await check_episode_access(current_user, episode_id, session):
         raise HTTPException(status_code=400, detail="У вас уже есть доступ к этому эпизоду")
         
-    # Проверяем, достаточно ли денег
-    can_watch, message = current_user.can_watch_episode(episode.cost)
-    if not can_watch:
-        raise HTTPException(status_code=403, detail=message)
-        
-    # Списываем деньги
-    current_user.money -= episode.cost
+    # Списание и запись о покупке - одна транзакция. Баланс проверяется в UPDATE,
+    # а повторную покупку отсекает уникальный индекс: параллельные запросы не списывают дважды
+    cost = episode.cost
+    money = await UserDAL(session).debit_money(current_user.user_id, cost)
+    if money is None:
+        await session.rollback()
+        raise HTTPException(status_code=403, detail=f"Недостаточно денег. Нужно {cost} монет")
     
-    # Создаем запись о покупке
-    purchased_episode = PurchasedEpisode(
-        user_id=current_user.user_id,
-        episode_id=episode_id,
-        cost=episode.cost
-    )
-    session.add(purchased_episode)
+    if not await EpisodeDAL(session).add_purchase(current_user.user_id, episode_id, cost):
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="У вас уже есть доступ к этому эпизоду")
     
     await session.commit()
-    await session.refresh(current_user)
+    # Баланс известен из RETURNING, перечитывать пользователя не нужно
+    set_committed_value(current_user, "money", money)
+    invalidate_principal(current_user.user_id)
+    record_episode_purchase(current_user.user_id, episode_id)
     
-    # Возвращаем обновленную информацию об эпизоде
-    has_access = await check_episode_access(current_user, episode_id, session)
+    # Эпизод только что куплен, повторная проверка доступа не нужна
     return EpisodeList(
         episode_id=episode.episode_id,
         movie_id=episode.movie_id,
@@ -237,5 +259,5 @@ async def purchase_episode(episode_id: int, session: AsyncSession, current_user:
         cost=episode.cost,
         created_at=episode.created_at,
         updated_at=episode.updated_at,
-        has_access=has_access
+        has_access=True
     ) 
\ No newline at end of file
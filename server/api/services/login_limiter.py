@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+
+import config.security_config as security_config
+from core.config import MAX_LOGIN_ATTEMPTS, LOGIN_ATTEMPT_WINDOW
+from core.rate_limit import (
+    CounterStore,
+    InMemoryRateLimiter,
+    LocalCounterStore,
+    RateLimiter,
+    SharedStoreRateLimiter
+)
+from db.dals.rate_limit_dal import RateLimitDAL
+from db.session import async_session
+
+EMAIL = "email"
+IP = "ip"
+
+
+class PostgresCounterStore(CounterStore):
+    """Общее хранилище счетчиков в UNLOGGED-таблице rate_limit_counters"""
+
+    async def get(self, keys: List[str]) -> Dict[str, int]:
+        async with async_session() as session:
+            return await RateLimitDAL(session).get_counts(keys)
+
+    async def increment(self, key: str, ttl: float, amount: int = 1) -> int:
+        async with async_session() as session:
+            return await RateLimitDAL(session).increment(key, datetime.now() + timedelta(seconds=ttl), amount)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        async with async_session() as session:
+            await RateLimitDAL(session).delete_counters(keys)
+
+    async def prune(self) -> int:
+        async with async_session() as session:
+            return await RateLimitDAL(session).delete_expired()
+
+
+def create_login_limiter() -> RateLimiter:
+    window = LOGIN_ATTEMPT_WINDOW * 60
+    limits = {
+        EMAIL: (MAX_LOGIN_ATTEMPTS, window),
+        IP: (security_config.LOGIN_IP_MAX_ATTEMPTS, window),
+    }
+    if security_config.LOGIN_RATE_LIMIT_BACKEND == "shared":
+        store = PostgresCounterStore() if security_config.LOGIN_RATE_LIMIT_STORE == "postgres" else LocalCounterStore()
+        return SharedStoreRateLimiter(limits, store, prefix="login")
+    return InMemoryRateLimiter(limits, max_keys=security_config.LOGIN_RATE_LIMIT_MAX_KEYS)
+
+
+login_limiter = create_login_limiter()
+
+
+def _email_key(email: str) -> str:
+    return email.strip().lower()
+
+
+async def acquire_login_attempt(email: str, client_ip: Optional[str]) -> None:
+    """
+    Учитывает попытку входа до обращения к базе и проверки пароля; 429, если лимит исчерпан.
+    Попытка считается сразу, а не после неудачи: иначе параллельные попытки, ждущие
+    проверки пароля в пуле, проходили бы проверку лимита все разом
+    """
+    email_key = _email_key(email)
+    retry_after = await login_limiter.acquire(EMAIL, email_key)
+    if retry_after is None and client_ip:
+        retry_after = await login_limiter.acquire(IP, client_ip)
+        if retry_after is not None:
+            # Попытка не состоялась: возвращаем ее в лимит учетной записи
+            await login_limiter.release(EMAIL, email_key)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(max(int(retry_after), 1))}
+        )
+
+
+async def record_login_success(email: str, client_ip: Optional[str]) -> None:
+    # Успешный вход снимает ограничение с учетной записи, а с адреса - только свою попытку:
+    # иначе перебор по многим email с одного адреса сбрасывался бы своим же входом
+    await login_limiter.reset(EMAIL, _email_key(email))
+    if client_ip:
+        await login_limiter.release(IP, client_ip)
@@ -0,0 +1,28 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.storage import SHA256_RE, blob_hash
+from core.uploads import StoredFile, media_path
+from db.dals.media_dal import MediaDAL
+from schemas.media import MediaBlobInfo
+
+async def get_blob(sha256: str, kind: str, session: AsyncSession) -> StoredFile:
+    """Файл хранилища по хешу: позволяет сослаться на уже загруженные байты без повторной загрузки"""
+    if not SHA256_RE.match(sha256):
+        raise HTTPException(status_code=422, detail="Ожидается SHA-256 в hex")
+    blob = await MediaDAL(session).get_blob(sha256)
+    if blob is None or not blob.path.startswith(f"/media/{kind}/"):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return StoredFile(media_path(blob.path), blob.size, blob.sha256, blob.path)
+
+async def get_blob_info(sha256: str, kind: str, session: AsyncSession) -> MediaBlobInfo:
+    blob = await get_blob(sha256, kind, session)
+    return MediaBlobInfo(sha256=blob.sha256, size=blob.size)
+
+async def reference_media(stored: StoredFile, session: AsyncSession) -> None:
+    await MediaDAL(session).add_reference(stored.sha256, stored.url, stored.size)
+
+async def release_media(url: Optional[str], session: AsyncSession) -> None:
+    sha256 = blob_hash(url)
+    if sha256 is not None:
+        await MediaDAL(session).release(sha256)
@@ -1,12 +1,22 @@
+import time
 from fastapi import HTTPException
-from typing import Union, List
+from typing import Union, List, Optional, Tuple
 from datetime import datetime
-from schemas.movies import MovieCreate, MovieRead
-from db.dals.movie_dal import MovieDAL
-from db.models.movies import Movie, MovieAccessLevel
+from schemas.movies import MovieCreate, MovieRead, MovieReactionResponse
+from db.dals.movie_dal import MovieDAL, dirty_movies
+from db.dals.pagination import InvalidCursorError
+from db.models.movies import Movie, MovieAccessLevel, ReactionType
+from db.dals.reaction_dal import ReactionDAL
 from db.models.users import User
 from sqlalchemy.ext.asyncio import AsyncSession
 
+def movie_fields(row, fields: List[str]) -> dict:
+    """Собирает частичное представление фильма из строки с выбранными колонками"""
+    data = {field: getattr(row, field) for field in fields}
+    if "genres" in data:
+        data["genres"] = data["genres"].split(",") if data["genres"] else []
+    return data
+
 async def create_new_movie(body: MovieCreate, session, current_user: User) -> MovieRead:
         movie_dal = MovieDAL(session)
         new_movie = await movie_dal.create_movie(
@@ -44,10 +54,10 @@ async def delete_movie(movie_id: int, session) -> Union[int, None]:
         deleted_movie_id = await movie_dal.delete_movie(movie_id=movie_id)
         return deleted_movie_id
 
-async def get_movie(movie_id: int, session) -> Union[MovieRead, None]:
+async def get_movie(movie_id: int, session, fields: Optional[List[str]] = None) -> Union[MovieRead, dict, None]:
     try:
         movie_dal = MovieDAL(session)
-        movie = await movie_dal.get_movie(movie_id=movie_id)
+        movie = await movie_dal.get_movie(movie_id=movie_id, columns=fields)
         
         if movie is None:
             raise HTTPException(
@@ -55,6 +65,9 @@ async def get_movie(movie_id: int, session) -> Union[MovieRead, None]:
                 detail=f"Фильм с id {movie_id} не найден"
             )
         
+        if fields is not None:
+            return movie_fields(movie, fields)
+        
         if not movie.is_active:
             raise HTTPException(
                 status_code=404,
@@ -77,6 +90,8 @@ async def get_movie(movie_id: int, session) -> Union[MovieRead, None]:
             updated_at=movie.updated_at,
             is_active=movie.is_active,
             movie_url=movie.movie_url,
+            like_count=movie.like_count,
+            dislike_count=movie.dislike_count,
         )
     except HTTPException as e:
         raise e
@@ -87,9 +102,20 @@ async def get_movie(movie_id: int, session) -> Union[MovieRead, None]:
             detail=f"Внутренняя ошибка сервера: {str(e)}"
         )
 
-async def get_movies(session) -> List[MovieRead]:
+async def get_movies(
+    session,
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> Tuple[List[Union[MovieRead, dict]], Optional[str]]:
+    """Если переданы fields, из базы читаются только эти колонки и возвращаются словари"""
     movie_dal = MovieDAL(session)
-    movies = await movie_dal.get_movies()
+    try:
+        movies, next_cursor = await movie_dal.get_movies(limit=limit, cursor=cursor, columns=fields)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if fields is not None:
+        return [movie_fields(movie, fields) for movie in movies], next_cursor
     return [MovieRead(
         movie_id=movie.movie_id,
         title=movie.title,
@@ -106,7 +132,9 @@ async def get_movies(session) -> List[MovieRead]:
         updated_at=movie.updated_at,
             is_active=movie.is_active,
             movie_url=movie.movie_url,
-        ) for movie in movies]
+            like_count=movie.like_count,
+            dislike_count=movie.dislike_count,
+        ) for movie in movies], next_cursor
 
 async def update_movie(updated_movie_params: dict, movie_id: int, session) -> Union[int, None]:
     movie_dal = MovieDAL(session)
@@ -189,10 +217,57 @@ async def update_movie_access_level(movie_id: int, access_level: MovieAccessLeve
     updated_movie = await movie_dal.get_movie(movie_id=movie_id)
     return updated_movie 
 
-async def update_all_movies_ratings(session: AsyncSession) -> None:
-    """Обновляет рейтинги всех активных фильмов"""
+async def get_movie_reaction(movie_id: int, user: User, session: AsyncSession) -> MovieReactionResponse:
+    """Реакция текущего пользователя на фильм и счетчики реакций"""
+    reaction_dal = ReactionDAL(session)
+    movie = await MovieDAL(session).get_movie(movie_id=movie_id, columns=["like_count", "dislike_count"])
+    if movie is None:
+        raise HTTPException(status_code=404, detail=f"Фильм с id {movie_id} не найден")
+    reaction = await reaction_dal.get_reaction(movie_id, user.user_id)
+    return MovieReactionResponse(
+        movie_id=movie_id,
+        reaction=reaction,
+        like_count=movie.like_count,
+        dislike_count=movie.dislike_count
+    )
+
+async def set_movie_reaction(
+    movie_id: int,
+    reaction: Union[ReactionType, None],
+    user: User,
+    session: AsyncSession
+) -> MovieReactionResponse:
+    """Ставит или снимает (reaction=None) реакцию пользователя на фильм"""
+    movie = await MovieDAL(session).get_movie(movie_id=movie_id, columns=["movie_id"])
+    if movie is None:
+        raise HTTPException(status_code=404, detail=f"Фильм с id {movie_id} не найден")
+    like_count, dislike_count = await ReactionDAL(session).set_reaction(movie_id, user.user_id, reaction)
+    return MovieReactionResponse(
+        movie_id=movie_id,
+        reaction=reaction,
+        like_count=like_count,
+        dislike_count=dislike_count
+    )
+
+async def update_all_movies_ratings(session: AsyncSession, full: bool = False) -> dict:
+    """
+    Сверяет рейтинг фильмов, чьи комментарии менялись с прошлого запуска.
+    full=True сверяет все фильмы (например, после перезапуска, когда список изменений потерян)
+    """
     movie_dal = MovieDAL(session)
-    movies = await movie_dal.get_movies()
-    
-    for movie in movies:
-        await movie_dal.update_movie_rating(movie.movie_id) 
\ No newline at end of file
+    movie_ids = None if full else dirty_movies.drain()
+    if movie_ids is not None and not movie_ids:
+        return {"movies_checked": 0, "rows_changed": 0, "elapsed": 0.0}
+
+    start_time = time.perf_counter()
+    try:
+        rows_changed = await movie_dal.recompute_ratings(movie_ids)
+    except Exception:
+        if movie_ids:
+            dirty_movies.restore(movie_ids)
+        raise
+    return {
+        "movies_checked": None if movie_ids is None else len(movie_ids),
+        "rows_changed": rows_changed,
+        "elapsed": time.perf_counter() - start_time
+    }
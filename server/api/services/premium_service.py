@@ -1,9 +1,12 @@
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 from db.dals.user_dal import UserDAL
 from db.models.users import User
+from tasks.premium_expiry import premium_expiry_scheduler
+from api.services.entitlement_service import invalidate_entitlements, record_premium_change
+from api.services.principal_service import invalidate_principal
 from fastapi import HTTPException
-import asyncio
 import logging
 import uuid
 
@@ -20,38 +23,6 @@ async def check_premium_status(user: User) -> bool:
     """Проверяет и обновляет статус премиум-подписки пользователя"""
     return user.check_and_update_premium_status()
 
-async def check_all_users_premium_status(session: AsyncSession) -> None:
-    """Проверяет статус премиум-подписки всех пользователей"""
-    try:
-        user_dal = UserDAL(session)
-        users = await user_dal.get_users()
-        
-        for user in users:
-            if user.is_premium:
-                old_status = user.is_premium
-                new_status = user.check_and_update_premium_status()
-                
-                if old_status != new_status:
-                    logger.info(f"Premium status changed for user {user.user_id}: {old_status} -> {new_status}")
-        
-        await session.commit()
-    except Exception as e:
-        logger.error(f"Error checking premium status: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error checking premium status")
-
-async def start_premium_checker(session: AsyncSession, check_interval: int = 3600) -> None:
-    """
-    Запускает фоновую задачу для проверки премиум-статуса
-    check_interval: интервал проверки в секундах (по умолчанию 1 час)
-    """
-    while True:
-        try:
-            await check_all_users_premium_status(session)
-            await asyncio.sleep(check_interval)
-        except Exception as e:
-            logger.error(f"Error in premium checker: {str(e)}")
-            await asyncio.sleep(60)  # Ждем минуту перед повторной попыткой
-
 async def purchase_premium(
     user: User,
     months: int,
@@ -68,25 +39,23 @@ async def purchase_premium(
         # Рассчитываем стоимость
         price_rub = PREMIUM_PRICES["RUB"] * months
         
-        # Проверяем баланс пользователя
-        if user.money < price_rub:
+        # Списание и продление подписки - один UPDATE с проверкой баланса:
+        # параллельные покупки не уводят баланс в минус и не теряют продление
+        purchase = await UserDAL(session).purchase_premium(user.user_id, price_rub, days=30 * months)
+        if purchase is None:
             raise HTTPException(
                 status_code=400,
                 detail=f"Недостаточно средств. Требуется {price_rub} монет"
             )
         
-        # Списываем средства
-        user.money -= price_rub
-        
-        # Добавляем премиум-подписку
-        if not user.is_premium or not user.premium_until:
-            user.premium_until = datetime.now()
-        user.premium_until += timedelta(days=30 * months)
-        user.is_premium = True
-        
-        # Сохраняем изменения
-        await session.commit()
-        await session.refresh(user)
+        # Новые значения известны из RETURNING, перечитывать пользователя не нужно
+        set_committed_value(user, "money", purchase.money)
+        set_committed_value(user, "is_premium", purchase.is_premium)
+        set_committed_value(user, "premium_until", purchase.premium_until)
+        record_premium_change(user)
+        invalidate_principal(user.user_id)
+        # Снятие подписки назначается на точный момент истечения
+        premium_expiry_scheduler.schedule(user.user_id, purchase.premium_until)
         
         return {
             "success": True,
@@ -0,0 +1,106 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+import config.cache_config as cache_config
+from core.cache import TTLCache
+from db.dals.user_dal import UserDAL
+from db.models.users import User
+
+
+class Principal:
+    """Снимок строки пользователя для аутентификации запросов"""
+
+    __slots__ = ("user_id", "values")
+
+    def __init__(self, user_id: int, values: Dict[str, Any]):
+        self.user_id = user_id
+        self.values = values
+
+
+# Ключ - (sub, iat) токена: повторные запросы с тем же токеном не обращаются к базе.
+# Кэш локален для процесса: изменения, сделанные другим воркером,
+# становятся видны не позже чем через PRINCIPAL_CACHE_TTL
+principal_cache = TTLCache(
+    maxsize=cache_config.PRINCIPAL_CACHE_SIZE,
+    ttl=cache_config.PRINCIPAL_CACHE_TTL
+)
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+# Поколения сбросов: номер последнего сброса каждого пользователя. Чтение из базы запоминает
+# номер до запроса и не кладет строку в кэш, если пользователя сбросили, пока шло чтение.
+# Номера нужны, только пока идут начатые до них чтения
+_generation = 0
+_invalidated: Dict[int, int] = {}
+_reads_in_flight: Counter = Counter()
+
+
+def _snapshot(user: User) -> Principal:
+    return Principal(user.user_id, {key: getattr(user, key) for key in _USER_COLUMNS})
+
+
+async def _attach(principal: Principal, session: AsyncSession) -> User:
+    """
+    Новый экземпляр User для сессии запроса, как будто он только что загружен:
+    запросы не делят объекты между собой, а изменения и refresh работают как обычно
+    """
+    user = User(**principal.values)
+    make_transient_to_detached(user)
+    return await session.merge(user, load=False)
+
+
+async def get_principal(email: str, issued_at: Optional[int], session: AsyncSession) -> Optional[User]:
+    """Пользователь по subject токена из кэша, при промахе - из базы"""
+    key = (email, issued_at)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return await _attach(principal, session)
+
+    started = _generation
+    _reads_in_flight[started] += 1
+    try:
+        user = await UserDAL(session).get_user_by_email(email=email)
+        # Отключенные и несуществующие пользователи не кэшируются: ответ для них - ошибка
+        if user is not None and user.is_active and _invalidated.get(user.user_id, 0) <= started:
+            principal_cache.set(key, _snapshot(user))
+    finally:
+        _finish_read(started)
+    return user
+
+
+def _finish_read(started: int) -> None:
+    _reads_in_flight[started] -= 1
+    if not _reads_in_flight[started]:
+        del _reads_in_flight[started]
+    if not _reads_in_flight:
+        _invalidated.clear()
+    elif len(_invalidated) > principal_cache.maxsize:
+        oldest = min(_reads_in_flight)
+        for user_id in [user_id for user_id, generation in _invalidated.items() if generation <= oldest]:
+            del _invalidated[user_id]
+
+
+def _mark_invalidated(user_ids: Iterable[int]) -> None:
+    global _generation
+    if not _reads_in_flight:
+        return
+    _generation += 1
+    for user_id in user_ids:
+        _invalidated[user_id] = _generation
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Сбрасывает записи пользователя после изменения его строки"""
+    _mark_invalidated([user_id])
+    principal_cache.pop_where(lambda principal: principal.user_id == user_id)
+
+
+def invalidate_principals(user_ids: Iterable[int]) -> None:
+    user_ids = set(user_ids)
+    if user_ids:
+        _mark_invalidated(user_ids)
+        principal_cache.pop_where(lambda principal: principal.user_id in user_ids)
@@ -0,0 +1,264 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+import config.upload_config as upload_config
+from core.storage import VIDEOS, blob_extension, commit_blob, hash_file, incoming_path
+from core.uploads import (
+    StoredFile,
+    UploadBusyError,
+    UploadOffsetError,
+    append_stream,
+    check_upload,
+    file_size,
+    lock_upload,
+    media_path
+)
+from api.services.media_service import get_blob, reference_media
+from db.dals.episode_dal import EpisodeDAL
+from db.models.episodes import Episode
+from db.models.movies import Movie
+from db.models.users import User
+from schemas.episodes import EpisodeList, EpisodeUploadCreate, EpisodeUploadStatus
+
+# Состояние сессии - небольшой JSON рядом с остальными медиа, без таблицы в базе.
+# Записанное смещение не хранится: это размер файла частей на диске
+UPLOAD_SESSIONS_DIR = upload_config.UPLOAD_SESSIONS_DIR
+
+
+def _session_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_SESSIONS_DIR, f"{upload_id}.json")
+
+
+def _lock_path(upload_id: str) -> str:
+    return os.path.join(UPLOAD_SESSIONS_DIR, f"{upload_id}.lock")
+
+
+def _write_session(state: dict) -> None:
+    os.makedirs(UPLOAD_SESSIONS_DIR, exist_ok=True)
+    path = _session_path(state["upload_id"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _read_session(upload_id: str) -> Optional[dict]:
+    try:
+        with open(_session_path(upload_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _remove_session(state: dict) -> None:
+    for path in (_session_path(state["upload_id"]), state["part_file"], _lock_path(state["upload_id"])):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _last_activity(state: dict) -> float:
+    try:
+        return os.stat(state["part_file"]).st_mtime
+    except FileNotFoundError:
+        return state.get("finalized_at", state["created_at"])
+
+
+def _status(state: dict) -> EpisodeUploadStatus:
+    return EpisodeUploadStatus(
+        upload_id=state["upload_id"],
+        # Файл, уже лежащий в хранилище, загружать не нужно
+        offset=state["size"] if "blob" in state else file_size(state["part_file"]),
+        size=state["size"],
+        expires_at=datetime.fromtimestamp(_last_activity(state) + upload_config.UPLOAD_SESSION_TTL)
+    )
+
+
+async def _get_own_session(upload_id: str, current_user: User) -> dict:
+    # upload_id - hex от uuid4, иначе он мог бы указать путь за пределами каталога сессий
+    try:
+        upload_id = uuid.UUID(hex=upload_id).hex
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Сессия загрузки не найдена")
+    state = await run_in_threadpool(_read_session, upload_id)
+    if state is None or state["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=404, detail="Сессия загрузки не найдена")
+    if _last_activity(state) + upload_config.UPLOAD_SESSION_TTL < time.time():
+        await run_in_threadpool(_remove_session, state)
+        raise HTTPException(status_code=404, detail="Сессия загрузки истекла")
+    return state
+
+
+async def _get_modifiable_movie(movie_id: int, session: AsyncSession, current_user: User) -> Movie:
+    movie = await session.get(Movie, movie_id)
+    if not movie:
+        raise HTTPException(status_code=404, detail=f"Фильм с id {movie_id} не найден")
+    if not movie.can_modify(current_user):
+        raise HTTPException(status_code=403, detail="У вас нет прав на добавление эпизодов к этому фильму")
+    return movie
+
+
+async def create_upload(body: EpisodeUploadCreate, session: AsyncSession, current_user: User) -> EpisodeUploadStatus:
+    """Открывает сессию загрузки видео эпизода"""
+    await _get_modifiable_movie(body.movie_id, session, current_user)
+    check_upload(
+        body.content_type,
+        body.size,
+        max_size=upload_config.VIDEO_MAX_SIZE,
+        content_types=upload_config.VIDEO_CONTENT_TYPES
+    )
+
+    upload_id = uuid.uuid4().hex
+    state = {
+        "upload_id": upload_id,
+        "user_id": current_user.user_id,
+        "movie_id": body.movie_id,
+        "title": body.title,
+        "episode_number": body.episode_number,
+        "cost": body.cost,
+        "size": body.size,
+        "extension": blob_extension(body.content_type, body.filename),
+        # Части пишутся сразу в раздел хранилища, при завершении файл только переименовывается
+        "part_file": incoming_path(VIDEOS, upload_id),
+        "created_at": time.time(),
+    }
+    if body.sha256 is not None:
+        try:
+            blob = await get_blob(body.sha256, VIDEOS, session)
+        except HTTPException:
+            blob = None
+        if blob is not None and blob.size == body.size:
+            state["blob"] = {"url": blob.url, "sha256": blob.sha256, "size": blob.size}
+    await run_in_threadpool(_write_session, state)
+    return _status(state)
+
+
+async def get_upload_status(upload_id: str, current_user: User) -> EpisodeUploadStatus:
+    return _status(await _get_own_session(upload_id, current_user))
+
+
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    stream: AsyncIterator[bytes],
+    current_user: User
+) -> EpisodeUploadStatus:
+    """Дописывает часть видео, начиная с offset"""
+    state = await _get_own_session(upload_id, current_user)
+    if "blob" in state:
+        raise HTTPException(status_code=409, detail="Файл уже загружен, загрузку нужно завершить")
+    try:
+        await append_stream(
+            state["part_file"],
+            offset,
+            stream,
+            max_size=state["size"]
+        )
+    except UploadOffsetError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Неверное смещение, загрузку нужно продолжить с {e.offset}"
+        )
+    except UploadBusyError:
+        raise HTTPException(status_code=409, detail="В эту загрузку уже идет запись")
+    return _status(state)
+
+
+def _episode_list(episode: Episode, current_user: User) -> EpisodeList:
+    return EpisodeList(
+        episode_id=episode.episode_id,
+        movie_id=episode.movie_id,
+        title=episode.title,
+        episode_number=episode.episode_number,
+        cost=episode.cost,
+        created_at=episode.created_at,
+        updated_at=episode.updated_at,
+        has_access=current_user.is_premium_active()
+    )
+
+
+async def finalize_upload(upload_id: str, session: AsyncSession, current_user: User) -> EpisodeList:
+    """
+    Завершает загрузку и создает эпизод. Завершение идет под блокировкой сессии,
+    а созданный эпизод запоминается в ней: повторный запрос возвращает тот же эпизод
+    """
+    state = await _get_own_session(upload_id, current_user)
+    await _get_modifiable_movie(state["movie_id"], session, current_user)
+    try:
+        lock = await run_in_threadpool(lock_upload, _lock_path(state["upload_id"]))
+    except UploadBusyError:
+        raise HTTPException(status_code=409, detail="Загрузка уже завершается")
+    try:
+        # Пока ждали блокировку, сессию могли завершить или отменить
+        state = await _get_own_session(upload_id, current_user)
+        episode_dal = EpisodeDAL(session)
+        if "episode_id" in state:
+            episode = await episode_dal.get_episode(state["episode_id"])
+            if episode is None:
+                raise HTTPException(status_code=409, detail="Загрузка уже завершена, эпизод удален")
+            return _episode_list(episode, current_user)
+
+        if "blob" not in state:
+            offset = file_size(state["part_file"])
+            if offset != state["size"]:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Загрузка не завершена: получено {offset} из {state['size']} байт"
+                )
+            sha256, size = await hash_file(state["part_file"])
+            stored = await commit_blob(state["part_file"], VIDEOS, sha256, size, state["extension"])
+            # Файл уже в хранилище: если создание эпизода не удастся, завершение повторяется без него
+            state["blob"] = {"url": stored.url, "sha256": stored.sha256, "size": stored.size}
+            await run_in_threadpool(_write_session, state)
+
+        blob = state["blob"]
+        stored = StoredFile(media_path(blob["url"]), blob["size"], blob["sha256"], blob["url"])
+        await reference_media(stored, session)
+        new_episode = await episode_dal.create_episode(
+            movie_id=state["movie_id"],
+            title=state["title"],
+            video_file=stored.url,
+            episode_number=state["episode_number"],
+            cost=state["cost"]
+        )
+        # Сессия остается до истечения, чтобы повтор завершения не создал второй эпизод
+        state["episode_id"] = new_episode.episode_id
+        state["finalized_at"] = time.time()
+        await run_in_threadpool(_write_session, state)
+        return _episode_list(new_episode, current_user)
+    finally:
+        await run_in_threadpool(lock.close)
+
+
+async def abort_upload(upload_id: str, current_user: User) -> None:
+    state = await _get_own_session(upload_id, current_user)
+    await run_in_threadpool(_remove_session, state)
+
+
+def _expire_upload_sessions() -> int:
+    if not os.path.isdir(UPLOAD_SESSIONS_DIR):
+        return 0
+    deadline = time.time() - upload_config.UPLOAD_SESSION_TTL
+    expired = 0
+    for name in os.listdir(UPLOAD_SESSIONS_DIR):
+        if not name.endswith(".json"):
+            continue
+        state = _read_session(name.removesuffix(".json"))
+        if state is not None and _last_activity(state) < deadline:
+            _remove_session(state)
+            expired += 1
+    return expired
+
+
+async def expire_upload_sessions() -> int:
+    """Удаляет заброшенные сессии загрузки вместе с их файлами частей"""
+    return await run_in_threadpool(_expire_upload_sessions)
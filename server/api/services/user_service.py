@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-from typing import Union
+from typing import Union, List, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from schemas.users import (
@@ -13,8 +13,14 @@ from schemas.users import (
     LevelUpdateResponse
 )
 from db.dals.user_dal import UserDAL
+from db.dals.pagination import InvalidCursorError
 from db.models.users import User, UserRole
 from core.hashing import Hasher
+from core.uploads import StoredFile
+from api.services.media_service import reference_media, release_media
+from api.services.principal_service import invalidate_principal
+from tasks.image_pipeline import enqueue_image
+import config.upload_config as upload_config
 
 async def create_new_user(body: UserCreate, session) -> UserRead:
     user_dal = UserDAL(session)
@@ -22,7 +28,7 @@ async def create_new_user(body: UserCreate, session) -> UserRead:
         name=body.name,
         surname=body.surname,
         email=body.email,
-        hashed_password=Hasher.get_password_hash(body.password),
+        hashed_password=await Hasher.hash_password(body.password),
         role=UserRole.USER,
         username=body.username,
     )
@@ -35,6 +41,8 @@ async def create_new_user(body: UserCreate, session) -> UserRead:
         username=new_user.username,
         photo=new_user.photo,
         header_photo=new_user.header_photo,
+        photo_renditions=new_user.photo_renditions,
+        header_photo_renditions=new_user.header_photo_renditions,
         frame_photo=new_user.frame_photo,
         about=new_user.about,
         location=new_user.location,
@@ -60,6 +68,7 @@ async def delete_user(user_id: int, current_user: User, session) -> Union[int, N
         is_active=False,
         updated_at=datetime.now()
     )
+    invalidate_principal(user_id)
     
     return user_id
 
@@ -76,6 +85,8 @@ async def get_user(user_id, session) -> Union[UserRead, None]:
             username=user.username,
             photo=user.photo,
             header_photo=user.header_photo,
+            photo_renditions=user.photo_renditions,
+            header_photo_renditions=user.header_photo_renditions,
             frame_photo=user.frame_photo,
             about=user.about,
             location=user.location,
@@ -83,28 +94,32 @@ async def get_user(user_id, session) -> Union[UserRead, None]:
             created_at=user.created_at,
             updated_at=user.updated_at,
             role=user.role,
-            is_premium=user.is_premium,
-            premium_until=user.premium_until,
+            is_premium=user.is_premium_active(),
+            premium_until=user.active_premium_until,
             money=user.money,
             level=user.level,
             title=user.title
         )
     return None
 
-async def get_user_limited(user_id, session) -> Union[UserReadLimited, None]:
+async def get_user_limited(user_id, session, fields: Optional[List[str]] = None) -> Union[UserReadLimited, dict, None]:
     user_dal = UserDAL(session)
-    user = await user_dal.get_user(user_id=user_id)
+    user = await user_dal.get_user(user_id=user_id, columns=fields)
+    if user is not None and fields is not None:
+        return {field: getattr(user, field) for field in fields}
     if user is not None:
         return UserReadLimited(
             user_id=user.user_id,
             username=user.username,
             photo=user.photo,
             header_photo=user.header_photo,
+            photo_renditions=user.photo_renditions,
+            header_photo_renditions=user.header_photo_renditions,
             about=user.about,
             location=user.location,
             age=user.age,
             created_at=user.created_at,
-            is_premium=user.is_premium,
+            is_premium=user.is_premium_active(),
             level=user.level,
             title=user.title
         )
@@ -123,6 +138,8 @@ async def get_user_by_username(username, session) -> Union[UserRead, None]:
             username=user.username,
             photo=user.photo,
             header_photo=user.header_photo,
+            photo_renditions=user.photo_renditions,
+            header_photo_renditions=user.header_photo_renditions,
             frame_photo=user.frame_photo,
             about=user.about,
             location=user.location,
@@ -133,9 +150,20 @@ async def get_user_by_username(username, session) -> Union[UserRead, None]:
         )
     raise HTTPException(status_code=404, detail=f"User with username {username} not found")
 
-async def get_users(session) -> list[UserRead]:
+async def get_users(
+    session,
+    limit: int,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> Tuple[List[Union[UserRead, dict]], Optional[str]]:
+    """Если переданы fields, из базы читаются только эти колонки и возвращаются словари"""
     user_dal = UserDAL(session)
-    users = await user_dal.get_users()
+    try:
+        users, next_cursor = await user_dal.get_users(limit=limit, cursor=cursor, columns=fields)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if fields is not None:
+        return [{field: getattr(user, field) for field in fields} for user in users], next_cursor
     return [UserRead(
         user_id=user.user_id,
         name=user.name,
@@ -145,6 +173,8 @@ async def get_users(session) -> list[UserRead]:
         username=user.username,
         photo=user.photo,
         header_photo=user.header_photo,
+        photo_renditions=user.photo_renditions,
+        header_photo_renditions=user.header_photo_renditions,
         frame_photo=user.frame_photo,
         about=user.about,
         location=user.location,
@@ -152,17 +182,44 @@ async def get_users(session) -> list[UserRead]:
         created_at=user.created_at,
         updated_at=user.updated_at,
         role=user.role,
-        is_premium=user.is_premium,
-        premium_until=user.premium_until,
+        is_premium=user.is_premium_active(),
+        premium_until=user.active_premium_until,
         money=user.money,
         level=user.level,
         title=user.title
-    ) for user in users]
+    ) for user in users], next_cursor
 
 def check_user_permissions(target_user: User, current_user: User) -> bool:
     return current_user.can_modify_user(target_user)
 
-async def update_user(updated_user_params: dict, user_id: int, current_user: User, session) -> UserRead:
+async def set_user_image(image_type: str, stored: StoredFile, current_user: User, session) -> UserRead:
+    """Ставит файл хранилища аватаром или заголовком и переносит ссылку со старого файла"""
+    old_url = getattr(current_user, image_type)
+    await reference_media(stored, session)
+    await release_media(old_url, session)
+    
+    # Счетчики ссылок фиксируются тем же коммитом, что и новый путь к изображению.
+    # Копии прежнего изображения сбрасываются: до готовности новых показывается оригинал
+    updated_user = await update_user(
+        updated_user_params={image_type: f"{upload_config.MEDIA_BASE_URL}{stored.url}"},
+        user_id=current_user.user_id,
+        current_user=current_user,
+        session=session,
+        reset_fields=[f"{image_type}_renditions"]
+    )
+    
+    # Оригинал уже сохранен и показывается сразу, уменьшенные копии готовятся в фоне
+    enqueue_image(current_user.user_id, image_type, stored.url)
+    return updated_user
+
+async def update_user(
+    updated_user_params: dict,
+    user_id: int,
+    current_user: User,
+    session,
+    reset_fields: Sequence[str] = ()
+) -> UserRead:
+    """reset_fields - поля, которые обнуляются; None в updated_user_params означает, что поле не меняется"""
     user_dal = UserDAL(session)
     target_user = await user_dal.get_user(user_id=user_id)
     
@@ -183,8 +240,10 @@ async def update_user(updated_user_params: dict, user_id: int, current_user: Use
     await user_dal.update_user(
         user_id=user_id,
         **update_data,
+        **{field: None for field in reset_fields},
         updated_at=datetime.now()
     )
+    invalidate_principal(user_id)
     
     # Получаем обновленного пользователя
     updated_user = await user_dal.get_user(user_id=user_id)
@@ -203,6 +262,8 @@ async def update_user(updated_user_params: dict, user_id: int, current_user: Use
         username=updated_user.username,
         photo=updated_user.photo,
         header_photo=updated_user.header_photo,
+        photo_renditions=updated_user.photo_renditions,
+        header_photo_renditions=updated_user.header_photo_renditions,
         frame_photo=updated_user.frame_photo,
         about=updated_user.about,
         location=updated_user.location,
@@ -210,8 +271,8 @@ async def update_user(updated_user_params: dict, user_id: int, current_user: Use
         created_at=updated_user.created_at,
         updated_at=updated_user.updated_at,
         role=updated_user.role,
-        is_premium=updated_user.is_premium,
-        premium_until=updated_user.premium_until,
+        is_premium=updated_user.is_premium_active(),
+        premium_until=updated_user.active_premium_until,
         money=updated_user.money,
         level=updated_user.level,
         title=updated_user.title
@@ -237,6 +298,7 @@ async def update_user_role(user_id: int, role: UserRole, current_user: User, ses
         user_id=user_id,
         new_role=role
     )
+    invalidate_principal(user_id)
         
     updated_user = await user_dal.get_user(user_id=user_id)
     if not updated_user:
@@ -276,6 +338,7 @@ async def add_money(
     
     user.money += amount
     await db.commit()
+    invalidate_principal(user_id)
     await db.refresh(user)
     return user.money
 
@@ -305,6 +368,7 @@ async def update_user_level(user_id: int, new_level: int, session: AsyncSession,
     user.level = new_level
     user.title = title
     await session.commit()
+    invalidate_principal(user_id)
     await session.refresh(user)
     
     return {
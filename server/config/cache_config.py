@@ -0,0 +1,17 @@
+from envparse import Env
+
+env = Env()
+
+# Кэш прав доступа к эпизодам (премиум + купленные эпизоды) на пользователя.
+# Кэш локален для процесса, поэтому TTL ограничивает устаревание между воркерами
+ENTITLEMENT_CACHE_SIZE: int = env.int("ENTITLEMENT_CACHE_SIZE", default=10000)
+ENTITLEMENT_CACHE_TTL: float = env.float("ENTITLEMENT_CACHE_TTL", default=60.0)  # в секундах
+# Отказ в доступе живет меньше: покупка через другой воркер не обновляет кэш этого процесса,
+# и без перепроверки купленный эпизод оставался бы недоступен до ENTITLEMENT_CACHE_TTL.
+# Отказ по записи старше этого срока перепроверяется в базе; выданный доступ кэшируется на весь TTL
+ENTITLEMENT_NEGATIVE_TTL: float = env.float("ENTITLEMENT_NEGATIVE_TTL", default=2.0)  # в секундах
+
+# Кэш пользователя, от имени которого выполняется запрос, по subject и iat токена.
+# Изменения пользователя в этом процессе сбрасывают запись сразу, в других - через TTL
+PRINCIPAL_CACHE_SIZE: int = env.int("PRINCIPAL_CACHE_SIZE", default=10000)
+PRINCIPAL_CACHE_TTL: float = env.float("PRINCIPAL_CACHE_TTL", default=30.0)  # в секундах
@@ -0,0 +1,29 @@
+from envparse import Env
+
+env = Env()
+
+# Логирование SQL-запросов (включать только для отладки)
+DB_ECHO: bool = env.bool("DB_ECHO", default=False)
+
+# Параметры пула соединений
+DB_POOL_SIZE: int = env.int("DB_POOL_SIZE", default=10)
+DB_MAX_OVERFLOW: int = env.int("DB_MAX_OVERFLOW", default=20)
+DB_POOL_TIMEOUT: float = env.float("DB_POOL_TIMEOUT", default=30.0)  # в секундах
+DB_POOL_RECYCLE: int = env.int("DB_POOL_RECYCLE", default=1800)  # в секундах
+DB_POOL_PRE_PING: bool = env.bool("DB_POOL_PRE_PING", default=True)
+
+# Кэш подготовленных выражений asyncpg
+DB_STATEMENT_CACHE_SIZE: int = env.int("DB_STATEMENT_CACHE_SIZE", default=100)
+
+# Режим совместимости с PgBouncer (transaction pooling):
+# отключает кэш подготовленных выражений и делает их имена уникальными
+DB_PGBOUNCER_MODE: bool = env.bool("DB_PGBOUNCER_MODE", default=False)
+
+# Реплика для чтения (если не задана, чтение идет с основной базы)
+REPLICA_DATABASE_URL: str = env.str("REPLICA_DATABASE_URL", default="")
+# Максимально допустимое отставание реплики, в секундах
+REPLICA_MAX_LAG: float = env.float("REPLICA_MAX_LAG", default=2.0)
+# Как часто проверять состояние реплики, в секундах
+REPLICA_HEALTH_CHECK_INTERVAL: float = env.float("REPLICA_HEALTH_CHECK_INTERVAL", default=5.0)
+# Сколько секунд после записи пользователь читает с основной базы
+READ_YOUR_WRITES_WINDOW: float = env.float("READ_YOUR_WRITES_WINDOW", default=5.0)
@@ -0,0 +1,30 @@
+from envparse import Env
+
+env = Env()
+
+# Подписанные ссылки на видео: срок жизни и шаг округления срока.
+# Срок округляется вверх, чтобы в пределах шага ссылка не менялась и браузер мог ее кэшировать
+MEDIA_URL_TTL: int = env.int("MEDIA_URL_TTL", default=900)  # в секундах
+MEDIA_URL_TTL_STEP: int = env.int("MEDIA_URL_TTL_STEP", default=300)  # в секундах
+
+# Прежние значения SECRET_KEY: ссылки, подписанные ими, принимаются до истечения срока.
+# После смены SECRET_KEY старый ключ держат здесь не меньше MEDIA_URL_TTL
+MEDIA_URL_PREVIOUS_SECRETS: list = env.list("MEDIA_URL_PREVIOUS_SECRETS", default=[])
+
+MEDIA_IMAGE_MAX_AGE: int = env.int("MEDIA_IMAGE_MAX_AGE", default=3600)  # в секундах
+
+# Обработка загруженных фото и заголовков в пуле процессов
+IMAGE_PIPELINE_WORKERS: int = env.int("IMAGE_PIPELINE_WORKERS", default=2)
+IMAGE_PIPELINE_QUEUE_SIZE: int = env.int("IMAGE_PIPELINE_QUEUE_SIZE", default=1000)
+IMAGE_RENDITION_QUALITY: int = env.int("IMAGE_RENDITION_QUALITY", default=82)
+# Ширины копий; копия *_DEFAULT_WIDTH в WebP становится основной ссылкой photo / header_photo
+PHOTO_RENDITION_WIDTHS: list = env.list("PHOTO_RENDITION_WIDTHS", default=[64, 160, 320], subcast=int)
+PHOTO_DEFAULT_WIDTH: int = env.int("PHOTO_DEFAULT_WIDTH", default=320)
+HEADER_PHOTO_RENDITION_WIDTHS: list = env.list("HEADER_PHOTO_RENDITION_WIDTHS", default=[640, 1280, 1920], subcast=int)
+HEADER_PHOTO_DEFAULT_WIDTH: int = env.int("HEADER_PHOTO_DEFAULT_WIDTH", default=1280)
+
+# Сборщик мусора: файл без ссылок удаляется не раньше, чем через MEDIA_GC_GRACE после
+# последнего изменения, не больше MEDIA_GC_BATCH_SIZE файлов за пачку с паузой между пачками
+MEDIA_GC_GRACE: int = env.int("MEDIA_GC_GRACE", default=86400)  # в секундах
+MEDIA_GC_BATCH_SIZE: int = env.int("MEDIA_GC_BATCH_SIZE", default=100)
+MEDIA_GC_BATCH_PAUSE: float = env.float("MEDIA_GC_BATCH_PAUSE", default=1.0)  # в секундах
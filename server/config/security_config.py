@@ -0,0 +1,25 @@
+from envparse import Env
+
+env = Env()
+
+# Стоимость bcrypt. Хеши с другой стоимостью пересчитываются при следующем успешном входе
+BCRYPT_ROUNDS: int = env.int("BCRYPT_ROUNDS", default=12)
+
+# Хеширование паролей идет в отдельном пуле потоков, не больше PASSWORD_HASH_WORKERS одновременно.
+# Если в очереди уже PASSWORD_HASH_QUEUE_SIZE запросов, новые получают 503
+PASSWORD_HASH_WORKERS: int = env.int("PASSWORD_HASH_WORKERS", default=4)
+PASSWORD_HASH_QUEUE_SIZE: int = env.int("PASSWORD_HASH_QUEUE_SIZE", default=256)
+
+# Ограничение неудачных входов по email (MAX_LOGIN_ATTEMPTS за LOGIN_ATTEMPT_WINDOW из core.config)
+# и по IP. memory - точное окно в памяти процесса; shared - счетчики в общем хранилище:
+# local - замена хранилища в памяти процесса, postgres - таблица rate_limit_counters
+LOGIN_RATE_LIMIT_BACKEND: str = env.str("LOGIN_RATE_LIMIT_BACKEND", default="memory")
+LOGIN_RATE_LIMIT_STORE: str = env.str("LOGIN_RATE_LIMIT_STORE", default="local")
+LOGIN_RATE_LIMIT_MAX_KEYS: int = env.int("LOGIN_RATE_LIMIT_MAX_KEYS", default=100000)
+LOGIN_IP_MAX_ATTEMPTS: int = env.int("LOGIN_IP_MAX_ATTEMPTS", default=100)
+
+# Записи о попытках входа пишутся в login_attempts пачками в фоне
+LOGIN_AUDIT_BATCH_SIZE: int = env.int("LOGIN_AUDIT_BATCH_SIZE", default=500)
+LOGIN_AUDIT_FLUSH_INTERVAL: float = env.float("LOGIN_AUDIT_FLUSH_INTERVAL", default=1.0)  # в секундах
+LOGIN_AUDIT_QUEUE_SIZE: int = env.int("LOGIN_AUDIT_QUEUE_SIZE", default=10000)
+LOGIN_AUDIT_RETENTION_DAYS: int = env.int("LOGIN_AUDIT_RETENTION_DAYS", default=90)
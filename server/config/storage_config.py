@@ -0,0 +1,17 @@
+from envparse import Env
+
+env = Env()
+
+# Где хранятся медиафайлы: "local" (MEDIA_ROOT) или "s3" (S3-совместимое хранилище, например MinIO)
+STORAGE_BACKEND: str = env.str("STORAGE_BACKEND", default="local")
+
+S3_ENDPOINT_URL: str = env.str("S3_ENDPOINT_URL", default="http://localhost:9000")
+S3_BUCKET: str = env.str("S3_BUCKET", default="media")
+S3_ACCESS_KEY: str = env.str("S3_ACCESS_KEY", default="minioadmin")
+S3_SECRET_KEY: str = env.str("S3_SECRET_KEY", default="minioadmin")
+S3_REGION: str = env.str("S3_REGION", default="us-east-1")
+
+# Файлы крупнее части загружаются multipart; в памяти одновременно не больше
+# S3_UPLOAD_CONCURRENCY частей по S3_PART_SIZE байт (минимум S3 - 5 МБ)
+S3_PART_SIZE: int = env.int("S3_PART_SIZE", default=8 * 1024 * 1024)
+S3_UPLOAD_CONCURRENCY: int = env.int("S3_UPLOAD_CONCURRENCY", default=4)
@@ -0,0 +1,29 @@
+from envparse import Env
+
+env = Env()
+
+# Интервал сверки счетчиков рейтинга с комментариями, в секундах.
+# Рейтинг обновляется при каждом изменении комментария, сверка лишь исправляет расхождения
+# и затрагивает только фильмы, чьи комментарии менялись с прошлого запуска
+RATING_RECONCILE_INTERVAL: int = env.int("RATING_RECONCILE_INTERVAL", default=60)
+
+# Интервал удаления заброшенных сессий возобновляемой загрузки
+UPLOAD_CLEANUP_INTERVAL: int = env.int("UPLOAD_CLEANUP_INTERVAL", default=3600)  # в секундах
+
+# Интервал сборки мусора в хранилище медиафайлов
+MEDIA_GC_INTERVAL: int = env.int("MEDIA_GC_INTERVAL", default=21600)  # в секундах
+
+# Интервал удаления истекших счетчиков входа и записей о попытках входа старше срока хранения
+LOGIN_MAINTENANCE_INTERVAL: int = env.int("LOGIN_MAINTENANCE_INTERVAL", default=3600)  # в секундах
+
+
+# Планировщик истечения премиум-подписок (tasks/premium_expiry.py).
+# В памяти держатся только сроки ближайших PREMIUM_EXPIRY_LOOKAHEAD секунд, но не больше
+# PREMIUM_EXPIRY_MAX_ENTRIES; окно перечитывается из базы каждые PREMIUM_EXPIRY_INTERVAL
+# секунд вместе с контрольным снятием всех истекших подписок
+PREMIUM_EXPIRY_INTERVAL: int = env.int("PREMIUM_EXPIRY_INTERVAL", default=3600)  # в секундах
+PREMIUM_EXPIRY_LOOKAHEAD: int = env.int("PREMIUM_EXPIRY_LOOKAHEAD", default=7200)  # в секундах
+PREMIUM_EXPIRY_MAX_ENTRIES: int = env.int("PREMIUM_EXPIRY_MAX_ENTRIES", default=100000)
+PREMIUM_EXPIRY_PAGE_SIZE: int = env.int("PREMIUM_EXPIRY_PAGE_SIZE", default=1000)
+# Наибольший сон планировщика: за это время замечается перевод системных часов
+PREMIUM_EXPIRY_MAX_SLEEP: float = env.float("PREMIUM_EXPIRY_MAX_SLEEP", default=60.0)  # в секундах
\ No newline at end of file
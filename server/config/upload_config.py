@@ -0,0 +1,32 @@
+from envparse import Env
+
+env = Env()
+
+MEDIA_ROOT: str = env.str("MEDIA_ROOT", default="server/media")
+UPLOAD_CHUNK_SIZE: int = env.int("UPLOAD_CHUNK_SIZE", default=1024 * 1024)  # 1 МБ
+
+VIDEO_MAX_SIZE: int = env.int("VIDEO_MAX_SIZE", default=10 * 1024 ** 3)  # 10 ГБ
+VIDEO_CONTENT_TYPES: list = env.list(
+    "VIDEO_CONTENT_TYPES",
+    default=["video/mp4", "video/webm", "video/x-matroska", "video/quicktime"]
+)
+
+IMAGE_MAX_SIZE: int = env.int("IMAGE_MAX_SIZE", default=10 * 1024 ** 2)  # 10 МБ
+IMAGE_CONTENT_TYPES: list = env.list(
+    "IMAGE_CONTENT_TYPES",
+    default=["image/jpeg", "image/png", "image/webp", "image/gif"]
+)
+
+# Возобновляемая загрузка: состояние сессий хранится вне MEDIA_ROOT, чтобы не раздаваться статикой
+UPLOAD_SESSIONS_DIR: str = env.str("UPLOAD_SESSIONS_DIR", default="server/uploads")
+# Сколько живет незавершенная сессия без новых частей
+UPLOAD_SESSION_TTL: int = env.int("UPLOAD_SESSION_TTL", default=24 * 3600)  # в секундах
+
+# Раздача видео эпизодов. Если задан префикс, приложение только проверяет доступ,
+# а файл отдает nginx по заголовку X-Accel-Redirect (sendfile без копирования через Python);
+# префикс должен указывать на internal location, смотрящий в MEDIA_ROOT
+VIDEO_ACCEL_REDIRECT_PREFIX: str = env.str("VIDEO_ACCEL_REDIRECT_PREFIX", default="")
+VIDEO_CACHE_MAX_AGE: int = env.int("VIDEO_CACHE_MAX_AGE", default=3600)  # в секундах
+
+# Адрес, с которого браузер загружает изображения пользователей
+MEDIA_BASE_URL: str = env.str("MEDIA_BASE_URL", default="http://127.0.0.1:8000")
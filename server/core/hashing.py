@@ -1,11 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+import config.security_config as security_config
+
+# min_rounds и max_rounds совпадают со стоимостью по умолчанию: хеш с другой стоимостью
+# считается устаревшим, и verify_and_update возвращает для него новый хеш
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12
+    bcrypt__rounds=security_config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=security_config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=security_config.BCRYPT_ROUNDS
 )
 
+
+class PasswordHashPool:
+    """
+    Пул потоков для bcrypt: bcrypt отпускает GIL, поэтому потоков достаточно, и цикл событий
+    не блокируется на сотни миллисекунд. Одновременно выполняется не больше workers задач,
+    остальные ждут в очереди длиной не больше max_queue
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = asyncio.Semaphore(workers)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.run_time_total = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, func: Callable, *args):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Слишком много одновременных входов, повторите попытку позже",
+                headers={"Retry-After": "1"}
+            )
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        wait_time = started - queued
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self._slots.release()
+            self.completed += 1
+            self.run_time_total += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_time_avg": self.wait_time_total / self.completed if self.completed else 0.0,
+            "wait_time_max": self.wait_time_max,
+            "run_time_avg": self.run_time_total / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hash_pool = PasswordHashPool(
+    workers=security_config.PASSWORD_HASH_WORKERS,
+    max_queue=security_config.PASSWORD_HASH_QUEUE_SIZE
+)
+
+
 class Hasher:
     @staticmethod
     def get_password_hash(password: str) -> str:
@@ -14,3 +106,16 @@ class Hasher:
     @staticmethod
     def verify_password(password: str, hashed_password: str) -> bool:
         return pwd_context.verify(password, hashed_password)
+
+    @staticmethod
+    async def hash_password(password: str) -> str:
+        """Хеширует пароль в пуле, не блокируя цикл событий"""
+        return await password_hash_pool.run(pwd_context.hash, password)
+
+    @staticmethod
+    async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверяет пароль в пуле. Вторым значением возвращает новый хеш, если старый
+        получен с устаревшими параметрами, иначе None
+        """
+        return await password_hash_pool.run(pwd_context.verify_and_update, password, hashed_password)
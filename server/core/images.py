@@ -0,0 +1,103 @@
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+
+from PIL import Image, ImageOps, JpegImagePlugin
+
+# Формат копии: (имя для Pillow, расширение файла)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+
+# Защита от "бомб": изображения больше этого числа пикселей не декодируются
+MAX_IMAGE_PIXELS = 50_000_000
+
+
+def _without_alpha(image: Image.Image) -> Image.Image:
+    if image.mode == "RGB":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+    return background
+
+
+# Форматы, в которых бывают EXIF, GPS и XMP. В GIF их нет, он сохраняется как есть
+_METADATA_FORMATS = ("JPEG", "PNG", "WEBP")
+# Сегменты JPEG, не несущие сведений о снимке: JFIF, ICC-профиль, Adobe
+_JPEG_SAFE_SEGMENTS = ("APP0", "APP2", "APP14")
+
+
+def _has_metadata(image: Image.Image) -> bool:
+    if image.format == "JPEG":
+        return "comment" in image.info or any(
+            marker not in _JPEG_SAFE_SEGMENTS for marker, _ in getattr(image, "applist", [])
+        )
+    # В PNG текстовые блоки тоже попадают в info
+    return any(key not in ("icc_profile", "dpi", "transparency", "gamma", "duration", "loop",
+                           "background", "blend", "disposal", "timestamp", "aspect",
+                           "srgb", "chromaticity")
+               for key in image.info)
+
+
+def strip_metadata(data: bytes) -> Optional[bytes]:
+    """
+    То же изображение без EXIF, GPS, XMP и текстовых блоков; None, если удалять нечего.
+    Поворот из EXIF применяется к пикселям, ICC-профиль сохраняется.
+    Выполняется в отдельном процессе; исключение означает, что файл не удалось декодировать
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    with Image.open(BytesIO(data)) as source:
+        if source.format not in _METADATA_FORMATS or not _has_metadata(source):
+            source.load()
+            return None
+        pillow_format = source.format
+        options = {}
+        if source.info.get("icc_profile"):
+            options["icc_profile"] = source.info["icc_profile"]
+        if pillow_format == "JPEG":
+            # С исходными таблицами квантования повторное сжатие почти не меняет картинку
+            options["qtables"] = source.quantization
+            subsampling = JpegImagePlugin.get_sampling(source)
+            if subsampling != -1:
+                options["subsampling"] = subsampling
+        elif pillow_format == "WEBP":
+            options["quality"] = 95
+
+        if getattr(source, "is_animated", False):
+            # Анимация пересохраняется целиком; поворот из EXIF у нее не встречается
+            image = source
+            options["save_all"] = True
+        else:
+            image = ImageOps.exif_transpose(source)
+        # Часть версий Pillow записывает метаданные из info сама, поэтому info очищается
+        image.info = {}
+        buffer = BytesIO()
+        image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def make_renditions(data: bytes, widths: Iterable[int], quality: int) -> Dict[str, Dict[int, bytes]]:
+    """
+    Декодирует изображение и возвращает уменьшенные копии для каждого формата и ширины.
+    Выполняется в отдельном процессе. Метаданные (EXIF, GPS, ICC) в копии не попадают,
+    поворот из EXIF применяется к пикселям. Изображения меньше нужной ширины не увеличиваются
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    with Image.open(BytesIO(data)) as source:
+        # У анимированных изображений берется первый кадр
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or "A" in image.getbands() else "RGB")
+
+    renditions: Dict[str, Dict[int, bytes]] = {name: {} for name in RENDITION_FORMATS}
+    for width in sorted(set(widths)):
+        target_width = min(width, image.width)
+        target_height = max(1, round(image.height * target_width / image.width))
+        resized = image.resize((target_width, target_height), Image.LANCZOS) if target_width < image.width else image
+        for name, (pillow_format, _) in RENDITION_FORMATS.items():
+            frame = resized if pillow_format == "WEBP" else _without_alpha(resized)
+            buffer = BytesIO()
+            frame.save(buffer, pillow_format, quality=quality)
+            renditions[name][width] = buffer.getvalue()
+    return renditions
@@ -0,0 +1,192 @@
+import mimetypes
+import os
+import re
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import config.media_config as media_config
+import config.upload_config as upload_config
+from core.config import SECRET_KEY
+from core.signing import MediaURLSigner
+from core.storage import IMAGES, INCOMING_DIR, VIDEOS, blob_hash, storage
+
+media_signer = MediaURLSigner(
+    SECRET_KEY,
+    previous_secrets=media_config.MEDIA_URL_PREVIOUS_SECRETS,
+    ttl=media_config.MEDIA_URL_TTL,
+    ttl_step=media_config.MEDIA_URL_TTL_STEP
+)
+
+
+# Условные заголовки и Range передаются хранилищу, которое отдает не локальные файлы
+_FORWARDED_HEADERS = ("range", "if-range", "if-none-match", "if-modified-since")
+
+# Имена с меткой времени (photo_20250101_120000.jpg) тоже никогда не перезаписываются
+_TIMESTAMPED_NAME_RE = re.compile(r"_\d{8}_\d{6}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Предсжатые копии лежат рядом с файлом: name.svg.br, name.svg.gz
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def is_immutable(media_url: str) -> bool:
+    return blob_hash(media_url) is not None or _TIMESTAMPED_NAME_RE.search(media_url) is not None
+
+
+def cache_control_for(media_url: str, private: bool = False, max_age: int = media_config.MEDIA_IMAGE_MAX_AGE) -> str:
+    scope = "private" if private else "public"
+    if is_immutable(media_url):
+        return f"{scope}, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"{scope}, max-age={max_age}"
+
+
+def content_etag(media_url: str) -> Optional[str]:
+    """Для файлов хранилища по содержимому ETag выводится из имени, без обращения к файлу"""
+    if blob_hash(media_url) is None:
+        return None
+    return f'"{media_url.rsplit("/", 1)[-1]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def _is_compressible(media_type: str) -> bool:
+    return (
+        media_type.startswith("text/")
+        or media_type in ("image/svg+xml", "application/json", "application/javascript")
+    )
+
+
+def _accepted_encodings(request: Request) -> set:
+    return {
+        part.split(";", 1)[0].strip()
+        for part in request.headers.get("accept-encoding", "").split(",")
+    }
+
+
+def _not_modified(etag: str, cache_control: str, vary: bool) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = "Accept-Encoding"
+    return Response(status_code=304, headers=headers)
+
+
+def _stat_file(path: str):
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat_result if os.path.isfile(path) else None
+
+
+def is_legacy_key(key: str) -> bool:
+    """
+    Ключ старого файла в MEDIA_ROOT: только обычные относительные сегменты и не каталоги
+    хранилища - видео в них отдаются лишь по подписанной ссылке, а .incoming - незавершенные загрузки
+    """
+    segments = key.split("/")
+    if any(segment in ("", ".", "..") for segment in segments):
+        return False
+    return segments[0] not in (VIDEOS, IMAGES) and INCOMING_DIR not in segments
+
+
+def _legacy_path(key: str) -> str:
+    # Путь проверяется после разрешения ссылок: файл должен остаться внутри MEDIA_ROOT
+    root = os.path.realpath(upload_config.MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, key))
+    if not is_legacy_key(key) or os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return path
+
+
+async def _has_variant(key: str, legacy: bool) -> bool:
+    if legacy:
+        return await run_in_threadpool(os.path.isfile, _legacy_path(key))
+    return await storage.stat(key) is not None
+
+
+async def media_response(media_url: str, request: Request, cache_control: str, legacy: bool = False) -> Response:
+    """
+    Отдает файл хранилища с поддержкой Range (206) и условных запросов.
+    Если клиент принимает сжатие и рядом лежит предсжатая копия, отдается она.
+    Локальный файл читается с диска частями в пуле потоков, остальные
+    хранилища отдают его потоком, не держа файл в памяти целиком.
+    legacy - файл сохранен до хранилища по содержимому и лежит в MEDIA_ROOT
+    """
+    key = media_url.removeprefix("/media/")
+    media_type = mimetypes.guess_type(media_url)[0] or "application/octet-stream"
+    headers = {"Cache-Control": cache_control}
+    etag = content_etag(media_url)
+
+    compressible = _is_compressible(media_type)
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+        accepted = _accepted_encodings(request)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding in accepted and await _has_variant(key + suffix, legacy):
+                key += suffix
+                headers["Content-Encoding"] = encoding
+                # У каждого представления свой ETag
+                if etag is not None:
+                    etag = f'{etag[:-1]}-{encoding}"'
+                break
+
+    # ETag по содержимому известен заранее: повторный запрос не трогает хранилище
+    if etag is not None:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, cache_control, compressible)
+
+    path = _legacy_path(key) if legacy else storage.local_path(key)
+    if path is None:
+        forwarded = {name: request.headers[name] for name in _FORWARDED_HEADERS if name in request.headers}
+        if etag is not None:
+            # ETag хранилища не совпадает с нашим, условия по нему проверены выше
+            forwarded.pop("if-none-match", None)
+            forwarded.pop("if-range", None)
+        stored = await storage.get(key, forwarded)
+        if stored.status == 404:
+            raise HTTPException(status_code=404, detail="Файл не найден")
+        return StreamingResponse(
+            stored.chunks,
+            status_code=stored.status,
+            headers={**stored.headers, **headers},
+            media_type=media_type
+        )
+
+    stat_result = await run_in_threadpool(_stat_file, path)
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+    # FileResponse сам разбирает Range/If-Range и читает файл частями в пуле потоков;
+    # переданный ETag он не перезаписывает
+    response = FileResponse(path, stat_result=stat_result, headers=headers, media_type=media_type)
+    if etag is None and etag_matches(request.headers.get("if-none-match"), response.headers["etag"]):
+        return _not_modified(response.headers["etag"], cache_control, compressible)
+    return response
+
+
+async def video_response(media_url: str, request: Request) -> Response:
+    """Видео эпизода. Ответ приватный: доступ к видео проверяется для каждого пользователя"""
+    cache_control = cache_control_for(media_url, private=True, max_age=upload_config.VIDEO_CACHE_MAX_AGE)
+    key = media_url.removeprefix("/media/")
+
+    if upload_config.VIDEO_ACCEL_REDIRECT_PREFIX and storage.local_path(key) is not None:
+        # Range, ETag и sendfile обрабатывает nginx
+        return Response(
+            headers={
+                "Cache-Control": cache_control,
+                "X-Accel-Redirect": upload_config.VIDEO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + key,
+            },
+            media_type=mimetypes.guess_type(media_url)[0] or "application/octet-stream"
+        )
+
+    return await media_response(media_url, request, cache_control)
@@ -0,0 +1,198 @@
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class RateLimiter:
+    """
+    Ограничение числа событий (например, попыток входа) по скользящему окну.
+    limits - {область: (лимит, окно в секундах)}, ключ - значение внутри области: email, IP
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]]):
+        self.limits = limits
+
+    async def acquire(self, scope: str, key: str) -> Optional[float]:
+        """
+        Учитывает попытку, если лимит не исчерпан, - одним шагом с проверкой, поэтому
+        параллельные попытки не проходят проверку раньше, чем учтены предыдущие.
+        None - попытка учтена, иначе - через сколько секунд можно повторить
+        """
+        raise NotImplementedError
+
+    async def release(self, scope: str, key: str) -> None:
+        """Возвращает попытку, учтенную acquire"""
+        raise NotImplementedError
+
+    async def reset(self, scope: str, key: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """
+    Точное скользящее окно в памяти процесса: время последних событий ключа.
+    На ключ хранится не больше лимита отметок, ключей - не больше max_keys (вытеснение LRU).
+    Каждый процесс считает сам, поэтому при нескольких воркерах лимит фактически выше
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]], max_keys: int = 100000):
+        super().__init__(limits)
+        self.max_keys = max_keys
+        self._events: "OrderedDict[Tuple[str, str], Deque[float]]" = OrderedDict()
+
+    def _recent(self, scope: str, key: str, now: float) -> Optional[Deque[float]]:
+        events = self._events.get((scope, key))
+        if events is None:
+            return None
+        window = self.limits[scope][1]
+        while events and events[0] <= now - window:
+            events.popleft()
+        if not events:
+            del self._events[(scope, key)]
+            return None
+        return events
+
+    def _append(self, scope: str, key: str, events: Optional[Deque[float]], now: float) -> None:
+        if events is None:
+            events = self._events[(scope, key)] = deque(maxlen=self.limits[scope][0])
+        events.append(now)
+        self._events.move_to_end((scope, key))
+        while len(self._events) > self.max_keys:
+            self._events.popitem(last=False)
+
+    async def acquire(self, scope: str, key: str) -> Optional[float]:
+        # Между проверкой и записью нет await: для event loop это один шаг
+        limit, window = self.limits[scope]
+        now = time.monotonic()
+        events = self._recent(scope, key, now)
+        if events is not None and len(events) >= limit:
+            return events[0] + window - now
+        self._append(scope, key, events, now)
+        return None
+
+    async def release(self, scope: str, key: str) -> None:
+        events = self._events.get((scope, key))
+        if events:
+            events.pop()
+            if not events:
+                del self._events[(scope, key)]
+
+    async def reset(self, scope: str, key: str) -> None:
+        self._events.pop((scope, key), None)
+
+
+class CounterStore:
+    """Счетчики с временем жизни, общие для всех процессов; по смыслу - INCR и EXPIRE"""
+
+    async def get(self, keys: List[str]) -> Dict[str, int]:
+        raise NotImplementedError
+
+    async def increment(self, key: str, ttl: float, amount: int = 1) -> int:
+        """Изменяет счетчик на amount, не опуская ниже нуля, и возвращает новое значение"""
+        raise NotImplementedError
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    async def prune(self) -> int:
+        """Удаляет истекшие счетчики"""
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalCounterStore(CounterStore):
+    """Замена общего хранилища в памяти процесса: для разработки и одного воркера"""
+
+    def __init__(self):
+        self._counters: Dict[str, List[float]] = {}
+
+    def _alive(self, key: str, now: float) -> Optional[List[float]]:
+        counter = self._counters.get(key)
+        if counter is not None and counter[1] <= now:
+            del self._counters[key]
+            return None
+        return counter
+
+    async def get(self, keys: List[str]) -> Dict[str, int]:
+        now = time.time()
+        return {key: int(counter[0]) for key in keys if (counter := self._alive(key, now)) is not None}
+
+    async def increment(self, key: str, ttl: float, amount: int = 1) -> int:
+        now = time.time()
+        counter = self._alive(key, now)
+        if counter is None:
+            counter = self._counters[key] = [0, now + ttl]
+        counter[0] = max(counter[0] + amount, 0)
+        return int(counter[0])
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._counters.pop(key, None)
+
+    async def prune(self) -> int:
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._counters.items() if expires_at <= now]
+        for key in expired:
+            del self._counters[key]
+        return len(expired)
+
+
+class SharedStoreRateLimiter(RateLimiter):
+    """
+    Приближенное скользящее окно на двух счетчиках фиксированных интервалов: текущего и
+    предыдущего, взятого с весом оставшейся в окне доли. Попытка - инкремент и чтение
+    предыдущего счетчика, независимо от числа попыток в окне
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]], store: CounterStore, prefix: str = "rl"):
+        super().__init__(limits)
+        self.store = store
+        self.prefix = prefix
+
+    def _key(self, scope: str, key: str, bucket: int) -> str:
+        return f"{self.prefix}:{scope}:{key}:{bucket}"
+
+    def _position(self, scope: str, key: str) -> Tuple[float, str, str]:
+        window = self.limits[scope][1]
+        now = time.time()
+        bucket = math.floor(now / window)
+        return now - bucket * window, self._key(scope, key, bucket), self._key(scope, key, bucket - 1)
+
+    @staticmethod
+    def _wait(limit: int, window: float, elapsed: float, current: int, previous: int) -> Optional[float]:
+        if current + previous * (1 - elapsed / window) < limit:
+            return None
+        if current >= limit or previous == 0:
+            return window - elapsed
+        # Вес предыдущего интервала падает линейно: ждем, пока оценка опустится ниже лимита
+        return max(window * (1 - (limit - current) / previous) - elapsed, 1.0)
+
+    async def acquire(self, scope: str, key: str) -> Optional[float]:
+        # Сначала инкремент, потом проверка: каждая из параллельных попыток видит все
+        # учтенные до нее, поэтому лимит не превышается. Отказанная попытка возвращается
+        limit, window = self.limits[scope]
+        elapsed, current_key, previous_key = self._position(scope, key)
+        current = await self.store.increment(current_key, ttl=2 * window)
+        previous = (await self.store.get([previous_key])).get(previous_key, 0)
+        if current + previous * (1 - elapsed / window) <= limit:
+            return None
+        await self.store.increment(current_key, ttl=2 * window, amount=-1)
+        return self._wait(limit, window, elapsed, current - 1, previous) or 1.0
+
+    async def release(self, scope: str, key: str) -> None:
+        window = self.limits[scope][1]
+        _, current_key, _ = self._position(scope, key)
+        await self.store.increment(current_key, ttl=2 * window, amount=-1)
+
+    async def reset(self, scope: str, key: str) -> None:
+        _, current_key, previous_key = self._position(scope, key)
+        await self.store.delete([current_key, previous_key])
+
+    async def close(self) -> None:
+        await self.store.close()
@@ -0,0 +1,116 @@
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+import config.upload_config as upload_config
+from core.storage_backends import create_storage_backend
+from core.uploads import StoredFile, media_path, save_upload
+
+# Хранилище по содержимому: файл называется SHA-256 своих байтов и лежит в
+# /media/{kind}/ab/cd/abcd...{ext}. Два уровня по 256 каталогов не дают каталогам разрастаться,
+# одинаковые файлы хранятся один раз, а одновременные загрузки не конфликтуют по именам
+VIDEOS = "videos"
+IMAGES = "images"
+INCOMING_DIR = ".incoming"
+
+storage = create_storage_backend()
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+# Копии изображения называются по хешу оригинала: abcd..._320.webp
+_BLOB_URL_RE = re.compile(r"/([0-9a-f]{64})(?:_\d+)?(\.[A-Za-z0-9]+)?$")
+_EXTENSION_RE = re.compile(r"^\.[A-Za-z0-9]{1,8}$")
+
+
+def blob_extension(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """Расширение по типу содержимого, чтобы одинаковые байты всегда получали одно имя"""
+    extension = mimetypes.guess_extension(content_type or "") or ""
+    if not extension and filename:
+        extension = os.path.splitext(filename)[1].lower()
+    return extension if _EXTENSION_RE.match(extension) else ""
+
+
+def blob_url(kind: str, sha256: str, extension: str) -> str:
+    return f"/media/{kind}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def rendition_url(kind: str, sha256: str, width: int, extension: str) -> str:
+    return f"/media/{kind}/{sha256[:2]}/{sha256[2:4]}/{sha256}_{width}{extension}"
+
+
+def blob_hash(url: Optional[str]) -> Optional[str]:
+    """
+    SHA-256 из ссылки на файл хранилища (для копии изображения - хеш оригинала);
+    None для файлов, сохраненных до хранилища по содержимому
+    """
+    if not url:
+        return None
+    match = _BLOB_URL_RE.search(url.split("?", 1)[0])
+    return match.group(1) if match else None
+
+
+def incoming_path(kind: str, name: Optional[str] = None) -> str:
+    """
+    Временный файл для записи загрузки. Для локального хранилища он в том же разделе,
+    и готовый файл переносится на место переименованием, без копирования
+    """
+    return os.path.join(upload_config.MEDIA_ROOT, kind, INCOMING_DIR, name or uuid.uuid4().hex)
+
+
+async def commit_blob(tmp_path: str, kind: str, sha256: str, size: int, extension: str) -> StoredFile:
+    """Переносит полностью записанный временный файл на его адрес в хранилище"""
+    url = blob_url(kind, sha256, extension)
+    key = url.removeprefix("/media/")
+    if await storage.stat(key) is not None:
+        # Такой файл уже есть: загрузка ничего не меняет в хранилище.
+        # touch не дает сборщику мусора удалить файл, на который сейчас появится ссылка
+        await run_in_threadpool(os.remove, tmp_path)
+        await storage.touch(key)
+    else:
+        await storage.put_file(key, tmp_path)
+    return StoredFile(media_path(url), size, sha256, url)
+
+
+async def store_upload(
+    file: UploadFile,
+    kind: str,
+    max_size: int,
+    content_types,
+    transform: Optional[Callable[[str], Awaitable[bool]]] = None
+) -> StoredFile:
+    """
+    Сохраняет загруженный файл в хранилище по содержимому.
+    transform обрабатывает временный файл до того, как файл получит адрес, и возвращает True,
+    если изменил его; тогда хеш считается заново
+    """
+    extension = blob_extension(file.content_type, file.filename)
+    stored = await save_upload(file, incoming_path(kind), max_size, content_types)
+    sha256, size = stored.sha256, stored.size
+    if transform is not None:
+        try:
+            if await transform(stored.path):
+                sha256, size = await hash_file(stored.path)
+        except BaseException:
+            await run_in_threadpool(os.remove, stored.path)
+            raise
+    return await commit_blob(stored.path, kind, sha256, size, extension)
+
+
+
+def _hash_file(path: str) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(upload_config.UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+async def hash_file(path: str) -> Tuple[str, int]:
+    return await run_in_threadpool(_hash_file, path)
@@ -0,0 +1,463 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import aiohttp
+from starlette.concurrency import run_in_threadpool
+from yarl import URL
+
+import config.storage_config as storage_config
+import config.upload_config as upload_config
+from core.signing import EMPTY_PAYLOAD_SHA256, s3_canonical_query, sign_s3_request
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectInfo:
+    __slots__ = ("size", "modified")
+
+    def __init__(self, size: int, modified: float):
+        self.size = size
+        self.modified = modified
+
+
+class StoredObject:
+    """Ответ хранилища на чтение: статус, заголовки и тело потоком"""
+
+    __slots__ = ("status", "headers", "chunks")
+
+    def __init__(self, status: int, headers: Dict[str, str], chunks: AsyncIterator[bytes]):
+        self.status = status
+        self.headers = headers
+        self.chunks = chunks
+
+
+class StorageBackend:
+    """
+    Хранилище медиафайлов. Ключ - путь относительно корня хранилища,
+    например videos/ab/cd/abcd...mp4 для ссылки /media/videos/ab/cd/abcd...mp4
+    """
+
+    async def stat(self, key: str) -> Optional[ObjectInfo]:
+        raise NotImplementedError
+
+    async def put_file(self, key: str, local_path: str) -> None:
+        """Переносит полностью записанный локальный файл в хранилище; локальный файл удаляется"""
+        raise NotImplementedError
+
+    async def touch(self, key: str) -> None:
+        """Отмечает, что на файл снова ссылаются"""
+
+    async def get(self, key: str, headers: Dict[str, str]) -> StoredObject:
+        """Чтение с пробросом Range и условных заголовков"""
+        raise NotImplementedError
+
+    async def read(self, key: str) -> bytes:
+        """Файл целиком; только для небольших файлов, например изображений"""
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> AsyncIterator[Tuple[str, ObjectInfo]]:
+        """Все файлы с ключом, начинающимся с prefix; порядок не гарантируется"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Удаляет файл; отсутствующий файл - не ошибка"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Путь на диске, если файл можно отдать напрямую с него"""
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalStorageBackend(StorageBackend):
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    @staticmethod
+    def _stat(path: str) -> Optional[ObjectInfo]:
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(stat_result.st_size, stat_result.st_mtime)
+
+    async def stat(self, key: str) -> Optional[ObjectInfo]:
+        return await run_in_threadpool(self._stat, self.local_path(key))
+
+    @staticmethod
+    def _move(local_path: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(local_path, path)
+
+    async def put_file(self, key: str, local_path: str) -> None:
+        # Временный файл лежит в том же разделе: перенос - это переименование, без копирования
+        await run_in_threadpool(self._move, local_path, self.local_path(key))
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def read(self, key: str) -> bytes:
+        return await run_in_threadpool(self._read, self.local_path(key))
+
+    async def touch(self, key: str) -> None:
+        # mtime защищает файл от сборщика мусора на время grace-периода
+        await run_in_threadpool(os.utime, self.local_path(key))
+
+    @staticmethod
+    def _scan(path: str) -> Tuple[List[str], List[Tuple[str, ObjectInfo]]]:
+        dirs, files = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat_result = entry.stat()
+                        files.append((entry.name, ObjectInfo(stat_result.st_size, stat_result.st_mtime)))
+        except FileNotFoundError:
+            pass
+        return dirs, files
+
+    async def list(self, prefix: str) -> AsyncIterator[Tuple[str, ObjectInfo]]:
+        # Каталоги читаются по одному в пуле потоков: обход большого дерева не блокирует цикл событий
+        directory, _, name_prefix = prefix.rpartition("/")
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            dirs, files = await run_in_threadpool(self._scan, os.path.join(self.root, current))
+            base = f"{current}/" if current else ""
+            for name in dirs:
+                if current != directory or name.startswith(name_prefix):
+                    pending.append(base + name)
+            for name, info in files:
+                if current != directory or name.startswith(name_prefix):
+                    yield base + name, info
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self._remove, self.local_path(key))
+
+
+_UPLOAD_ID_RE = re.compile(r"<UploadId>([^<]+)</UploadId>")
+_S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+# Заголовки ответа S3, которые имеет смысл передать клиенту
+_PASSTHROUGH_HEADERS = ("content-length", "content-range", "accept-ranges", "etag", "last-modified")
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-совместимое хранилище (AWS S3, MinIO) поверх aiohttp, адресация path-style.
+    Крупные файлы загружаются multipart частями по part_size, не больше concurrency частей
+    одновременно; чтение отдается потоком, поэтому память не зависит от размера файла
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        part_size: int = 8 * 1024 * 1024,
+        concurrency: int = 4
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlsplit(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        query: Optional[dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+        data: bytes = b"",
+        payload_sha256: str = EMPTY_PAYLOAD_SHA256,
+        signed_headers: Optional[Dict[str, str]] = None
+    ) -> aiohttp.ClientResponse:
+        """signed_headers входят в подпись: так S3 требует передавать заголовки x-amz-*"""
+        path = quote(f"/{self.bucket}/{key}" if key else f"/{self.bucket}", safe="/-_.~")
+        query = query or {}
+        signed = sign_s3_request(
+            method,
+            self.host,
+            path,
+            query,
+            signed_headers or {},
+            payload_sha256,
+            self.access_key,
+            self.secret_key,
+            self.region
+        )
+        url = self.endpoint_url + path + (f"?{s3_canonical_query(query)}" if query else "")
+        return await self._client().request(
+            method,
+            URL(url, encoded=True),
+            headers={**(headers or {}), **signed},
+            data=data or None
+        )
+
+    async def _checked(self, response: aiohttp.ClientResponse, action: str) -> aiohttp.ClientResponse:
+        if response.status >= 300:
+            body = await response.text()
+            response.release()
+            raise StorageError(f"S3 {action}: {response.status} {body[:300]}")
+        return response
+
+    async def create_bucket(self) -> None:
+        """Создает бакет, если его еще нет"""
+        response = await self._request("PUT", "")
+        if response.status == 409:
+            response.release()
+            return
+        await self._checked(response, f"CreateBucket {self.bucket}")
+        response.release()
+
+    async def stat(self, key: str) -> Optional[ObjectInfo]:
+        response = await self._request("HEAD", key)
+        response.release()
+        if response.status == 404:
+            return None
+        if response.status >= 300:
+            raise StorageError(f"S3 HEAD {key}: {response.status}")
+        return ObjectInfo(
+            int(response.headers.get("Content-Length", 0)),
+            parsedate_to_datetime(response.headers["Last-Modified"]).timestamp()
+        )
+
+    @staticmethod
+    def _read_part(f, size: int):
+        chunk = f.read(size)
+        return chunk, hashlib.sha256(chunk).hexdigest()
+
+    async def _put_object(self, key: str, data: bytes, payload_sha256: str) -> None:
+        response = await self._request("PUT", key, data=data, payload_sha256=payload_sha256)
+        await self._checked(response, f"PUT {key}")
+        response.release()
+
+    async def _upload_part(
+        self,
+        key: str,
+        upload_id: str,
+        number: int,
+        data: bytes,
+        payload_sha256: str,
+        etags: Dict[int, str],
+        slots: asyncio.Semaphore
+    ) -> None:
+        try:
+            response = await self._request(
+                "PUT",
+                key,
+                query={"partNumber": number, "uploadId": upload_id},
+                data=data,
+                payload_sha256=payload_sha256
+            )
+            await self._checked(response, f"UploadPart {key} #{number}")
+            etags[number] = response.headers["ETag"]
+            response.release()
+        finally:
+            slots.release()
+
+    async def _multipart_upload(self, key: str, f) -> None:
+        response = await self._checked(await self._request("POST", key, query={"uploads": ""}), f"CreateMultipartUpload {key}")
+        upload_id = _UPLOAD_ID_RE.search(await response.text()).group(1)
+
+        etags: Dict[int, str] = {}
+        tasks: List[asyncio.Task] = []
+        # Следующая часть читается, только когда освободился слот: в памяти не больше concurrency частей
+        slots = asyncio.Semaphore(self.concurrency)
+        try:
+            number = 0
+            while True:
+                await slots.acquire()
+                data, payload_sha256 = await run_in_threadpool(self._read_part, f, self.part_size)
+                if not data:
+                    slots.release()
+                    break
+                number += 1
+                tasks.append(asyncio.create_task(
+                    self._upload_part(key, upload_id, number, data, payload_sha256, etags, slots)
+                ))
+                if any(task.done() and task.exception() for task in tasks):
+                    break
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            parts = "".join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>{etags[n]}</ETag></Part>"
+                for n in range(1, number + 1)
+            )
+            body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode()
+            response = await self._checked(
+                await self._request(
+                    "POST",
+                    key,
+                    query={"uploadId": upload_id},
+                    data=body,
+                    payload_sha256=hashlib.sha256(body).hexdigest()
+                ),
+                f"CompleteMultipartUpload {key}"
+            )
+            # S3 может вернуть ошибку в теле ответа со статусом 200
+            text = await response.text()
+            if "<Error>" in text:
+                raise StorageError(f"S3 CompleteMultipartUpload {key}: {text[:300]}")
+        except BaseException:
+            logger.warning(f"Multipart upload of {key} aborted")
+            for task in tasks:
+                task.cancel()
+            response = await self._request("DELETE", key, query={"uploadId": upload_id})
+            response.release()
+            raise
+
+    async def put_file(self, key: str, local_path: str) -> None:
+        f = await run_in_threadpool(open, local_path, "rb")
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if size <= self.part_size:
+                data, payload_sha256 = await run_in_threadpool(self._read_part, f, size)
+                await self._put_object(key, data, payload_sha256)
+            else:
+                await self._multipart_upload(key, f)
+        finally:
+            await run_in_threadpool(f.close)
+        await run_in_threadpool(os.remove, local_path)
+
+    async def touch(self, key: str) -> None:
+        # Копирование объекта в себя с заменой метаданных обновляет Last-Modified,
+        # по которому сборщик мусора отсчитывает grace-период. Одним CopyObject
+        # копируются объекты до 5 ГБ
+        response = await self._request(
+            "PUT",
+            key,
+            signed_headers={
+                "x-amz-copy-source": quote(f"/{self.bucket}/{key}", safe="/-_.~"),
+                "x-amz-metadata-directive": "REPLACE",
+            }
+        )
+        await self._checked(response, f"CopyObject {key}")
+        try:
+            # Ошибка копирования может прийти в теле ответа со статусом 200
+            body = await response.read()
+        finally:
+            response.release()
+        if b"<Error>" in body:
+            raise StorageError(f"S3 CopyObject {key}: {body[:300].decode(errors='replace')}")
+
+    async def get(self, key: str, headers: Dict[str, str]) -> StoredObject:
+        response = await self._request("GET", key, headers=headers)
+        if response.status not in (200, 206, 304, 404, 412, 416):
+            await self._checked(response, f"GET {key}")
+
+        if response.status in (200, 206):
+            chunks = self._stream(response)
+        else:
+            response.release()
+            chunks = self._stream(None)
+        return StoredObject(
+            response.status,
+            {name: response.headers[name] for name in _PASSTHROUGH_HEADERS if name in response.headers},
+            chunks
+        )
+
+    async def read(self, key: str) -> bytes:
+        response = await self._checked(await self._request("GET", key), f"GET {key}")
+        try:
+            return await response.read()
+        finally:
+            response.release()
+
+    async def list(self, prefix: str) -> AsyncIterator[Tuple[str, ObjectInfo]]:
+        query = {"list-type": "2", "prefix": prefix}
+        while True:
+            response = await self._checked(await self._request("GET", "", query=query), f"ListObjectsV2 {prefix}")
+            try:
+                root = ElementTree.fromstring(await response.read())
+            finally:
+                response.release()
+            for item in root.iter(f"{_S3_NS}Contents"):
+                # В списке время в ISO 8601, в отличие от заголовка Last-Modified
+                modified = item.findtext(f"{_S3_NS}LastModified").replace("Z", "+00:00")
+                yield item.findtext(f"{_S3_NS}Key"), ObjectInfo(
+                    int(item.findtext(f"{_S3_NS}Size")),
+                    datetime.fromisoformat(modified).timestamp()
+                )
+            token = root.findtext(f"{_S3_NS}NextContinuationToken")
+            if root.findtext(f"{_S3_NS}IsTruncated") != "true" or not token:
+                return
+            query = {**query, "continuation-token": token}
+
+    async def delete(self, key: str) -> None:
+        # S3 отвечает 204 и для отсутствующего ключа
+        response = await self._checked(await self._request("DELETE", key), f"DELETE {key}")
+        response.release()
+
+    @staticmethod
+    async def _stream(response: Optional[aiohttp.ClientResponse]) -> AsyncIterator[bytes]:
+        if response is None:
+            return
+        try:
+            async for chunk in response.content.iter_chunked(upload_config.UPLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.release()
+
+
+def create_storage_backend() -> StorageBackend:
+    if storage_config.STORAGE_BACKEND == "s3":
+        return S3StorageBackend(
+            storage_config.S3_ENDPOINT_URL,
+            storage_config.S3_BUCKET,
+            storage_config.S3_ACCESS_KEY,
+            storage_config.S3_SECRET_KEY,
+            region=storage_config.S3_REGION,
+            part_size=storage_config.S3_PART_SIZE,
+            concurrency=storage_config.S3_UPLOAD_CONCURRENCY
+        )
+    return LocalStorageBackend(upload_config.MEDIA_ROOT)
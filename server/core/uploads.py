@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import os
+from typing import AsyncIterator, BinaryIO, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка файла частей не поддерживается
+    fcntl = None
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+import config.upload_config as upload_config
+
+logger = logging.getLogger(__name__)
+
+
+class StoredFile:
+    """Результат сохранения загруженного файла"""
+
+    __slots__ = ("path", "size", "sha256", "url")
+
+    def __init__(self, path: str, size: int, sha256: str, url: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.url = url
+
+
+class UploadOffsetError(Exception):
+    """Смещение части не совпадает с уже записанным размером файла"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected offset {offset}")
+        self.offset = offset
+
+
+class UploadBusyError(Exception):
+    """В эту загрузку уже пишет другой запрос"""
+
+
+def media_path(media_url: str) -> str:
+    """Путь на диске для пути вида /media/..., под которым файл хранится в базе"""
+    return os.path.join(upload_config.MEDIA_ROOT, media_url.removeprefix("/media/"))
+
+
+def check_upload(
+    content_type: Optional[str],
+    size: Optional[int],
+    max_size: int,
+    content_types: Iterable[str]
+) -> None:
+    """Отклоняет файл по типу и заявленному размеру до чтения содержимого"""
+    if content_type not in content_types:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Неподдерживаемый тип файла: {content_type}"
+        )
+    if size is not None and size > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Файл слишком большой, максимум {max_size} байт"
+        )
+
+
+def _write_chunk(buffer: BinaryIO, digest, chunk: bytes) -> None:
+    buffer.write(chunk)
+    digest.update(chunk)
+
+
+async def save_upload(
+    file: UploadFile,
+    file_path: str,
+    max_size: int,
+    content_types: Iterable[str],
+    chunk_size: int = upload_config.UPLOAD_CHUNK_SIZE
+) -> StoredFile:
+    """
+    Сохраняет загруженный файл по частям, не блокируя event loop:
+    чтение, запись и подсчет SHA-256 выполняются в пуле потоков.
+    Файл пишется во временный путь и появляется под своим именем только целиком
+    """
+    check_upload(file.content_type, file.size, max_size, content_types)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        buffer = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Файл слишком большой, максимум {max_size} байт"
+                    )
+                await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+        finally:
+            await run_in_threadpool(buffer.close)
+        await run_in_threadpool(os.replace, tmp_path, file_path)
+    except HTTPException:
+        await run_in_threadpool(_remove_quietly, tmp_path)
+        raise
+    except Exception as e:
+        await run_in_threadpool(_remove_quietly, tmp_path)
+        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}")
+    finally:
+        await file.close()
+
+    logger.info(f"Stored upload {file_path}: {size} bytes, sha256={digest.hexdigest()}")
+    return StoredFile(file_path, size, digest.hexdigest())
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def lock_upload(file_path: str) -> BinaryIO:
+    """
+    Открывает файл на дозапись под исключительной блокировкой; блокировка снимается
+    закрытием файла. Если файл уже заблокирован другим запросом - UploadBusyError
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    buffer = open(file_path, "ab")
+    if fcntl is not None:
+        try:
+            fcntl.flock(buffer.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            buffer.close()
+            raise UploadBusyError()
+    return buffer
+
+
+def _open_for_append(file_path: str, offset: int) -> BinaryIO:
+    buffer = lock_upload(file_path)
+    try:
+        current = os.fstat(buffer.fileno()).st_size
+        if current != offset:
+            raise UploadOffsetError(current)
+    except Exception:
+        buffer.close()
+        raise
+    return buffer
+
+
+def file_size(file_path: str) -> int:
+    try:
+        return os.stat(file_path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+async def append_stream(
+    file_path: str,
+    offset: int,
+    stream: AsyncIterator[bytes],
+    max_size: int,
+    chunk_size: int = upload_config.UPLOAD_CHUNK_SIZE
+) -> int:
+    """
+    Дописывает поток байтов в конец файла, начиная с offset, и возвращает новый размер.
+    Смещение сверяется с размером файла на диске, поэтому после обрыва соединения
+    клиент продолжает с того места, которое реально записано.
+    Данные накапливаются до chunk_size и пишутся в пуле потоков
+    """
+    buffer = await run_in_threadpool(_open_for_append, file_path, offset)
+    size = offset
+    pending = bytearray()
+    try:
+        async for chunk in stream:
+            if size + len(pending) + len(chunk) > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Файл слишком большой, максимум {max_size} байт"
+                )
+            pending += chunk
+            if len(pending) >= chunk_size:
+                await run_in_threadpool(buffer.write, pending)
+                size += len(pending)
+                pending = bytearray()
+    finally:
+        # Полученное до обрыва или ошибки сохраняется, чтобы его не пришлось слать повторно
+        try:
+            if pending:
+                await run_in_threadpool(buffer.write, pending)
+                size += len(pending)
+        finally:
+            await run_in_threadpool(buffer.close)
+    return size
@@ -1,9 +1,11 @@
-from sqlalchemy import update, delete, select, and_
+from sqlalchemy import update, delete, select, and_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from typing import Union, List, Optional
+from typing import Union, List, Optional, Tuple
 from db.models.comments import Comment
 from db.dals.base_dal import BaseDAL
+from db.dals.movie_dal import MovieDAL
+from db.dals.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
 from datetime import datetime
 
 class CommentDAL(BaseDAL):
@@ -24,6 +26,7 @@ class CommentDAL(BaseDAL):
         )
         self.db_session.add(new_comment)
         await self.db_session.flush()
+        await MovieDAL(self.db_session).apply_rating_delta(movie_id, rating, 1)
         await self.db_session.commit()
         return new_comment
     
@@ -31,11 +34,15 @@ class CommentDAL(BaseDAL):
         query = update(Comment).where(and_(
             Comment.comment_id == comment_id,
             Comment.is_active == True
-        )).values(is_active=False).returning(Comment.comment_id)
+        )).values(is_active=False).returning(Comment.comment_id, Comment.movie_id, Comment.rating)
         result = await self.db_session.execute(query)
-        deleted_comment_id = result.fetchone()
-        if deleted_comment_id is not None:
-            return deleted_comment_id[0]
+        deleted_comment = result.fetchone()
+        if deleted_comment is not None:
+            await MovieDAL(self.db_session).apply_rating_delta(
+                deleted_comment.movie_id, -deleted_comment.rating, -1
+            )
+            await self.db_session.commit()
+            return deleted_comment.comment_id
         return None
     
     async def get_comment(self, comment_id: int) -> Union[Comment, None]:
@@ -48,7 +55,12 @@ class CommentDAL(BaseDAL):
             return comment[0]
         return None
     
-    async def get_movie_comments(self, movie_id: int) -> List[Comment]:
+    async def get_movie_comments(
+        self,
+        movie_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Comment], Optional[str]]:
         query = select(Comment).options(
             selectinload(Comment.user)
         ).where(and_(
@@ -56,9 +68,10 @@ class CommentDAL(BaseDAL):
             Comment.is_active == True,
             Comment.parent_comment_id == None  # Получаем только корневые комментарии
         ))
+        query = self._newest_first_page(query, limit, cursor)
         result = await self.db_session.execute(query)
-        comments = result.fetchall()
-        return [comment[0] for comment in comments]
+        comments = [comment[0] for comment in result.fetchall()]
+        return paginate(comments, limit, self._cursor_of)
     
     async def get_replies(self, parent_comment_id: int) -> List[Comment]:
         query = select(Comment).options(
@@ -72,6 +85,14 @@ class CommentDAL(BaseDAL):
         return [reply[0] for reply in replies]
 
     async def update_comment(self, comment_id: int, **kwargs) -> Union[int, None]:
+        old_comment = None
+        if "rating" in kwargs:
+            # Блокируем строку, чтобы старая оценка не изменилась до нашего UPDATE
+            old_query = select(Comment.movie_id, Comment.rating).\
+                where(and_(Comment.comment_id == comment_id, Comment.is_active == True)).\
+                with_for_update()
+            old_comment = (await self.db_session.execute(old_query)).fetchone()
+
         query = update(Comment).\
             where(and_(Comment.comment_id == comment_id, Comment.is_active == True)).\
             values(**kwargs, updated_at=datetime.now()).\
@@ -79,15 +100,40 @@ class CommentDAL(BaseDAL):
         res = await self.db_session.execute(query)
         update_comment_id_row = res.fetchone()
         if update_comment_id_row is not None:
+            if old_comment is not None and old_comment.rating != kwargs["rating"]:
+                await MovieDAL(self.db_session).apply_rating_delta(
+                    old_comment.movie_id, kwargs["rating"] - old_comment.rating, 0
+                )
+            await self.db_session.commit()
             return update_comment_id_row[0]
         return None
 
-    async def get_user_comments(self, user_id: int) -> List[Comment]:
+    async def get_user_comments(
+        self,
+        user_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Comment], Optional[str]]:
         query = select(Comment).options(
             selectinload(Comment.user)
         ).where(
             Comment.user_id == user_id,
             Comment.is_active == True
-        ).order_by(Comment.created_at.desc())
+        )
+        query = self._newest_first_page(query, limit, cursor)
         result = await self.db_session.execute(query)
-        return result.scalars().all() 
\ No newline at end of file
+        return paginate(list(result.scalars().all()), limit, self._cursor_of)
+
+    @staticmethod
+    def _newest_first_page(query, limit: int, cursor: Optional[str]):
+        """Сортировка от новых к старым с продолжением после курсора"""
+        if cursor is not None:
+            created_at, comment_id = decode_cursor(cursor, datetime, int)
+            query = query.where(
+                tuple_(Comment.created_at, Comment.comment_id) < tuple_(created_at, comment_id)
+            )
+        return query.order_by(Comment.created_at.desc(), Comment.comment_id.desc()).limit(limit + 1)
+
+    @staticmethod
+    def _cursor_of(comment: Comment) -> tuple:
+        return comment.created_at, comment.comment_id
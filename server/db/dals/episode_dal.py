@@ -1,7 +1,10 @@
-from typing import List, Optional
-from sqlalchemy import select, update, delete
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select, update, delete, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.models.episodes import Episode
+from db.models.episodes import Episode, PurchasedEpisode
+from db.dals.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
 
 class EpisodeDAL:
     def __init__(self, db_session: AsyncSession):
@@ -32,10 +35,25 @@ class EpisodeDAL:
         result = await self.db_session.execute(query)
         return result.scalar_one_or_none()
 
-    async def get_episodes_by_movie(self, movie_id: int) -> List[Episode]:
-        query = select(Episode).where(Episode.movie_id == movie_id).order_by(Episode.episode_number)
+    async def get_episodes_by_movie(
+        self,
+        movie_id: int,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Episode], Optional[str]]:
+        query = select(Episode).where(Episode.movie_id == movie_id)
+        if cursor is not None:
+            episode_number, episode_id = decode_cursor(cursor, int, int)
+            query = query.where(
+                tuple_(Episode.episode_number, Episode.episode_id) > tuple_(episode_number, episode_id)
+            )
+        query = query.order_by(Episode.episode_number, Episode.episode_id).limit(limit + 1)
         result = await self.db_session.execute(query)
-        return list(result.scalars().all())
+        return paginate(
+            list(result.scalars().all()),
+            limit,
+            lambda episode: (episode.episode_number, episode.episode_id)
+        )
 
     async def update_episode(self, episode_id: int, **kwargs) -> Optional[Episode]:
         query = (
@@ -56,4 +74,36 @@ class EpisodeDAL:
         episode_id = result.scalar_one_or_none()
         if episode_id is not None:
             await self.db_session.commit()
-        return episode_id 
\ No newline at end of file
+        return episode_id
+
+    async def get_purchased_episode_ids(
+        self,
+        user_id: int,
+        episode_ids: Optional[Iterable[int]] = None
+    ) -> Set[int]:
+        """
+        Какие из переданных эпизодов куплены пользователем - одним запросом.
+        Без списка эпизодов возвращает все покупки пользователя
+        """
+        query = select(PurchasedEpisode.episode_id).where(PurchasedEpisode.user_id == user_id)
+        if episode_ids is not None:
+            episode_ids = list(episode_ids)
+            if not episode_ids:
+                return set()
+            query = query.where(PurchasedEpisode.episode_id.in_(episode_ids))
+        result = await self.db_session.execute(query)
+        return set(result.scalars().all())
+
+    async def add_purchase(self, user_id: int, episode_id: int, cost: float) -> bool:
+        """
+        Записывает покупку; False, если эпизод уже куплен. Коммит - вместе со списанием денег.
+        При одновременной покупке второй INSERT ждет первую транзакцию на уникальном индексе
+        """
+        query = (
+            insert(PurchasedEpisode)
+            .values(user_id=user_id, episode_id=episode_id, cost=cost, purchased_at=datetime.now())
+            .on_conflict_do_nothing(constraint="uq_purchased_episodes_user_episode")
+            .returning(PurchasedEpisode.id)
+        )
+        result = await self.db_session.execute(query)
+        return result.scalar_one_or_none() is not None
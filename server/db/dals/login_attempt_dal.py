@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import List
+from sqlalchemy import insert, delete
+from db.models.users import LoginAttempt
+from db.dals.base_dal import BaseDAL
+
+class LoginAttemptDAL(BaseDAL):
+    async def add_attempts(self, attempts: List[dict]) -> None:
+        """Записывает пачку попыток входа одним INSERT"""
+        await self.db_session.execute(insert(LoginAttempt), attempts)
+        await self.db_session.commit()
+
+    async def delete_older_than(self, created_before: datetime) -> int:
+        query = delete(LoginAttempt).where(LoginAttempt.created_at < created_before)
+        result = await self.db_session.execute(query)
+        await self.db_session.commit()
+        return result.rowcount
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple, Union
+from sqlalchemy import select, update, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from db.models.episodes import Episode
+from db.models.media import MediaBlob
+from db.models.users import User
+from db.dals.base_dal import BaseDAL
+
+class MediaDAL(BaseDAL):
+    async def get_blob(self, sha256: str) -> Union[MediaBlob, None]:
+        query = select(MediaBlob).where(MediaBlob.sha256 == sha256)
+        result = await self.db_session.execute(query)
+        return result.scalar_one_or_none()
+
+    async def add_reference(self, sha256: str, path: str, size: int) -> None:
+        """Учитывает новую ссылку на файл; коммит - вместе с записью, которая на него ссылается"""
+        now = datetime.now()
+        query = insert(MediaBlob).values(
+            sha256=sha256,
+            path=path,
+            size=size,
+            ref_count=1,
+            created_at=now,
+            updated_at=now
+        ).on_conflict_do_update(
+            index_elements=[MediaBlob.sha256],
+            set_={"ref_count": MediaBlob.ref_count + 1, "updated_at": now}
+        )
+        await self.db_session.execute(query)
+
+    async def release(self, sha256: str) -> None:
+        """Снимает ссылку на файл; файл без ссылок удаляет сборщик мусора"""
+        query = (
+            update(MediaBlob)
+            .where(MediaBlob.sha256 == sha256)
+            .values(ref_count=func.greatest(MediaBlob.ref_count - 1, 0), updated_at=datetime.now())
+        )
+        await self.db_session.execute(query)
+
+    async def get_unreferenced(
+        self,
+        updated_before: datetime,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> List[Tuple[str, datetime]]:
+        """
+        Файлы без ссылок дольше grace-периода, по частичному индексу ix_media_blobs_unreferenced.
+        after - последняя пара (updated_at, sha256) предыдущей пачки
+        """
+        query = select(MediaBlob.sha256, MediaBlob.updated_at).where(
+            MediaBlob.ref_count == 0,
+            MediaBlob.updated_at < updated_before
+        )
+        if after is not None:
+            query = query.where(tuple_(MediaBlob.updated_at, MediaBlob.sha256) > tuple_(*after))
+        query = query.order_by(MediaBlob.updated_at, MediaBlob.sha256).limit(limit)
+        result = await self.db_session.execute(query)
+        return [(row.sha256, row.updated_at) for row in result]
+
+    async def delete_unreferenced(self, sha256s: Iterable[str], updated_before: datetime) -> List[MediaBlob]:
+        """
+        Удаляет записи, если на файлы так и не появилось ссылок, и возвращает удаленные.
+        Условие повторяется в DELETE: ссылка могла появиться после выборки
+        """
+        query = (
+            delete(MediaBlob)
+            .where(
+                MediaBlob.sha256.in_(list(sha256s)),
+                MediaBlob.ref_count == 0,
+                MediaBlob.updated_at < updated_before
+            )
+            .returning(MediaBlob)
+        )
+        result = await self.db_session.execute(query)
+        blobs = list(result.scalars().all())
+        await self.db_session.commit()
+        return blobs
+
+    async def get_existing(self, sha256s: Iterable[str]) -> Set[str]:
+        query = select(MediaBlob.sha256).where(MediaBlob.sha256.in_(list(sha256s)))
+        result = await self.db_session.execute(query)
+        return set(result.scalars().all())
+
+    async def iter_referenced_urls(self, batch_size: int = 1000) -> AsyncIterator[str]:
+        """Ссылки на медиа из users.photo, users.header_photo и episodes.video_file, потоком"""
+        for query in (
+            select(User.photo).where(User.photo.is_not(None)),
+            select(User.header_photo).where(User.header_photo.is_not(None)),
+            select(User.frame_photo).where(User.frame_photo.is_not(None)),
+            select(Episode.video_file),
+        ):
+            result = await self.db_session.stream_scalars(query.execution_options(yield_per=batch_size))
+            async for url in result:
+                yield url
@@ -1,11 +1,32 @@
-from sqlalchemy import update, delete, select, and_
+from sqlalchemy import update, delete, select, and_, or_, case, cast, func, Numeric
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Union, List
+from sqlalchemy.orm import aliased
+from typing import Iterable, Union, List, Optional, Sequence, Set, Tuple
 from db.models.movies import Movie
 from db.dals.base_dal import BaseDAL
+from db.dals.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from db.dals.projection import select_columns
 from datetime import datetime
 from db.models.comments import Comment
 
+class DirtyMovies:
+    """Фильмы, оценки которых менялись с момента последней сверки рейтинга"""
+
+    def __init__(self):
+        self._movie_ids: Set[int] = set()
+
+    def mark(self, movie_id: int) -> None:
+        self._movie_ids.add(movie_id)
+
+    def drain(self) -> Set[int]:
+        movie_ids, self._movie_ids = self._movie_ids, set()
+        return movie_ids
+
+    def restore(self, movie_ids: Iterable[int]) -> None:
+        self._movie_ids.update(movie_ids)
+
+dirty_movies = DirtyMovies()
+
 class MovieDAL(BaseDAL):
     async def create_movie(
         self,
@@ -49,20 +70,35 @@ class MovieDAL(BaseDAL):
             return deleted_movie_id[0]
         return None
     
-    async def get_movie(self, movie_id: int) -> Union[Movie, None]:
-        query = select(Movie).where(and_(
+    async def get_movie(self, movie_id: int, columns: Optional[Sequence[str]] = None) -> Union[Movie, None]:
+        """Если переданы columns, возвращает строку только с этими колонками"""
+        query = select_columns(Movie, columns).where(and_(
             Movie.movie_id == movie_id,
             Movie.is_active == True
         ))
         result = await self.db_session.execute(query)
+        if columns is not None:
+            return result.first()
         movie = result.scalar_one_or_none()
         return movie
     
-    async def get_movies(self) -> List[Movie]:
-        query = select(Movie).where(Movie.is_active == True)
+    async def get_movies(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Movie], Optional[str]]:
+        query = select_columns(Movie, columns, required=["movie_id"]).where(Movie.is_active == True)
+        if cursor is not None:
+            (last_movie_id,) = decode_cursor(cursor, int)
+            query = query.where(Movie.movie_id > last_movie_id)
+        query = query.order_by(Movie.movie_id).limit(limit + 1)
         result = await self.db_session.execute(query)
-        movies = result.fetchall()
-        return [movie[0] for movie in movies]
+        if columns is not None:
+            movies = list(result.all())
+        else:
+            movies = [movie[0] for movie in result.fetchall()]
+        return paginate(movies, limit, lambda movie: (movie.movie_id,))
 
     async def update_movie(self, movie_id: int, **kwargs) -> Union[int, None]:
         query = update(Movie).\
@@ -76,35 +112,63 @@ class MovieDAL(BaseDAL):
             return update_movie_id_row[0]
         return None 
 
-    async def update_movie_rating(self, movie_id: int) -> Union[float, None]:
-        """Обновляет рейтинг фильма на основе среднего значения оценок из комментариев"""
-        query = select(Movie).where(and_(
-            Movie.movie_id == movie_id,
-            Movie.is_active == True
+    async def apply_rating_delta(self, movie_id: int, sum_delta: int, count_delta: int) -> None:
+        """
+        Сдвигает счетчики оценок фильма и пересчитывает rating за O(1).
+        Не делает commit: вызывается в транзакции, изменяющей комментарий
+        """
+        new_sum = Movie.rating_sum + sum_delta
+        new_count = Movie.rating_count + count_delta
+        query = update(Movie).\
+            where(Movie.movie_id == movie_id).\
+            values(
+                rating_sum=new_sum,
+                rating_count=new_count,
+                rating=case(
+                    (new_count > 0, func.round(cast(new_sum, Numeric) / new_count, 1)),
+                    else_=0.0
+                )
+            )
+        await self.db_session.execute(query)
+        dirty_movies.mark(movie_id)
+
+    async def recompute_ratings(self, movie_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Пересчитывает рейтинг одним UPDATE ... FROM (SELECT ... GROUP BY movie_id).
+        movie_ids ограничивает пересчет, None - все фильмы.
+        Обновляются только строки с расхождением, возвращается их количество
+        """
+        # LEFT JOIN, чтобы обнулить рейтинг фильмов без активных комментариев
+        movie = aliased(Movie)
+        aggregate = select(
+            movie.movie_id.label("movie_id"),
+            func.coalesce(func.sum(Comment.rating), 0).label("rating_sum"),
+            func.count(Comment.comment_id).label("rating_count")
+        ).select_from(movie).outerjoin(Comment, and_(
+            Comment.movie_id == movie.movie_id,
+            Comment.is_active == True
         ))
+        if movie_ids is not None:
+            aggregate = aggregate.where(movie.movie_id.in_(list(movie_ids)))
+        aggregate = aggregate.group_by(movie.movie_id).subquery()
+
+        new_rating = case(
+            (aggregate.c.rating_count > 0,
+             func.round(cast(aggregate.c.rating_sum, Numeric) / aggregate.c.rating_count, 1)),
+            else_=0.0
+        )
+        query = update(Movie).\
+            where(Movie.movie_id == aggregate.c.movie_id).\
+            where(or_(
+                Movie.rating_sum != aggregate.c.rating_sum,
+                Movie.rating_count != aggregate.c.rating_count,
+                Movie.rating != new_rating
+            )).\
+            values(
+                rating=new_rating,
+                rating_sum=aggregate.c.rating_sum,
+                rating_count=aggregate.c.rating_count
+            )
         result = await self.db_session.execute(query)
-        movie = result.scalar_one_or_none()
-        
-        if movie is not None:
-            # Получаем все активные комментарии для фильма
-            comments_query = select(Comment).where(and_(
-                Comment.movie_id == movie_id,
-                Comment.is_active == True
-            ))
-            comments_result = await self.db_session.execute(comments_query)
-            comments = comments_result.scalars().all()
-            
-            if comments:
-                # Вычисляем средний рейтинг
-                total_rating = sum(comment.rating for comment in comments)
-                average_rating = total_rating / len(comments)
-                
-                # Обновляем рейтинг фильма
-                update_query = update(Movie).\
-                    where(Movie.movie_id == movie_id).\
-                    values(rating=round(average_rating, 1))
-                await self.db_session.execute(update_query)
-                await self.db_session.commit()
-                
-                return round(average_rating, 1)
-        return None 
\ No newline at end of file
+        await self.db_session.commit()
+        return result.rowcount
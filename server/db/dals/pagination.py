@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(*values: Any) -> str:
+    """Упаковывает значения ключа сортировки последней строки в непрозрачный курсор"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple:
+    """Распаковывает курсор, приводя значения к ожидаемым типам"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise InvalidCursorError("Invalid cursor")
+        return tuple(
+            datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value_type, value in zip(types, payload)
+        )
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursorError("Invalid cursor")
+
+
+def paginate(rows: List, limit: int, cursor_of: Callable[[Any], Tuple]) -> Tuple[List, Optional[str]]:
+    """
+    Обрезает выборку из limit + 1 строк до limit и возвращает курсор следующей страницы,
+    если лишняя строка была найдена
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(*cursor_of(rows[-1]))
+    return rows, None
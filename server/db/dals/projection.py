@@ -0,0 +1,27 @@
+from typing import Mapping, Optional, Sequence
+
+from sqlalchemy import select
+
+
+def select_columns(
+    model,
+    columns: Optional[Sequence[str]],
+    required: Sequence[str] = (),
+    expressions: Optional[Mapping[str, object]] = None
+):
+    """
+    Строит select только по нужным колонкам модели.
+    required - колонки, без которых DAL не обойдется (например, ключ курсора)
+    expressions - SQL-выражения, которые читаются вместо одноименных колонок
+    """
+    if columns is None:
+        return select(model)
+    names = list(dict.fromkeys([*required, *columns]))
+    unknown = [name for name in names if name not in model.__table__.columns]
+    if unknown:
+        raise ValueError(f"Unknown columns for {model.__tablename__}: {', '.join(unknown)}")
+    expressions = expressions or {}
+    return select(*(
+        expressions[name].label(name) if name in expressions else getattr(model, name)
+        for name in names
+    ))
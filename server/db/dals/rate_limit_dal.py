@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import Dict, Iterable, List
+from sqlalchemy import select, delete, case, func
+from sqlalchemy.dialects.postgresql import insert
+from db.models.rate_limits import RateLimitCounter
+from db.dals.base_dal import BaseDAL
+
+class RateLimitDAL(BaseDAL):
+    async def get_counts(self, keys: List[str]) -> Dict[str, int]:
+        query = select(RateLimitCounter.key, RateLimitCounter.count).where(
+            RateLimitCounter.key.in_(keys),
+            RateLimitCounter.expires_at > datetime.now()
+        )
+        result = await self.db_session.execute(query)
+        return {row.key: row.count for row in result}
+
+    async def increment(self, key: str, expires_at: datetime, amount: int = 1) -> int:
+        """
+        Изменяет счетчик на amount одним запросом, не опуская ниже нуля;
+        истекший, но еще не удаленный счетчик начинается заново
+        """
+        now = datetime.now()
+        initial = max(amount, 0)
+        query = insert(RateLimitCounter).values(key=key, count=initial, expires_at=expires_at)
+        alive = RateLimitCounter.expires_at > now
+        query = query.on_conflict_do_update(
+            index_elements=[RateLimitCounter.key],
+            set_={
+                "count": case((alive, func.greatest(RateLimitCounter.count + amount, 0)), else_=initial),
+                "expires_at": case((alive, RateLimitCounter.expires_at), else_=query.excluded.expires_at),
+            }
+        ).returning(RateLimitCounter.count)
+        result = await self.db_session.execute(query)
+        await self.db_session.commit()
+        return result.scalar_one()
+
+    async def delete_counters(self, keys: Iterable[str]) -> None:
+        await self.db_session.execute(delete(RateLimitCounter).where(RateLimitCounter.key.in_(list(keys))))
+        await self.db_session.commit()
+
+    async def delete_expired(self) -> int:
+        query = delete(RateLimitCounter).where(RateLimitCounter.expires_at <= datetime.now())
+        result = await self.db_session.execute(query)
+        await self.db_session.commit()
+        return result.rowcount
@@ -0,0 +1,66 @@
+from typing import Optional, Tuple, Union
+from sqlalchemy import select, update, delete, and_
+from sqlalchemy.dialects.postgresql import insert
+from db.models.movies import Movie, MovieReaction, ReactionType
+from db.dals.base_dal import BaseDAL
+
+class ReactionDAL(BaseDAL):
+    async def get_reaction(self, movie_id: int, user_id: int) -> Union[ReactionType, None]:
+        # Поиск по первичному ключу (movie_id, user_id)
+        query = select(MovieReaction.reaction).where(and_(
+            MovieReaction.movie_id == movie_id,
+            MovieReaction.user_id == user_id
+        ))
+        result = await self.db_session.execute(query)
+        return result.scalar_one_or_none()
+
+    async def get_counts(self, movie_id: int) -> Tuple[int, int]:
+        query = select(Movie.like_count, Movie.dislike_count).where(Movie.movie_id == movie_id)
+        result = await self.db_session.execute(query)
+        return tuple(result.one())
+
+    async def set_reaction(
+        self,
+        movie_id: int,
+        user_id: int,
+        reaction: Optional[ReactionType]
+    ) -> Tuple[int, int]:
+        """
+        Ставит реакцию (None - снимает) и обновляет счетчики фильма в одной транзакции.
+        Возвращает (like_count, dislike_count)
+        """
+        # DELETE ... RETURNING отдает прежнюю реакцию ровно одной из конкурентных транзакций
+        delete_query = delete(MovieReaction).where(and_(
+            MovieReaction.movie_id == movie_id,
+            MovieReaction.user_id == user_id
+        )).returning(MovieReaction.reaction)
+        old_reaction = (await self.db_session.execute(delete_query)).scalar_one_or_none()
+
+        new_reaction = None
+        if reaction is not None:
+            insert_query = insert(MovieReaction).values(
+                movie_id=movie_id,
+                user_id=user_id,
+                reaction=reaction
+            ).on_conflict_do_nothing(
+                index_elements=[MovieReaction.movie_id, MovieReaction.user_id]
+            ).returning(MovieReaction.reaction)
+            new_reaction = (await self.db_session.execute(insert_query)).scalar_one_or_none()
+
+        like_delta = (new_reaction == ReactionType.LIKE) - (old_reaction == ReactionType.LIKE)
+        dislike_delta = (new_reaction == ReactionType.DISLIKE) - (old_reaction == ReactionType.DISLIKE)
+
+        if like_delta or dislike_delta:
+            counts_query = update(Movie).\
+                where(Movie.movie_id == movie_id).\
+                values(
+                    like_count=Movie.like_count + like_delta,
+                    dislike_count=Movie.dislike_count + dislike_delta
+                ).\
+                returning(Movie.like_count, Movie.dislike_count)
+            counts = tuple((await self.db_session.execute(counts_query)).one())
+        else:
+            counts = await self.get_counts(movie_id)
+
+        await self.db_session.commit()
+        return counts
@@ -1,10 +1,24 @@
-from sqlalchemy import update, delete, select, and_
+from sqlalchemy import update, delete, select, and_, case, tuple_
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Union
+from typing import Dict, Union, List, Optional, Sequence, Tuple
 from db.models.users import User, UserRole
 from db.dals.base_dal import BaseDAL
+from db.dals.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from db.dals.projection import select_columns
 from db.session import async_session
-from datetime import datetime
+from datetime import datetime, timedelta
+
+
+def _premium_expressions(now: datetime) -> Dict[str, object]:
+    """Премиум-поля с учетом срока: подписка, истекшая до снятия, читается как неактивная"""
+    # IS TRUE и IS NOT NULL, чтобы выражение не давало NULL вместо False
+    active = and_(User.is_premium.is_(True), User.premium_until.is_not(None), User.premium_until > now)
+    return {
+        "is_premium": active,
+        "premium_until": case((active, User.premium_until), else_=None),
+    }
+
 
 class UserDAL(BaseDAL):
     async def create_user(self, name: str, surname: str, username: str, email: str, hashed_password: str, role: UserRole) -> User:
@@ -33,12 +47,15 @@ class UserDAL(BaseDAL):
             return deleted_user_by_id[0]
         return None
     
-    async def get_user(self, user_id: int) -> Union[User, None]:
-        query = select(User).where(User.user_id == user_id)
+    async def get_user(self, user_id: int, columns: Optional[Sequence[str]] = None) -> Union[User, None]:
+        """Если переданы columns, возвращает строку только с этими колонками"""
+        query = select_columns(User, columns, expressions=_premium_expressions(datetime.now())).where(
+            User.user_id == user_id
+        )
         result = await self.db_session.execute(query)
         user_by_id = result.fetchone()
         if user_by_id is not None:
-            return user_by_id[0]
+            return user_by_id if columns is not None else user_by_id[0]
         return None
     
     async def get_user_by_username(self, username: str) -> Union[User, None]:
@@ -49,11 +66,25 @@ class UserDAL(BaseDAL):
             return user_by_username[0]
         return None
     
-    async def get_users(self) -> list[User]:
-        query = select(User).where(User.is_active == True)
+    async def get_users(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> Tuple[List[User], Optional[str]]:
+        query = select_columns(
+            User, columns, required=["user_id"], expressions=_premium_expressions(datetime.now())
+        ).where(User.is_active == True)
+        if cursor is not None:
+            (last_user_id,) = decode_cursor(cursor, int)
+            query = query.where(User.user_id > last_user_id)
+        query = query.order_by(User.user_id).limit(limit + 1)
         result = await self.db_session.execute(query)
-        users = result.fetchall()
-        return [user[0] for user in users]
+        if columns is not None:
+            users = list(result.all())
+        else:
+            users = [user[0] for user in result.fetchall()]
+        return paginate(users, limit, lambda user: (user.user_id,))
 
     async def update_user(self, user_id: int, **kwargs) -> Union[int, None]:
         query = update(User).\
@@ -67,6 +98,110 @@ class UserDAL(BaseDAL):
             return update_user_id_row[0]
         return None
     
+    async def set_image_renditions(
+        self,
+        user_id: int,
+        image_type: str,
+        original_url: str,
+        url: str,
+        renditions: dict
+    ) -> bool:
+        """
+        Переключает фото или заголовок с оригинала на набор копий.
+        Ничего не меняет, если пользователь успел загрузить другое изображение
+        """
+        column = getattr(User, image_type)
+        query = (
+            update(User)
+            .where(and_(User.user_id == user_id, column == original_url))
+            .values({image_type: url, f"{image_type}_renditions": renditions})
+            .returning(User.user_id)
+        )
+        result = await self.db_session.execute(query)
+        updated = result.scalar_one_or_none() is not None
+        await self.db_session.commit()
+        return updated
+
+    async def debit_money(self, user_id: int, amount: float) -> Optional[float]:
+        """
+        Списывает amount, если денег хватает, и возвращает новый баланс; None - денег не хватает.
+        Условие проверяется в том же UPDATE под блокировкой строки, поэтому параллельные
+        списания не уводят баланс в минус. Коммит - на стороне вызывающего
+        """
+        query = (
+            update(User)
+            .where(and_(User.user_id == user_id, User.money >= amount))
+            .values(money=User.money - amount)
+            .returning(User.money)
+        )
+        result = await self.db_session.execute(query)
+        return result.scalar_one_or_none()
+
+    async def purchase_premium(self, user_id: int, price: float, days: int) -> Optional[Row]:
+        """
+        Списывает price и продлевает премиум на days дней одним UPDATE: от текущего срока,
+        если подписка еще действует, иначе от текущего момента.
+        Возвращает (money, is_premium, premium_until) или None, если денег не хватает
+        """
+        now = datetime.now()
+        query = (
+            update(User)
+            .where(and_(User.user_id == user_id, User.money >= price))
+            .values(
+                money=User.money - price,
+                is_premium=True,
+                premium_until=case(
+                    (
+                        and_(User.is_premium == True, User.premium_until > now),
+                        User.premium_until
+                    ),
+                    else_=now
+                ) + timedelta(days=days)
+            )
+            .returning(User.money, User.is_premium, User.premium_until)
+        )
+        result = await self.db_session.execute(query)
+        row = result.fetchone()
+        if row is not None:
+            await self.db_session.commit()
+        return row
+
+    async def get_premium_expiring(
+        self,
+        until: datetime,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Tuple[int, datetime]]:
+        """
+        Действующие подписки со сроком раньше until, по частичному индексу ix_users_premium_until.
+        after - последняя пара (premium_until, user_id) предыдущей страницы
+        """
+        query = select(User.user_id, User.premium_until).where(
+            User.is_premium == True,
+            User.premium_until < until
+        )
+        if after is not None:
+            query = query.where(tuple_(User.premium_until, User.user_id) > tuple_(*after))
+        query = query.order_by(User.premium_until, User.user_id).limit(limit)
+        result = await self.db_session.execute(query)
+        return [(row.user_id, row.premium_until) for row in result]
+
+    async def expire_premium(self, now: Optional[datetime] = None) -> List[int]:
+        """
+        Снимает истекшие подписки одним UPDATE по частичному индексу ix_users_premium_until.
+        Возвращает id пользователей, у которых подписка снята
+        """
+        query = (
+            update(User)
+            .where(and_(User.is_premium == True, User.premium_until < (now or datetime.now())))
+            .values(is_premium=False, premium_until=None)
+            .returning(User.user_id)
+        )
+        result = await self.db_session.execute(query)
+        user_ids = list(result.scalars().all())
+        await self.db_session.commit()
+        return user_ids
+
     async def get_user_by_email(self, email: str) -> Union[User, None]:
         query = select(User).where(User.email == email)
         res = await self.db_session.execute(query)
@@ -1,12 +1,22 @@
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import String, Boolean, Integer, DateTime, ForeignKey, Text, Index, text
 from .base import Base
 from db.models.users import User
 from db.models.movies import Movie
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_movie_root_active", "movie_id", "created_at", "comment_id",
+              postgresql_where=text("is_active AND parent_comment_id IS NULL")),
+        Index("ix_comments_parent_active", "parent_comment_id", "created_at",
+              postgresql_where=text("is_active")),
+        Index("ix_comments_user_active", "user_id", "created_at", "comment_id",
+              postgresql_where=text("is_active")),
+        Index("ix_comments_movie_rating_active", "movie_id", "rating",
+              postgresql_where=text("is_active")),
+    )
 
     comment_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     
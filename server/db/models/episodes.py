@@ -1,12 +1,15 @@
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Float
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Float, Index, UniqueConstraint
 from .base import Base
 from db.models.movies import Movie
 from db.models.users import User
 
 class Episode(Base):
     __tablename__ = "episodes"
+    __table_args__ = (
+        Index("ix_episodes_movie_number", "movie_id", "episode_number"),
+    )
 
     episode_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     movie_id: Mapped[int] = mapped_column(Integer, ForeignKey("movies.movie_id"), nullable=False)
@@ -24,6 +27,9 @@ class Episode(Base):
 
 class PurchasedEpisode(Base):
     __tablename__ = "purchased_episodes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "episode_id", name="uq_purchased_episodes_user_episode"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.user_id"), nullable=False)
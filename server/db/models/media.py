@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, BigInteger, DateTime, Index, text
+from .base import Base
+
+class MediaBlob(Base):
+    """Файл хранилища по содержимому и число ссылающихся на него записей"""
+    __tablename__ = "media_blobs"
+    __table_args__ = (
+        # Сборщик мусора ищет файлы без ссылок
+        Index("ix_media_blobs_unreferenced", "updated_at", postgresql_where=text("ref_count = 0")),
+    )
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    path: Mapped[str] = mapped_column(String, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
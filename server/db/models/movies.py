@@ -1,6 +1,6 @@
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, Integer, DateTime, Float, Text, ForeignKey, Enum as SQLAlchemyEnum, ARRAY
+from sqlalchemy import String, Boolean, Integer, BigInteger, DateTime, Float, Text, ForeignKey, Enum as SQLAlchemyEnum, Index, text
 from enum import Enum
 from .base import Base
 from db.models.users import User
@@ -16,8 +16,15 @@ class MovieAccessLevel(str, Enum):
     MODERATED = "MODERATED"  # Требуется модерация
     PRIVATE = "PRIVATE"  # Только для определенных пользователей
 
+class ReactionType(str, Enum):
+    LIKE = "LIKE"
+    DISLIKE = "DISLIKE"
+
 class Movie(Base):
     __tablename__ = "movies"
+    __table_args__ = (
+        Index("ix_movies_active", "movie_id", postgresql_where=text("is_active")),
+    )
 
     movie_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     
@@ -33,12 +40,16 @@ class Movie(Base):
     release_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     duration: Mapped[int] = mapped_column(Integer, nullable=False)  # в минутах
     rating: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    # Сумма и количество активных оценок, rating = rating_sum / rating_count
+    rating_sum: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    rating_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     
     director: Mapped[str] = mapped_column(String, nullable=False)
     genres: Mapped[str] = mapped_column(String, nullable=False)  # список жанров через запятую
 
-    likes: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False, default=[])
-    dislikes: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False, default=[])
+    # Денормализованные счетчики реакций из movie_reactions
+    like_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    dislike_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     
     access_level: Mapped[MovieAccessLevel] = mapped_column(SQLAlchemyEnum(MovieAccessLevel), nullable=False, default=MovieAccessLevel.PUBLIC)
     owner_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.user_id"), nullable=False)
@@ -127,4 +138,14 @@ class Movie(Base):
         if user.can_moderate():
             return self.access_level == MovieAccessLevel.PUBLIC
 
-        return False 
\ No newline at end of file
+        return False
+
+
+class MovieReaction(Base):
+    """Реакция пользователя на фильм: не более одной на пару (фильм, пользователь)"""
+    __tablename__ = "movie_reactions"
+
+    movie_id: Mapped[int] = mapped_column(Integer, ForeignKey("movies.movie_id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    reaction: Mapped[ReactionType] = mapped_column(SQLAlchemyEnum(ReactionType, name="reaction_type"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
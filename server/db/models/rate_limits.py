@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, DateTime, Index
+from .base import Base
+
+class RateLimitCounter(Base):
+    """
+    Счетчик ограничения частоты для общего хранилища. Таблица UNLOGGED: счетчики
+    не стоят записи в WAL, а потеря их при сбое базы лишь сбрасывает ограничения
+    """
+    __tablename__ = "rate_limit_counters"
+    __table_args__ = (
+        Index("ix_rate_limit_counters_expires_at", "expires_at"),
+        {"prefixes": ["UNLOGGED"]},
+    )
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, Integer, DateTime, Enum as SQLAlchemyEnum, Float
+from sqlalchemy import String, Boolean, Integer, DateTime, Enum as SQLAlchemyEnum, Float, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from enum import Enum
 from .base import Base
 
@@ -25,14 +26,26 @@ class UserRole(str, Enum):
 
 class LoginAttempt(Base):
     __tablename__ = "login_attempts"
+    __table_args__ = (
+        Index("ix_login_attempts_email_created_at", "email", "created_at"),
+        # Удаление записей старше срока хранения
+        Index("ix_login_attempts_created_at", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(String, nullable=False)
     success: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    ip_address: Mapped[str] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_username", "username"),
+        Index("ix_users_active", "user_id", postgresql_where=text("is_active")),
+        # Снятие истекших подписок
+        Index("ix_users_premium_until", "premium_until", postgresql_where=text("is_premium")),
+    )
 
 
     role: Mapped[UserRole] = mapped_column(SQLAlchemyEnum(UserRole, name="user_role"), nullable=False, default=UserRole.USER)
@@ -45,6 +58,9 @@ class User(Base):
     photo: Mapped[str] = mapped_column(String, nullable=False, default=DEFAULT_PHOTO)
     frame_photo: Mapped[str] = mapped_column(String, nullable=True)
     header_photo: Mapped[str] = mapped_column(String, nullable=False, default=DEFAULT_HEADER_PHOTO)
+    # Набор уменьшенных копий фото и заголовка, заполняется фоновой обработкой изображений
+    photo_renditions: Mapped[dict] = mapped_column(JSONB, nullable=True)
+    header_photo_renditions: Mapped[dict] = mapped_column(JSONB, nullable=True)
 
     name: Mapped[str] = mapped_column(String, nullable=False)
     surname: Mapped[str] = mapped_column(String, nullable=False)
@@ -92,6 +108,11 @@ class User(Base):
             return False
         return datetime.now() < self.premium_until
 
+    @property
+    def active_premium_until(self) -> datetime | None:
+        """Срок подписки, если она еще действует: истекшая, но не снятая подписка не видна"""
+        return self.premium_until if self.is_premium_active() else None
+
     def can_watch_episode(self, episode_cost: float = 50.0) -> tuple[bool, str]:
         """
         Проверяет, может ли пользователь смотреть эпизод
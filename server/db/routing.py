@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# На основной базе pg_is_in_recovery() = false, поэтому отставание равно нулю,
+# и один URL может выступать одновременно и основной базой, и репликой
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+def sticky_key(request: Request) -> Optional[str]:
+    """Ключ клиента для read-your-writes: токен авторизации или адрес клиента"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return hashlib.sha1(authorization.encode()).hexdigest()
+    if request.client:
+        return request.client.host
+    return None
+
+
+class WriteStickiness:
+    """Запоминает недавние записи клиентов, чтобы их чтения шли на основную базу"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._writes: dict[str, float] = {}
+        self._next_prune = 0.0
+
+    def mark_write(self, key: Optional[str]) -> None:
+        if key is None or self.window <= 0:
+            return
+        now = time.monotonic()
+        self._writes[key] = now + self.window
+        if now >= self._next_prune:
+            self._prune(now)
+
+    def is_sticky(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        expires_at = self._writes.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            self._writes.pop(key, None)
+            return False
+        return True
+
+    def _prune(self, now: float) -> None:
+        self._writes = {key: expires_at for key, expires_at in self._writes.items() if expires_at >= now}
+        self._next_prune = now + self.window
+
+
+class ReplicaMonitor:
+    """Периодически проверяет доступность и отставание реплики"""
+
+    def __init__(self, replica_engine: AsyncEngine, max_lag: float, check_interval: float):
+        self.replica_engine = replica_engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self._usable = True
+        self._checked_at: Optional[float] = None
+
+    async def is_usable(self) -> bool:
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._usable
+        # Отмечаем проверку заранее, чтобы параллельные запросы не проверяли реплику одновременно
+        self._checked_at = now
+        try:
+            async with self.replica_engine.connect() as conn:
+                lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+            self.lag = float(lag) if lag is not None else 0.0
+            self._usable = self.lag <= self.max_lag
+            if not self._usable:
+                logger.warning(f"Replica lag {self.lag:.2f}s exceeds {self.max_lag}s, reading from primary")
+        except Exception as e:
+            logger.warning(f"Replica is unavailable, reading from primary: {str(e)}")
+            self.lag = None
+            self._usable = False
+        return self._usable
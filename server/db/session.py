@@ -1,17 +1,158 @@
-from typing import Generator
+import time
+import uuid
+from typing import Generator, Optional
 
-
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from fastapi import Request
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
 
 import core.config as config
+import config.db_config as db_config
+from db.routing import ReplicaMonitor, WriteStickiness, sticky_key
+
+
+class PoolWaitStats:
+    """
+    Накопительная статистика ожидания соединения из пула. Ожидание - только время
+    в очереди свободных соединений, открытие нового соединения в него не входит
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.errors = 0
+
+    def record(self, wait: float) -> None:
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def as_dict(self) -> dict:
+        # Неудачные ожидания тоже ожидания: среднее считается по всем запросам соединения
+        waits = self.checkouts + self.timeouts
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "avg_wait": self.total_wait / waits if waits else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+class _TimedQueue(AsyncAdaptedQueue):
+    """Очередь свободных соединений, замеряющая блокирующее ожидание"""
+
+    wait_stats: Optional[PoolWaitStats] = None
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        if not block or self.wait_stats is None:
+            return super().get(block, timeout)
+        start = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания свободного соединения"""
+
+    _queue_class = _TimedQueue
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = self._pool.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        except Exception:
+            # Ошибка открытия соединения - не таймаут пула
+            self.wait_stats.errors += 1
+            raise
+        self.wait_stats.checkouts += 1
+        return record
 
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.wait_stats = new_pool._pool.wait_stats = self.wait_stats
+        return new_pool
 
-engine = create_async_engine(config.REAL_DATABASE_URL, echo=True, future=True)
+
+def _connect_args() -> dict:
+    if db_config.DB_PGBOUNCER_MODE:
+        # PgBouncer в режиме transaction pooling не сохраняет подготовленные
+        # выражения между транзакциями, поэтому кэш отключаем полностью
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {
+        "statement_cache_size": db_config.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": db_config.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def create_engine(url: str, **overrides) -> AsyncEngine:
+    """Создает асинхронный движок с параметрами пула из настроек"""
+    options = dict(
+        echo=db_config.DB_ECHO,
+        future=True,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=db_config.DB_POOL_SIZE,
+        max_overflow=db_config.DB_MAX_OVERFLOW,
+        pool_timeout=db_config.DB_POOL_TIMEOUT,
+        pool_recycle=db_config.DB_POOL_RECYCLE,
+        pool_pre_ping=db_config.DB_POOL_PRE_PING,
+        connect_args=_connect_args(),
+    )
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+def get_pool_stats(db_engine: AsyncEngine = None) -> dict:
+    """Возвращает текущее состояние пула соединений для экспорта в метрики"""
+    pool = (db_engine or engine).pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats.update(wait_stats.as_dict())
+    return stats
+
+
+engine = create_engine(config.REAL_DATABASE_URL)
 
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Без отдельного URL реплики чтение идет через основной движок
+if db_config.REPLICA_DATABASE_URL:
+    replica_engine = create_engine(db_config.REPLICA_DATABASE_URL)
+else:
+    replica_engine = engine
+
+async_replica_session = sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+
+write_stickiness = WriteStickiness(window=db_config.READ_YOUR_WRITES_WINDOW)
+replica_monitor = ReplicaMonitor(
+    replica_engine,
+    max_lag=db_config.REPLICA_MAX_LAG,
+    check_interval=db_config.REPLICA_HEALTH_CHECK_INTERVAL,
+)
+
 async def get_db() -> Generator:
     try:
         session = async_session()
@@ -19,3 +160,18 @@ async def get_db() -> Generator:
     finally:
         await session.close()
 
+async def get_read_db(request: Request) -> Generator:
+    """
+    Сессия только для чтения: идет на реплику, если она доступна, не отстает
+    и клиент не выполнял запись в последние READ_YOUR_WRITES_WINDOW секунд
+    """
+    use_replica = (
+        replica_engine is not engine
+        and not write_stickiness.is_sticky(sticky_key(request))
+        and await replica_monitor.is_usable()
+    )
+    try:
+        session = async_replica_session() if use_replica else async_session()
+        yield session
+    finally:
+        await session.close()
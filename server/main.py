@@ -5,17 +5,21 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from api.router import main_router
 from api.routers import auth, users, movies, comments, episodes, premium
 from api.middleware.timing import TimingMiddleware
+from api.middleware.read_your_writes import ReadYourWritesMiddleware
 from config.logging_config import setup_logging
-from api.services.premium_service import start_premium_checker
-from db.session import async_session
-import asyncio
+import config.upload_config as upload_config
+from db.session import engine, replica_engine
+from core.storage import storage
 from tasks.background_tasks import start_background_tasks
+from tasks.image_pipeline import stop_image_pipeline
+from core.hashing import password_hash_pool
+from tasks.login_audit import stop_login_audit
+from api.services.login_limiter import login_limiter
 from core.oauth import setup_oauth
 from contextlib import asynccontextmanager
 
@@ -24,10 +28,16 @@ setup_logging()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Запускает фоновые задачи при старте приложения и очищает ресурсы при остановке"""
-    session = async_session()
-    asyncio.create_task(start_premium_checker(session))
     await start_background_tasks()
     yield
+    stop_image_pipeline()
+    password_hash_pool.shutdown()
+    await stop_login_audit()
+    await login_limiter.close()
+    await storage.close()
+    await engine.dispose()
+    if replica_engine is not engine:
+        await replica_engine.dispose()
 
 app = FastAPI(
     title="API для работы с базой данных",
@@ -46,15 +56,14 @@ app.add_middleware(
 )
 
 app.add_middleware(TimingMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 
 setup_oauth(app)
 
-os.makedirs("server/media", exist_ok=True)
-
-app.mount("/media", StaticFiles(directory="server/media", html=True), name="media")
-
 app.include_router(main_router)
 
+os.makedirs(upload_config.MEDIA_ROOT, exist_ok=True)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(
@@ -21,6 +21,8 @@ from db.models.users import User, LoginAttempt
 from db.models.movies import Movie
 from db.models.comments import Comment
 from db.models.episodes import Episode
+from db.models.media import MediaBlob
+from db.models.rate_limits import RateLimitCounter
 
 target_metadata = Base.metadata
 
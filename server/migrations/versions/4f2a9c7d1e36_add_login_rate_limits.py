@@ -0,0 +1,55 @@
+"""Add login rate limit counters and login attempt IP
+
+Revision ID: 4f2a9c7d1e36
+Revises: 937329b51bd2
+Create Date: 2026-10-17 19:12:41.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2a9c7d1e36'
+down_revision: Union[str, None] = '937329b51bd2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_counters',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index('ix_rate_limit_counters_expires_at', 'rate_limit_counters', ['expires_at'], unique=False)
+    op.add_column('login_attempts', sa.Column('ip_address', sa.String(), nullable=True))
+    # login_attempts растет вместе с числом атак: индекс строится без блокировки записи
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_login_attempts_created_at',
+            'login_attempts',
+            ['created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_login_attempts_created_at',
+            table_name='login_attempts',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('login_attempts', 'ip_address')
+    op.drop_index('ix_rate_limit_counters_expires_at', table_name='rate_limit_counters')
+    op.drop_table('rate_limit_counters')
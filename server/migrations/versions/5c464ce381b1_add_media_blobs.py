@@ -0,0 +1,38 @@
+"""Add media blobs
+
+Revision ID: 5c464ce381b1
+Revises: c9493cb3acbb
+Create Date: 2026-10-17 15:21:37.418902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c464ce381b1'
+down_revision: Union[str, None] = 'c9493cb3acbb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_media_blobs_unreferenced', 'media_blobs', ['updated_at'], unique=False, postgresql_where=sa.text('ref_count = 0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_media_blobs_unreferenced', table_name='media_blobs', postgresql_where=sa.text('ref_count = 0'))
+    op.drop_table('media_blobs')
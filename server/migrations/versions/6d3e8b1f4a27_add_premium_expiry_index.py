@@ -0,0 +1,38 @@
+"""Add premium expiry index
+
+Revision ID: 6d3e8b1f4a27
+Revises: 4f2a9c7d1e36
+Create Date: 2026-10-17 20:03:17.284512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d3e8b1f4a27'
+down_revision: Union[str, None] = '4f2a9c7d1e36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # UserDAL.expire_premium: истекшие подписки среди премиум-пользователей
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_premium_until',
+            'users',
+            ['premium_until'],
+            postgresql_where=sa.text('is_premium'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_premium_until', table_name='users', postgresql_concurrently=True, if_exists=True)
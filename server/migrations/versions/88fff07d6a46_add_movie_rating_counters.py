@@ -0,0 +1,45 @@
+"""Add movie rating counters
+
+Revision ID: 88fff07d6a46
+Revises: b1dff6990eba
+Create Date: 2026-10-17 11:40:05.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '88fff07d6a46'
+down_revision: Union[str, None] = 'b1dff6990eba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('movies', sa.Column('rating_sum', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('movies', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Заполняем счетчики по текущим активным комментариям
+    op.execute("""
+        UPDATE movies m
+        SET rating_sum = agg.rating_sum,
+            rating_count = agg.rating_count,
+            rating = ROUND(agg.rating_sum::numeric / agg.rating_count, 1)
+        FROM (
+            SELECT movie_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+            FROM comments
+            WHERE is_active
+            GROUP BY movie_id
+        ) agg
+        WHERE m.movie_id = agg.movie_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('movies', 'rating_count')
+    op.drop_column('movies', 'rating_sum')
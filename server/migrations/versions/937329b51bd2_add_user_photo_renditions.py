@@ -0,0 +1,31 @@
+"""Add user photo renditions
+
+Revision ID: 937329b51bd2
+Revises: 5c464ce381b1
+Create Date: 2026-10-17 16:48:09.267310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '937329b51bd2'
+down_revision: Union[str, None] = '5c464ce381b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('photo_renditions', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('users', sa.Column('header_photo_renditions', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'header_photo_renditions')
+    op.drop_column('users', 'photo_renditions')
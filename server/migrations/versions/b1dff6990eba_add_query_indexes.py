@@ -0,0 +1,88 @@
+"""Add query indexes
+
+Revision ID: b1dff6990eba
+Revises: 851b2870f86c
+Create Date: 2026-10-17 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1dff6990eba'
+down_revision: Union[str, None] = '851b2870f86c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя индекса, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    # CommentDAL.get_movie_comments: корневые активные комментарии фильма
+    ('ix_comments_movie_root_active', 'comments', ['movie_id', 'created_at', 'comment_id'],
+     'is_active AND parent_comment_id IS NULL'),
+    # CommentDAL.get_replies
+    ('ix_comments_parent_active', 'comments', ['parent_comment_id', 'created_at'], 'is_active'),
+    # CommentDAL.get_user_comments
+    ('ix_comments_user_active', 'comments', ['user_id', 'created_at', 'comment_id'], 'is_active'),
+    # Пересчет рейтинга: активные оценки фильма
+    ('ix_comments_movie_rating_active', 'comments', ['movie_id', 'rating'], 'is_active'),
+    # check_login_attempts
+    ('ix_login_attempts_email_created_at', 'login_attempts', ['email', 'created_at'], None),
+    # EpisodeDAL.get_episodes_by_movie
+    ('ix_episodes_movie_number', 'episodes', ['movie_id', 'episode_number'], None),
+    # UserDAL.get_user_by_username
+    ('ix_users_username', 'users', ['username'], None),
+    # MovieDAL.get_movies / UserDAL.get_users
+    ('ix_movies_active', 'movies', ['movie_id'], 'is_active'),
+    ('ix_users_active', 'users', ['user_id'], 'is_active'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Перед уникальным ограничением удаляем повторные покупки одного эпизода
+    op.execute("""
+        DELETE FROM purchased_episodes a
+        USING purchased_episodes b
+        WHERE a.user_id = b.user_id
+          AND a.episode_id = b.episode_id
+          AND a.id > b.id
+    """)
+
+    # Индексы строятся без блокировки записи, что требует выполнения вне транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        op.create_index(
+            'uq_purchased_episodes_user_episode',
+            'purchased_episodes',
+            ['user_id', 'episode_id'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    # check_episode_access ищет покупку по (user_id, episode_id) через этот индекс
+    op.execute(
+        'ALTER TABLE purchased_episodes '
+        'ADD CONSTRAINT uq_purchased_episodes_user_episode '
+        'UNIQUE USING INDEX uq_purchased_episodes_user_episode'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_purchased_episodes_user_episode', 'purchased_episodes', type_='unique')
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,103 @@
+"""Replace movie like arrays with reactions
+
+Revision ID: c9493cb3acbb
+Revises: 88fff07d6a46
+Create Date: 2026-10-17 12:58:20.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9493cb3acbb'
+down_revision: Union[str, None] = '88fff07d6a46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько фильмов переносить за один запрос
+BATCH_SIZE = 1000
+
+
+def _movie_id_batches(conn):
+    max_movie_id = conn.execute(sa.text("SELECT COALESCE(MAX(movie_id), 0) FROM movies")).scalar()
+    for start in range(0, max_movie_id + 1, BATCH_SIZE):
+        yield start, start + BATCH_SIZE
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('movie_reactions',
+    sa.Column('movie_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('reaction', sa.Enum('LIKE', 'DISLIKE', name='reaction_type'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['movie_id'], ['movies.movie_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('movie_id', 'user_id')
+    )
+    op.add_column('movies', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('movies', sa.Column('dislike_count', sa.Integer(), server_default='0', nullable=False))
+
+    conn = op.get_bind()
+    for start, end in _movie_id_batches(conn):
+        # Лайк побеждает, если пользователь оказался в обоих массивах;
+        # идентификаторы удаленных пользователей пропускаются
+        for column, reaction in (('likes', 'LIKE'), ('dislikes', 'DISLIKE')):
+            conn.execute(sa.text(f"""
+                INSERT INTO movie_reactions (movie_id, user_id, reaction, created_at)
+                SELECT DISTINCT m.movie_id, u.user_id, '{reaction}'::reaction_type, now()
+                FROM movies m
+                CROSS JOIN LATERAL unnest(m.{column}) AS r(user_id)
+                JOIN users u ON u.user_id = r.user_id
+                WHERE m.movie_id >= :start AND m.movie_id < :end
+                ON CONFLICT (movie_id, user_id) DO NOTHING
+            """), {"start": start, "end": end})
+        conn.execute(sa.text("""
+            UPDATE movies m
+            SET like_count = agg.like_count,
+                dislike_count = agg.dislike_count
+            FROM (
+                SELECT movie_id,
+                       COUNT(*) FILTER (WHERE reaction = 'LIKE') AS like_count,
+                       COUNT(*) FILTER (WHERE reaction = 'DISLIKE') AS dislike_count
+                FROM movie_reactions
+                WHERE movie_id >= :start AND movie_id < :end
+                GROUP BY movie_id
+            ) agg
+            WHERE m.movie_id = agg.movie_id
+        """), {"start": start, "end": end})
+
+    op.drop_column('movies', 'dislikes')
+    op.drop_column('movies', 'likes')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('movies', sa.Column('likes', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False))
+    op.add_column('movies', sa.Column('dislikes', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False))
+
+    conn = op.get_bind()
+    for start, end in _movie_id_batches(conn):
+        conn.execute(sa.text("""
+            UPDATE movies m
+            SET likes = agg.likes,
+                dislikes = agg.dislikes
+            FROM (
+                SELECT movie_id,
+                       COALESCE(array_agg(user_id) FILTER (WHERE reaction = 'LIKE'), '{}') AS likes,
+                       COALESCE(array_agg(user_id) FILTER (WHERE reaction = 'DISLIKE'), '{}') AS dislikes
+                FROM movie_reactions
+                WHERE movie_id >= :start AND movie_id < :end
+                GROUP BY movie_id
+            ) agg
+            WHERE m.movie_id = agg.movie_id
+        """), {"start": start, "end": end})
+
+    op.drop_column('movies', 'dislike_count')
+    op.drop_column('movies', 'like_count')
+    op.drop_table('movie_reactions')
+    sa.Enum(name='reaction_type').drop(conn, checkfirst=True)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 from fastapi import UploadFile
@@ -46,4 +46,21 @@ class EpisodeUpdateResponse(BaseModel):
     updated_episode_id: int
 
 class EpisodeDeleteResponse(BaseModel):
-    episode_id: int 
\ No newline at end of file
+    episode_id: int
+
+class EpisodeUploadCreate(BaseModel):
+    movie_id: int
+    title: str
+    episode_number: int
+    cost: float = 15.0
+    filename: str
+    content_type: str
+    size: int = Field(gt=0)
+    # Если файл с таким хешем уже есть в хранилище, загружать байты не нужно
+    sha256: Optional[str] = None
+
+class EpisodeUploadStatus(BaseModel):
+    upload_id: str
+    offset: int
+    size: int
+    expires_at: datetime
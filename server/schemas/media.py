@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+class TunedModel(BaseModel):
+    class Config:
+        from_attributes = True
+
+class MediaBlobInfo(TunedModel):
+    sha256: str
+    size: int
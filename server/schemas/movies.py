@@ -1,7 +1,7 @@
 from pydantic import BaseModel, field_validator
 from typing import Optional, List
 from datetime import datetime
-from db.models.movies import MovieAccessLevel
+from db.models.movies import MovieAccessLevel, ReactionType
 
 class TunedModel(BaseModel):
     class Config:
@@ -23,6 +23,17 @@ class MovieRead(TunedModel):
     updated_at: datetime
     is_active: bool
     movie_url: Optional[str] = None
+    like_count: int = 0
+    dislike_count: int = 0
+
+class MovieCard(TunedModel):
+    """Облегченная карточка фильма для списков"""
+    movie_id: int
+    title: str
+    poster: str
+    release_date: datetime
+    rating: float
+    genres: List[str]
 
 class MovieCreate(BaseModel):
     title: str
@@ -74,4 +85,10 @@ class MovieAccessLevelUpdate(BaseModel):
 
 class MovieAccessLevelResponse(BaseModel):
     movie_id: int
-    access_level: MovieAccessLevel 
\ No newline at end of file
+    access_level: MovieAccessLevel
+
+class MovieReactionResponse(BaseModel):
+    movie_id: int
+    reaction: Optional[ReactionType]
+    like_count: int
+    dislike_count: int
@@ -17,6 +17,9 @@ class UserRead(TunedModel):
     username: str
     photo: str = ""
     header_photo: str = ""
+    # Уменьшенные копии загруженных изображений: {"webp": {"320": url, ...}, "jpeg": {...}}
+    photo_renditions: Optional[dict] = None
+    header_photo_renditions: Optional[dict] = None
     email: EmailStr
     about: str = ""
     location: str = ""
@@ -37,6 +40,8 @@ class UserReadLimited(TunedModel):
     username: str
     photo: str
     header_photo: str
+    photo_renditions: Optional[dict] = None
+    header_photo_renditions: Optional[dict] = None
     about: str
     location: str
     age: int
@@ -45,6 +50,15 @@ class UserReadLimited(TunedModel):
     level: int
     title: str
 
+class UserCard(TunedModel):
+    """Облегченная карточка пользователя для списков"""
+    user_id: int
+    username: str
+    photo: str
+    is_premium: bool
+    level: int
+    title: str
+
 class UserBase(BaseModel):
     username: str
     email: EmailStr
@@ -1,30 +1,98 @@
 import asyncio
 import logging
-from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.session import async_session
 from api.services.movie_service import update_all_movies_ratings
+from api.services.upload_service import expire_upload_sessions
+from tasks.image_pipeline import start_image_pipeline
+from tasks.media_gc import collect_media_garbage
+from tasks.login_audit import prune_login_attempts, start_login_audit
+from tasks.premium_expiry import premium_expiry_scheduler
+from api.services.login_limiter import login_limiter
+from core.rate_limit import SharedStoreRateLimiter
+from config.tasks_config import (
+    LOGIN_MAINTENANCE_INTERVAL,
+    MEDIA_GC_INTERVAL,
+    RATING_RECONCILE_INTERVAL,
+    UPLOAD_CLEANUP_INTERVAL
+)
 
 logger = logging.getLogger(__name__)
 
 async def update_ratings_task():
-    """Фоновая задача для обновления рейтингов фильмов"""
+    """Фоновая задача сверки рейтинга фильмов с измененными комментариями"""
+    # Первый запуск сверяет все фильмы: изменения до перезапуска не отслежены
+    full = True
     while True:
         try:
             async with async_session() as session:
-                await update_all_movies_ratings(session)
-                logger.info(f"Рейтинги фильмов обновлены в {datetime.now()}")
+                report = await update_all_movies_ratings(session, full=full)
+                full = False
+                if report["rows_changed"]:
+                    logger.info(
+                        f"Рейтинги фильмов сверены: проверено {report['movies_checked'] or 'все'}, "
+                        f"исправлено {report['rows_changed']} за {report['elapsed']:.3f}с"
+                    )
         except Exception as e:
-            logger.error(f"Ошибка при обновлении рейтингов: {str(e)}")
+            logger.error(f"Ошибка при сверке рейтингов: {str(e)}")
         
-        # Ждем 1 минуту перед следующим обновлением
-        await asyncio.sleep(60)
+        await asyncio.sleep(RATING_RECONCILE_INTERVAL)
+
+async def cleanup_uploads_task():
+    """Фоновая задача удаления заброшенных загрузок видео"""
+    while True:
+        try:
+            expired = await expire_upload_sessions()
+            if expired:
+                logger.info(f"Удалено заброшенных загрузок: {expired}")
+        except Exception as e:
+            logger.error(f"Ошибка при удалении заброшенных загрузок: {str(e)}")
+        
+        await asyncio.sleep(UPLOAD_CLEANUP_INTERVAL)
+
+async def media_gc_task():
+    """Фоновая задача удаления медиафайлов, на которые больше никто не ссылается"""
+    while True:
+        try:
+            report = await collect_media_garbage()
+            if report["files_deleted"]:
+                logger.info(
+                    f"Сборка мусора в хранилище: удалено файлов {report['files_deleted']}, "
+                    f"освобождено {report['bytes_reclaimed']} байт за {report['elapsed']:.3f}с"
+                )
+        except Exception as e:
+            logger.error(f"Ошибка при сборке мусора в хранилище: {str(e)}")
+        
+        await asyncio.sleep(MEDIA_GC_INTERVAL)
+
+async def login_maintenance_task():
+    """Фоновая задача удаления истекших счетчиков входа и старых записей о попытках входа"""
+    while True:
+        try:
+            if isinstance(login_limiter, SharedStoreRateLimiter):
+                await login_limiter.store.prune()
+            pruned = await prune_login_attempts()
+            if pruned:
+                logger.info(f"Удалено старых записей о попытках входа: {pruned}")
+        except Exception as e:
+            logger.error(f"Ошибка при очистке данных входа: {str(e)}")
+        
+        await asyncio.sleep(LOGIN_MAINTENANCE_INTERVAL)
 
 async def start_background_tasks():
     """Запускает все фоновые задачи"""
     try:
-        # Запускаем задачу обновления рейтингов
+        # Запускаем задачу сверки рейтингов
         asyncio.create_task(update_ratings_task())
+        asyncio.create_task(cleanup_uploads_task())
+        asyncio.create_task(media_gc_task())
+        asyncio.create_task(login_maintenance_task())
+        # Снятие премиум-подписок в момент истечения
+        asyncio.create_task(premium_expiry_scheduler.run())
+        # Запись попыток входа пачками
+        start_login_audit()
+        # Пул процессов обработки изображений
+        start_image_pipeline()
         logger.info("Фоновые задачи запущены")
     except Exception as e:
         logger.error(f"Ошибка при запуске фоновых задач: {str(e)}") 
\ No newline at end of file
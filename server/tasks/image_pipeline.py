@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+import config.media_config as media_config
+import config.upload_config as upload_config
+from core.images import RENDITION_FORMATS, make_renditions, strip_metadata
+from core.storage import IMAGES, blob_hash, incoming_path, rendition_url, storage
+from api.services.principal_service import invalidate_principal
+from db.dals.user_dal import UserDAL
+from db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = {
+    "photo": (media_config.PHOTO_RENDITION_WIDTHS, media_config.PHOTO_DEFAULT_WIDTH),
+    "header_photo": (media_config.HEADER_PHOTO_RENDITION_WIDTHS, media_config.HEADER_PHOTO_DEFAULT_WIDTH),
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+class ImageJob:
+    __slots__ = ("user_id", "image_type", "media_url")
+
+    def __init__(self, user_id: int, image_type: str, media_url: str):
+        self.user_id = user_id
+        self.image_type = image_type
+        self.media_url = media_url
+
+
+def enqueue_image(user_id: int, image_type: str, media_url: str) -> None:
+    """
+    Ставит загруженное изображение в очередь обработки. Оригинал к этому моменту уже сохранен
+    и показывается, пока копии не готовы; при переполнении очереди он просто остается основным
+    """
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait(ImageJob(user_id, image_type, media_url))
+    except asyncio.QueueFull:
+        logger.warning(f"Image pipeline queue is full, keeping original {media_url} for user {user_id}")
+
+
+def _write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def strip_upload_metadata(path: str) -> bool:
+    """
+    Удаляет EXIF, GPS и XMP из загруженного изображения до того, как оно получит
+    публичный адрес в хранилище. Возвращает True, если файл изменен
+    """
+    data = await run_in_threadpool(_read_file, path)
+    loop = asyncio.get_running_loop()
+    try:
+        stripped = await loop.run_in_executor(_executor, strip_metadata, data)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Не удалось прочитать изображение")
+    if stripped is None:
+        return False
+    await run_in_threadpool(_write_file, path, stripped)
+    return True
+
+
+async def _render(sha256: str, media_url: str, widths: List[int]) -> Dict[str, Dict[str, str]]:
+    renditions = {
+        name: {str(width): rendition_url(IMAGES, sha256, width, extension) for width in widths}
+        for name, (_, extension) in RENDITION_FORMATS.items()
+    }
+    keys = [url.removeprefix("/media/") for urls in renditions.values() for url in urls.values()]
+
+    # Копии называются по хешу оригинала: такое изображение уже обрабатывалось
+    existing = await asyncio.gather(*(storage.stat(key) for key in keys))
+    if all(info is not None for info in existing):
+        return renditions
+
+    data = await storage.read(media_url.removeprefix("/media/"))
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(
+        _executor,
+        make_renditions,
+        data,
+        widths,
+        media_config.IMAGE_RENDITION_QUALITY
+    )
+    for name, by_width in rendered.items():
+        for width, content in by_width.items():
+            tmp_path = incoming_path(IMAGES)
+            await run_in_threadpool(_write_file, tmp_path, content)
+            await storage.put_file(renditions[name][str(width)].removeprefix("/media/"), tmp_path)
+    return renditions
+
+
+async def process_image(job: ImageJob) -> None:
+    sha256 = blob_hash(job.media_url)
+    if sha256 is None:
+        return
+    widths, default_width = RENDITION_WIDTHS[job.image_type]
+    renditions = await _render(sha256, job.media_url, widths)
+
+    default_url = renditions["webp"].get(str(default_width)) or renditions["webp"][str(max(widths))]
+    async with async_session() as session:
+        updated = await UserDAL(session).set_image_renditions(
+            job.user_id,
+            job.image_type,
+            f"{upload_config.MEDIA_BASE_URL}{job.media_url}",
+            f"{upload_config.MEDIA_BASE_URL}{default_url}",
+            {
+                name: {width: f"{upload_config.MEDIA_BASE_URL}{url}" for width, url in by_width.items()}
+                for name, by_width in renditions.items()
+            }
+        )
+    if updated:
+        invalidate_principal(job.user_id)
+    else:
+        logger.info(f"User {job.user_id} changed {job.image_type} during processing, renditions not applied")
+
+
+async def _worker() -> None:
+    while True:
+        job = await _queue.get()
+        try:
+            await process_image(job)
+        except Exception as e:
+            # Изображение, которое не удалось декодировать, остается оригиналом
+            logger.error(f"Ошибка обработки изображения {job.media_url}: {str(e)}")
+        finally:
+            _queue.task_done()
+
+
+def start_image_pipeline() -> None:
+    """Запускает пул процессов и обработчики очереди изображений"""
+    global _executor, _queue
+    _executor = ProcessPoolExecutor(max_workers=media_config.IMAGE_PIPELINE_WORKERS)
+    _queue = asyncio.Queue(maxsize=media_config.IMAGE_PIPELINE_QUEUE_SIZE)
+    # Обработчиков столько же, сколько процессов: каждый держит занятым один процесс
+    for _ in range(media_config.IMAGE_PIPELINE_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+def stop_image_pipeline() -> None:
+    for worker in _workers:
+        worker.cancel()
+    _workers.clear()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import config.security_config as security_config
+from db.dals.login_attempt_dal import LoginAttemptDAL
+from db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+_queue: Optional[asyncio.Queue] = None
+_writer: Optional[asyncio.Task] = None
+
+# Записи, не попавшие в очередь из-за переполнения
+dropped = 0
+
+
+def record_login_attempt(email: str, success: bool, ip_address: Optional[str] = None) -> None:
+    """
+    Ставит запись о попытке входа в очередь, не дожидаясь базы. Для ограничения
+    частоты записи не нужны: при переполнении очереди запись теряется, вход не страдает
+    """
+    global dropped
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait(dict(email=email, success=success, ip_address=ip_address, created_at=datetime.utcnow()))
+    except asyncio.QueueFull:
+        dropped += 1
+
+
+async def _flush(batch: List[dict]) -> None:
+    try:
+        async with async_session() as session:
+            await LoginAttemptDAL(session).add_attempts(batch)
+    except Exception as e:
+        logger.error(f"Ошибка записи попыток входа ({len(batch)} шт.): {str(e)}")
+
+
+async def _write_batches() -> None:
+    """Пишет очередь пачками; None в очереди - остановка после записи собранного"""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await _queue.get()
+        if item is None:
+            return
+        batch = [item]
+        # Пачка собирается, пока не наберется LOGIN_AUDIT_BATCH_SIZE или не пройдет интервал
+        deadline = loop.time() + security_config.LOGIN_AUDIT_FLUSH_INTERVAL
+        stopping = False
+        while len(batch) < security_config.LOGIN_AUDIT_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        await _flush(batch)
+        if stopping:
+            return
+
+
+async def prune_login_attempts() -> int:
+    """Удаляет записи о попытках входа старше LOGIN_AUDIT_RETENTION_DAYS"""
+    async with async_session() as session:
+        return await LoginAttemptDAL(session).delete_older_than(
+            datetime.utcnow() - timedelta(days=security_config.LOGIN_AUDIT_RETENTION_DAYS)
+        )
+
+
+def start_login_audit() -> None:
+    global _queue, _writer
+    _queue = asyncio.Queue(maxsize=security_config.LOGIN_AUDIT_QUEUE_SIZE)
+    _writer = asyncio.create_task(_write_batches())
+
+
+async def stop_login_audit() -> None:
+    """Останавливает запись, сохранив то, что уже в очереди"""
+    if _writer is None or _writer.done():
+        return
+    await _queue.put(None)
+    await _writer
+
+
+def stats() -> dict:
+    return {
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "dropped": dropped,
+    }
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+import config.media_config as media_config
+import config.upload_config as upload_config
+from core.storage import IMAGES, INCOMING_DIR, VIDEOS, blob_hash, storage
+from core.storage_backends import LocalStorageBackend, ObjectInfo, StorageBackend
+from db.dals.media_dal import MediaDAL
+from db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+# Временные файлы загрузок и файлы, сохраненные до хранилища по содержимому,
+# всегда лежат на локальном диске, даже если само хранилище - S3
+_local = LocalStorageBackend(upload_config.MEDIA_ROOT)
+
+# Отчет последней сборки для /api/metrics/media-gc
+last_report: Optional[dict] = None
+
+
+def _media_key(url: str) -> Optional[str]:
+    """Ключ хранилища из ссылки вида [http://host]/media/...; None для внешних ссылок"""
+    path = url.split("?", 1)[0]
+    _, found, key = path.partition("/media/")
+    return key if found and key else None
+
+
+class _BatchDeleter:
+    """Удаляет файлы пачками по batch_size с паузой между пачками и считает освобожденное место"""
+
+    def __init__(self, report: dict, batch_size: int, pause: float):
+        self.report = report
+        self.batch_size = batch_size
+        self.pause = pause
+        self._in_batch = 0
+
+    async def delete(self, backend: StorageBackend, key: str, size: int) -> None:
+        await backend.delete(key)
+        self.report["files_deleted"] += 1
+        self.report["bytes_reclaimed"] += size
+        self._in_batch += 1
+        if self._in_batch >= self.batch_size:
+            self._in_batch = 0
+            await asyncio.sleep(self.pause)
+
+
+async def _load_references() -> Tuple[Set[str], Set[str]]:
+    """Хеши файлов хранилища и ключи прежних файлов, на которые ссылаются пользователи и эпизоды"""
+    hashes, keys = set(), set()
+    async with async_session() as session:
+        async for url in MediaDAL(session).iter_referenced_urls():
+            sha256 = blob_hash(url)
+            if sha256 is not None:
+                hashes.add(sha256)
+            elif (key := _media_key(url)) is not None:
+                keys.add(key)
+    return hashes, keys
+
+
+async def _delete_blob_files(path: str, cutoff: float, deleter: _BatchDeleter) -> None:
+    """Удаляет оригинал и его копии: у копий то же имя с суффиксом ширины"""
+    key = path.removeprefix("/media/")
+    prefix = os.path.splitext(key)[0]
+    files = [(name, info) async for name, info in storage.list(prefix)]
+    # Файл снова загрузили, пока запись ждала удаления: commit_blob обновил его время.
+    # Запись уже удалена, новая ссылка создаст ее заново, а без ссылки файл подберет обход хранилища
+    if any(name == key and info.modified >= cutoff for name, info in files):
+        return
+    for name, info in files:
+        await deleter.delete(storage, name, info.size)
+
+
+async def _collect_unreferenced_blobs(
+    referenced: Set[str],
+    updated_before: datetime,
+    deleter: _BatchDeleter
+) -> None:
+    cutoff = updated_before.timestamp()
+    after = None
+    while True:
+        async with async_session() as session:
+            dal = MediaDAL(session)
+            candidates = await dal.get_unreferenced(updated_before, media_config.MEDIA_GC_BATCH_SIZE, after)
+            if not candidates:
+                return
+            after = (candidates[-1][1], candidates[-1][0])
+
+            # Счетчик ссылок разошелся с данными: такой файл не трогаем
+            drifted = [sha256 for sha256, _ in candidates if sha256 in referenced]
+            if drifted:
+                logger.warning(f"Media blobs with zero ref_count are still referenced: {', '.join(drifted)}")
+            blobs = await dal.delete_unreferenced(
+                [sha256 for sha256, _ in candidates if sha256 not in referenced],
+                updated_before
+            )
+
+        for blob in blobs:
+            await _delete_blob_files(blob.path, cutoff, deleter)
+        deleter.report["blobs_deleted"] += len(blobs)
+
+
+async def _collect_untracked_files(referenced: Set[str], cutoff: float, deleter: _BatchDeleter) -> None:
+    """Файлы хранилища без записи в media_blobs: загрузка оборвалась до того, как на файл сослались"""
+    for kind in (VIDEOS, IMAGES):
+        batch: List[Tuple[str, str, ObjectInfo]] = []
+        async for key, info in storage.list(f"{kind}/"):
+            sha256 = blob_hash(key)
+            if sha256 is None or f"/{INCOMING_DIR}/" in f"/{key}" or sha256 in referenced or info.modified >= cutoff:
+                continue
+            batch.append((key, sha256, info))
+            if len(batch) >= media_config.MEDIA_GC_BATCH_SIZE:
+                await _delete_untracked(batch, deleter)
+                batch = []
+        if batch:
+            await _delete_untracked(batch, deleter)
+
+
+async def _delete_untracked(batch: List[Tuple[str, str, ObjectInfo]], deleter: _BatchDeleter) -> None:
+    async with async_session() as session:
+        tracked = await MediaDAL(session).get_existing({sha256 for _, sha256, _ in batch})
+    for key, sha256, info in batch:
+        if sha256 not in tracked:
+            await deleter.delete(storage, key, info.size)
+
+
+async def _collect_local_files(referenced_keys: Set[str], cutoff: float, deleter: _BatchDeleter) -> None:
+    # Временные файлы: части возобновляемой загрузки живут до UPLOAD_SESSION_TTL с последней записи
+    incoming_cutoff = min(cutoff, time.time() - upload_config.UPLOAD_SESSION_TTL)
+    for kind in (VIDEOS, IMAGES):
+        async for key, info in _local.list(f"{kind}/{INCOMING_DIR}/"):
+            if info.modified < incoming_cutoff:
+                await deleter.delete(_local, key, info.size)
+
+    # Файлы, сохраненные до хранилища по содержимому: /media/users/{id}/photo_*.jpg и т.п.
+    top_level = await run_in_threadpool(_top_level_dirs)
+    for name in top_level:
+        if name in (VIDEOS, IMAGES):
+            continue
+        async for key, info in _local.list(f"{name}/"):
+            if key not in referenced_keys and info.modified < cutoff:
+                await deleter.delete(_local, key, info.size)
+
+
+def _top_level_dirs() -> List[str]:
+    try:
+        with os.scandir(upload_config.MEDIA_ROOT) as entries:
+            return [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+async def collect_media_garbage() -> dict:
+    """
+    Удаляет медиафайлы, на которые не ссылаются users.photo, users.header_photo,
+    users.frame_photo и episodes.video_file, не раньше чем через MEDIA_GC_GRACE после
+    последнего изменения. Возвращает число удаленных файлов и освобожденные байты
+    """
+    global last_report
+    started = time.perf_counter()
+    updated_before = datetime.now() - timedelta(seconds=media_config.MEDIA_GC_GRACE)
+    cutoff = updated_before.timestamp()
+    report = {"blobs_deleted": 0, "files_deleted": 0, "bytes_reclaimed": 0}
+    deleter = _BatchDeleter(report, media_config.MEDIA_GC_BATCH_SIZE, media_config.MEDIA_GC_BATCH_PAUSE)
+
+    referenced_hashes, referenced_keys = await _load_references()
+    await _collect_unreferenced_blobs(referenced_hashes, updated_before, deleter)
+    await _collect_untracked_files(referenced_hashes, cutoff, deleter)
+    await _collect_local_files(referenced_keys, cutoff, deleter)
+
+    report["elapsed"] = time.perf_counter() - started
+    report["finished_at"] = datetime.now()
+    last_report = report
+    return report
@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import config.tasks_config as tasks_config
+from api.services.entitlement_service import invalidate_entitlements
+from api.services.principal_service import invalidate_principals
+from db.dals.user_dal import UserDAL
+from db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+
+async def expire_premium_subscriptions(now: Optional[datetime] = None) -> List[int]:
+    """
+    Снимает все истекшие подписки одним UPDATE в собственной короткой сессии
+    и сбрасывает кэши затронутых пользователей
+    """
+    async with async_session() as session:
+        user_ids = await UserDAL(session).expire_premium(now)
+    for user_id in user_ids:
+        invalidate_entitlements(user_id)
+    invalidate_principals(user_ids)
+    if user_ids:
+        logger.info(f"Premium expired for {len(user_ids)} users")
+    return user_ids
+
+
+class PremiumExpiryScheduler:
+    """
+    Снимает премиум-подписки в момент истечения, а не раз в интервал.
+
+    В куче лежат сроки premium_until не дальше lookahead от текущего момента: окно читается
+    из базы страницами и перечитывается каждые reload_interval, покупки добавляют сроки
+    через schedule. Срабатывание - тот же set-based expire_premium, то есть база остается
+    источником истины, а куча только решает, когда проснуться: устаревшая запись (подписку
+    продлили в другом процессе) дает лишний пустой UPDATE, но не снимает подписку раньше срока.
+
+    Сроки сравниваются с системными часами на каждом шаге, а сон ограничен max_sleep,
+    поэтому перевод часов замечается не позже чем через max_sleep; перечитывание окна
+    идет по монотонному времени. Подписки, истекшие пока процесс не работал,
+    снимаются первым проходом после запуска
+    """
+
+    def __init__(
+        self,
+        lookahead: float = tasks_config.PREMIUM_EXPIRY_LOOKAHEAD,
+        reload_interval: float = tasks_config.PREMIUM_EXPIRY_INTERVAL,
+        max_entries: int = tasks_config.PREMIUM_EXPIRY_MAX_ENTRIES,
+        page_size: int = tasks_config.PREMIUM_EXPIRY_PAGE_SIZE,
+        max_sleep: float = tasks_config.PREMIUM_EXPIRY_MAX_SLEEP
+    ):
+        self.lookahead = lookahead
+        self.reload_interval = reload_interval
+        self.max_entries = max_entries
+        self.page_size = page_size
+        self.max_sleep = max_sleep
+
+        # Куча (срок, user_id) и действующий срок каждого пользователя: записи кучи,
+        # не совпадающие с _deadlines, устарели и пропускаются при извлечении
+        self._heap: List[Tuple[datetime, int]] = []
+        self._deadlines: Dict[int, datetime] = {}
+        # Все сроки раньше _horizon загружены; до первой загрузки не известно ничего
+        self._horizon = datetime.min
+        # Сроки, назначенные во время перечитывания окна
+        self._pending: Optional[Dict[int, datetime]] = None
+        self._wakeup = asyncio.Event()
+
+        self.fired = 0
+        self.expired = 0
+        self.reloads = 0
+        self.last_reload: Optional[datetime] = None
+
+    def schedule(self, user_id: int, premium_until: Optional[datetime]) -> None:
+        """Новый срок подписки пользователя, например после покупки"""
+        if self._pending is not None and premium_until is not None:
+            self._pending[user_id] = premium_until
+        if premium_until is None or premium_until >= self._horizon:
+            # Срок за окном попадет в кучу при перечитывании
+            self._deadlines.pop(user_id, None)
+            return
+        if user_id not in self._deadlines and len(self._deadlines) >= self.max_entries:
+            # Места нет: сужаем окно, срок будет загружен позже
+            self._horizon = premium_until
+            return
+        self._deadlines[user_id] = premium_until
+        heapq.heappush(self._heap, (premium_until, user_id))
+        if self._heap[0] == (premium_until, user_id):
+            self._wakeup.set()
+        self._compact()
+
+    def _compact(self) -> None:
+        # Продления оставляют в куче устаревшие записи; не даем им накапливаться
+        if len(self._heap) > 2 * len(self._deadlines) + self.page_size:
+            self._heap = [(deadline, user_id) for user_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    async def _reload(self) -> None:
+        """Перечитывает окно ближайших сроков из базы страницами по (premium_until, user_id)"""
+        until = datetime.now() + timedelta(seconds=self.lookahead)
+        horizon = until
+        deadlines: Dict[int, datetime] = {}
+        after = None
+        self._pending = {}
+        try:
+            async with async_session() as session:
+                user_dal = UserDAL(session)
+                while True:
+                    page = await user_dal.get_premium_expiring(until, self.page_size, after)
+                    deadlines.update(page)
+                    if len(page) < self.page_size:
+                        break
+                    after = (page[-1][1], page[-1][0])
+                    if len(deadlines) >= self.max_entries:
+                        # Окно не помещается в память: сужаем его до последнего загруженного срока
+                        horizon = page[-1][1]
+                        break
+            # Покупки во время чтения могли разминуться со своей страницей.
+            # Покупка только продлевает срок, поэтому берется более поздний
+            for user_id, premium_until in self._pending.items():
+                if premium_until < horizon:
+                    deadlines[user_id] = max(premium_until, deadlines.get(user_id, premium_until))
+                else:
+                    deadlines.pop(user_id, None)
+        finally:
+            self._pending = None
+
+        self._deadlines = deadlines
+        self._heap = [(deadline, user_id) for user_id, deadline in deadlines.items()]
+        heapq.heapify(self._heap)
+        self._horizon = horizon
+        self.reloads += 1
+        self.last_reload = datetime.now()
+
+    def _pop_due(self, now: datetime) -> int:
+        """Извлекает наступившие сроки и возвращает число действующих среди них"""
+        due = 0
+        while self._heap and self._heap[0][0] < now:
+            deadline, user_id = heapq.heappop(self._heap)
+            if self._deadlines.get(user_id) == deadline:
+                del self._deadlines[user_id]
+                due += 1
+        return due
+
+    def _seconds_until(self, now: datetime, next_reload: float) -> float:
+        loop = asyncio.get_running_loop()
+        delay = min(self.max_sleep, next_reload - loop.time(), (self._horizon - now).total_seconds())
+        if self._heap:
+            delay = min(delay, (self._heap[0][0] - now).total_seconds())
+        return max(delay, 0.0)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_reload = loop.time()
+        while True:
+            try:
+                now = datetime.now()
+                # Перечитывание по расписанию или когда часы ушли за загруженное окно
+                if loop.time() >= next_reload or now >= self._horizon:
+                    # Контрольный проход снимает и то, что истекло до запуска или мимо кучи
+                    self.expired += len(await expire_premium_subscriptions(now))
+                    await self._reload()
+                    next_reload = loop.time() + self.reload_interval
+                    continue
+
+                if self._pop_due(now):
+                    self.fired += 1
+                    self.expired += len(await expire_premium_subscriptions(now))
+                    continue
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._seconds_until(now, next_reload))
+                except asyncio.TimeoutError:
+                    pass
+            except Exception as e:
+                logger.error(f"Error in premium expiry scheduler: {str(e)}")
+                # Извлеченные сроки могли не сработать: после паузы окно перечитывается заново
+                self._horizon = datetime.min
+                await asyncio.sleep(60)
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": len(self._deadlines),
+            "heap_size": len(self._heap),
+            "next_expiry": self._heap[0][0] if self._heap else None,
+            "horizon": self._horizon if self._horizon > datetime.min else None,
+            "fired": self.fired,
+            "expired": self.expired,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+        }
+
+
+premium_expiry_scheduler = PremiumExpiryScheduler()
@@ -0,0 +1,137 @@
+"""
+Задержка входа и остальных запросов при всплеске логинов: проверка пароля прямо в цикле
+событий против проверки в пуле password_hash_pool. Затем всплеск параллельных попыток
+подобрать пароль к одному email: до проверки пароля доходит не больше лимита попыток.
+
+Обычные запросы моделируются короткими задачами, которые каждые REQUEST_INTERVAL
+отдают управление циклу событий; их задержка показывает, насколько bcrypt блокирует цикл.
+База не нужна:
+    python tests/login_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.context import CryptContext
+
+from core.hashing import Hasher, password_hash_pool, pwd_context
+from core.rate_limit import InMemoryRateLimiter, LocalCounterStore, RateLimiter, SharedStoreRateLimiter
+
+PASSWORD = "correct horse battery staple"
+LOGINS = 64
+REQUESTS = 2000
+REQUEST_INTERVAL = 0.002
+# Всплеск подбора пароля: попыток больше, чем вмещает очередь пула, лимит - как MAX_LOGIN_ATTEMPTS
+GUESSES = 300
+GUESS_LIMIT = 5
+GUESS_WINDOW = 900
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def mixed_traffic(verify: Callable[[str, str], Awaitable[bool]], hashed: str) -> dict:
+    login_latencies: List[float] = []
+    request_latencies: List[float] = []
+
+    # Все входы приходят одновременно: задержка считается от начала всплеска, включая очередь
+    async def login() -> None:
+        assert await verify(PASSWORD, hashed)
+        login_latencies.append(time.perf_counter() - started)
+
+    async def requests() -> None:
+        for _ in range(REQUESTS):
+            started = time.perf_counter()
+            await asyncio.sleep(REQUEST_INTERVAL)
+            # Задержка сверх запрошенного сна - время, когда цикл событий был занят
+            request_latencies.append(time.perf_counter() - started - REQUEST_INTERVAL)
+
+    started = time.perf_counter()
+    await asyncio.gather(requests(), *(login() for _ in range(LOGINS)))
+    return {
+        "elapsed": time.perf_counter() - started,
+        "login_p50": percentile(login_latencies, 0.5),
+        "login_p99": percentile(login_latencies, 0.99),
+        "request_p99": percentile(request_latencies, 0.99),
+        "request_max": max(request_latencies),
+    }
+
+
+async def verify_inline(password: str, hashed: str) -> bool:
+    return Hasher.verify_password(password, hashed)
+
+
+async def verify_pool(password: str, hashed: str) -> bool:
+    valid, _ = await Hasher.verify_and_update(password, hashed)
+    return valid
+
+
+class SlowCounterStore(LocalCounterStore):
+    """Общее хранилище с задержкой сети: операции параллельных попыток перемежаются"""
+
+    async def get(self, keys):
+        await asyncio.sleep(0.001)
+        return await super().get(keys)
+
+    async def increment(self, key, ttl, amount=1):
+        await asyncio.sleep(0.001)
+        return await super().increment(key, ttl, amount)
+
+
+async def guess_burst(limiter: RateLimiter, hashed: str) -> int:
+    """Параллельные попытки входа в порядке authenticate_user; возвращает число дошедших до пароля"""
+    verified = 0
+
+    async def guess(i: int) -> None:
+        nonlocal verified
+        if await limiter.acquire("email", "victim@example.com") is not None:
+            return
+        verified += 1
+        valid, _ = await Hasher.verify_and_update(f"wrong password {i}", hashed)
+        assert not valid
+
+    await asyncio.gather(*(guess(i) for i in range(GUESSES)))
+    return verified
+
+
+async def main() -> None:
+    hashed = await Hasher.hash_password(PASSWORD)
+
+    for name, verify in (("в цикле событий", verify_inline), ("в пуле", verify_pool)):
+        result = await mixed_traffic(verify, hashed)
+        print(
+            f"{name}: {LOGINS} входов за {result['elapsed']:.2f}с, "
+            f"вход p50 {result['login_p50'] * 1000:.0f} мс, p99 {result['login_p99'] * 1000:.0f} мс; "
+            f"задержка остальных запросов p99 {result['request_p99'] * 1000:.1f} мс, "
+            f"максимум {result['request_max'] * 1000:.1f} мс"
+        )
+    print(f"пул: {password_hash_pool.stats()}")
+
+    # Хеш с другой стоимостью пересчитывается при входе
+    cheaper = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(PASSWORD)
+    valid, new_hash = await Hasher.verify_and_update(PASSWORD, cheaper)
+    assert valid and new_hash is not None and not pwd_context.needs_update(new_hash)
+    valid, new_hash = await Hasher.verify_and_update(PASSWORD, hashed)
+    assert valid and new_hash is None
+    print("Хеш с прежней стоимостью пересчитан при входе")
+
+    limits = {"email": (GUESS_LIMIT, GUESS_WINDOW)}
+    for name, limiter in (
+        ("в памяти процесса", InMemoryRateLimiter(limits)),
+        ("общее хранилище", SharedStoreRateLimiter(limits, SlowCounterStore())),
+    ):
+        verified = await guess_burst(limiter, hashed)
+        print(f"{name}: из {GUESSES} параллельных попыток до проверки пароля дошло {verified}")
+        assert verified <= GUESS_LIMIT, f"{name}: лимит {GUESS_LIMIT} превышен"
+
+    password_hash_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
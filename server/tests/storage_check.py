@@ -0,0 +1,115 @@
+"""
+Проверка драйвера хранилища медиафайлов: загрузка целиком и multipart,
+чтение потоком, Range, условные запросы, список и удаление.
+
+Запуск против MinIO из docker-compose-local.yaml:
+    make up
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 S3_BUCKET=storage-check \
+        python tests/storage_check.py
+Без переменных проверяется локальный драйвер во временном каталоге.
+"""
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config.storage_config as storage_config
+from core.storage_backends import LocalStorageBackend, S3StorageBackend, StorageBackend
+
+SMALL_SIZE = 64 * 1024
+# Больше трех частей минимального размера S3, чтобы проверить multipart и порядок частей
+LARGE_SIZE = 3 * 5 * 1024 * 1024 + 12345
+PART_SIZE = 5 * 1024 * 1024
+
+
+def make_file(directory: str, size: int) -> str:
+    path = os.path.join(directory, f"source_{size}")
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return path
+
+
+async def read_all(backend: StorageBackend, key: str, headers: dict) -> tuple:
+    path = backend.local_path(key)
+    if path is not None:
+        with open(path, "rb") as f:
+            data = f.read()
+        if "range" in headers:
+            start, end = headers["range"].removeprefix("bytes=").split("-")
+            return 206, data[int(start):int(end) + 1], {}
+        return 200, data, {}
+    stored = await backend.get(key, headers)
+    data = b"".join([chunk async for chunk in stored.chunks])
+    return stored.status, data, stored.headers
+
+
+async def check(backend: StorageBackend, workdir: str) -> None:
+    for size in (SMALL_SIZE, LARGE_SIZE):
+        source = make_file(workdir, size)
+        with open(source, "rb") as f:
+            content = f.read()
+        key = f"storage-check/{hashlib.sha256(content).hexdigest()}.bin"
+
+        await backend.put_file(key, source)
+        assert not os.path.exists(source), "локальный файл должен быть удален после переноса"
+
+        info = await backend.stat(key)
+        assert info is not None and info.size == size, f"stat {key}: {info and info.size}"
+
+        status, data, headers = await read_all(backend, key, {})
+        assert status == 200 and data == content, f"GET {key}: {status}, {len(data)} байт"
+
+        status, data, _ = await read_all(backend, key, {"range": "bytes=10-19"})
+        assert status == 206 and data == content[10:20], f"Range {key}: {status}"
+
+        if backend.local_path(key) is None:
+            stored = await backend.get(key, {"if-none-match": headers["etag"]})
+            assert stored.status == 304, f"If-None-Match {key}: {stored.status}"
+
+        # touch сдвигает время изменения: по нему сборщик мусора не трогает файл grace-период
+        await asyncio.sleep(1.1)
+        await backend.touch(key)
+        touched = await backend.stat(key)
+        assert touched.modified > info.modified and touched.size == size, f"touch {key}"
+
+        print(f"{key}: {size} байт OK")
+
+    assert await backend.stat("storage-check/missing.bin") is None
+
+    # Список по префиксу и удаление, которыми пользуется сборщик мусора
+    listed = {key: info.size async for key, info in backend.list("storage-check/")}
+    assert len(listed) == 2 and set(listed.values()) == {SMALL_SIZE, LARGE_SIZE}, f"list: {listed}"
+    for key in listed:
+        await backend.delete(key)
+        assert await backend.stat(key) is None, f"delete {key}"
+    await backend.delete("storage-check/missing.bin")
+    assert [key async for key, _ in backend.list("storage-check/")] == []
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        if storage_config.STORAGE_BACKEND == "s3":
+            backend = S3StorageBackend(
+                storage_config.S3_ENDPOINT_URL,
+                storage_config.S3_BUCKET,
+                storage_config.S3_ACCESS_KEY,
+                storage_config.S3_SECRET_KEY,
+                region=storage_config.S3_REGION,
+                part_size=PART_SIZE,
+                concurrency=2
+            )
+            await backend.create_bucket()
+        else:
+            backend = LocalStorageBackend(os.path.join(workdir, "media"))
+        try:
+            await check(backend, workdir)
+        finally:
+            await backend.close()
+    print("Хранилище работает")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())